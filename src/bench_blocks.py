@@ -0,0 +1,76 @@
+'''
+Compare classify_block, which splits a block at most once and hands the lines on, against
+the old classification that split the block again for every step, on documents made of
+thousands of long list blocks.
+Run with: python3 src/bench_blocks.py
+'''
+import timeit
+
+from markdown_blocks import BlockType, classify_block
+
+
+def block_to_block_type_split(block):
+    # The classification as it was before classify_block, splitting the block into lines
+    lines = block.split("\n")
+    if block.startswith(("# ", "## ", "### ", "#### ", "##### ", "###### ")):
+        return BlockType.HEADING
+    if len(lines) > 1 and lines[0].startswith("```") and lines[-1].startswith("```"):
+        return BlockType.CODE
+    if block.startswith(">"):
+        for line in lines:
+            if not line.startswith(">"):
+                return BlockType.PARAGRAPH
+        return BlockType.QUOTE
+    if block.startswith('- '):
+        for line in lines:
+            if not line.startswith("- "):
+                return BlockType.PARAGRAPH
+        return BlockType.ULIST
+    if block.startswith('1. '):
+        i = 1
+        for line in lines:
+            if not line.startswith(f"{i}. "):
+                return BlockType.PARAGRAPH
+            i += 1
+        return BlockType.OLIST
+    return BlockType.PARAGRAPH
+
+def items_split(block):
+    block_type = block_to_block_type_split(block)
+    lines = block.split("\n")
+    if block_type == BlockType.ULIST:
+        return [line[2:] for line in lines]
+    return [line.split(". ", 1)[1] for line in lines]
+
+def items_single_split(block):
+    block_type, lines = classify_block(block)
+    if block_type == BlockType.ULIST:
+        return [line[2:] for line in lines]
+    return [line.split(". ", 1)[1] for line in lines]
+
+def list_blocks(count, items, item_length):
+    text = ("lorem ipsum dolor sit amet " * (item_length // 27 + 1))[:item_length]
+    blocks = []
+    for i in range(count):
+        if i % 2 == 0:
+            blocks.append("\n".join(f"- {text}" for _ in range(items)))
+        else:
+            blocks.append("\n".join(f"{n}. {text}" for n in range(1, items + 1)))
+    return blocks
+
+def bench(name, blocks, repeat):
+    for block in blocks:
+        if items_split(block) != items_single_split(block):
+            raise AssertionError(f"{name}: items differ")
+    split = min(timeit.repeat(lambda: [items_split(block) for block in blocks], number=1, repeat=repeat))
+    single = min(timeit.repeat(lambda: [items_single_split(block) for block in blocks], number=1, repeat=repeat))
+    print(f"{name:<34} split {split * 1000:8.2f} ms  single split {single * 1000:8.2f} ms  x{split / single:.2f}")
+
+def main():
+    bench("2000 lists x 20 items x 80 chars", list_blocks(2000, 20, 80), 5)
+    bench("2000 lists x 200 items x 200 chars", list_blocks(2000, 200, 200), 3)
+    bench("20 lists x 5000 items x 80 chars", list_blocks(20, 5000, 80), 3)
+
+
+if __name__ == "__main__":
+    main()
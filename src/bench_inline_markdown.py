@@ -0,0 +1,52 @@
+'''
+Compare the single-pass inline tokenizer against the original five-stage split pipeline.
+Run with: python3 src/bench_inline_markdown.py
+'''
+
+import timeit
+
+from textnode import TextNode, TextType
+from inline_markdown import (
+    text_to_textnodes,
+    split_nodes_delimiter,
+    split_nodes_image,
+    split_nodes_link,
+)
+
+def text_to_textnodes_pipeline(text):
+    nodes = [TextNode(text, TextType.TEXT)]
+    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+    nodes = split_nodes_image(nodes)
+    nodes = split_nodes_link(nodes)
+    return nodes
+
+def link_heavy_paragraph(count):
+    parts = []
+    for i in range(count):
+        parts.append(f"see [link number {i}](https://example.com/page/{i}) and ![image {i}](/images/{i}.png) then")
+    return " ".join(parts)
+
+def emphasis_heavy_paragraph(count):
+    parts = []
+    for i in range(count):
+        parts.append(f"some **bold {i}** words, _italic {i}_ words and `code {i}` spans")
+    return " ".join(parts)
+
+def bench(name, text, repeat):
+    if text_to_textnodes(text) != text_to_textnodes_pipeline(text):
+        raise AssertionError(f"{name}: tokenizer output differs from the pipeline")
+    pipeline = min(timeit.repeat(lambda: text_to_textnodes_pipeline(text), number=1, repeat=repeat))
+    single_pass = min(timeit.repeat(lambda: text_to_textnodes(text), number=1, repeat=repeat))
+    print(f"{name:<24} {len(text):>9} chars  pipeline {pipeline * 1000:9.2f} ms  single-pass {single_pass * 1000:9.2f} ms  x{pipeline / single_pass:.1f}")
+
+def main():
+    for count in (10, 100, 1000, 4000):
+        bench(f"links x{count}", link_heavy_paragraph(count), 5)
+    for count in (10, 100, 1000, 4000):
+        bench(f"emphasis x{count}", emphasis_heavy_paragraph(count), 5)
+
+
+if __name__ == "__main__":
+    main()
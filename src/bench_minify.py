@@ -0,0 +1,48 @@
+'''
+Measure what --minify saves in bytes (raw and gzipped) and what it costs in rendering
+throughput, on synthetic pages rendered through the site's template.html.
+Run with: python3 src/bench_minify.py
+'''
+import gzip
+import os
+import time
+
+from gencontent import render_page
+from page_template import CompiledTemplate
+from synthetic import ContentGenerator
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "template.html")
+
+
+def render_all(documents, template):
+    started = time.perf_counter()
+    pages = [render_page(document, template, "/") for document in documents]
+    return pages, time.perf_counter() - started
+
+def measure(name, documents, template, repeat):
+    best = None
+    for _ in range(repeat):
+        pages, elapsed = render_all(documents, template)
+        best = elapsed if best is None else min(best, elapsed)
+    raw = sum(len(page.encode("utf-8")) for page in pages)
+    compressed = sum(len(gzip.compress(page.encode("utf-8"), mtime=0)) for page in pages)
+    print(f"  {name:<10} {raw / 1024:10.1f} KiB {compressed / 1024:10.1f} KiB gz {len(documents) / best:10.1f} pages/s")
+    return raw, compressed, best
+
+def main():
+    with open(TEMPLATE_PATH, 'r') as file:
+        source = file.read()
+    generator = ContentGenerator(seed=0)
+    for count, size in ((500, 4000), (100, 40000)):
+        documents = [generator.page(size) for _ in range(count)]
+        print(f"{count} pages x ~{size} chars")
+        raw, compressed, elapsed = measure("default", documents, CompiledTemplate(source, "/"), 3)
+        min_raw, min_compressed, min_elapsed = measure("minify", documents, CompiledTemplate(source, "/", minify=True), 3)
+        print(
+            f"  saved {(1 - min_raw / raw) * 100:.1f} % raw, {(1 - min_compressed / compressed) * 100:.1f} % gzipped,"
+            f" throughput x{elapsed / min_elapsed:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+'''
+Measure the memory held by the TextNode/HTMLNode trees of a large page, against
+equivalent __dict__-based node classes (the representation used before __slots__).
+Run with: python3 src/bench_nodes.py
+'''
+import gc
+import tracemalloc
+
+from htmlnode import LeafNode, ParentNode
+from inline_markdown import text_to_textnodes
+from textnode import TextNode, TextType, text_node_to_html_node
+
+
+class DictTextNode():
+    def __init__(self, text, text_type, url=None):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+
+class DictHTMLNode():
+    def __init__(self, tag=None, value=None, children=None, props=None):
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
+
+
+def paragraph(i):
+    return f"Line {i} has **bold**, _italic_, `code`, a [link](/page/{i}) and ![img](/images/{i}.png) in it"
+
+def build_slotted(count):
+    nodes = []
+    for i in range(count):
+        text_nodes = text_to_textnodes(paragraph(i))
+        nodes.append(ParentNode("p", [text_node_to_html_node(node) for node in text_nodes]))
+        nodes.append(text_nodes)
+    return nodes
+
+def build_dict_based(count):
+    nodes = []
+    for i in range(count):
+        text_nodes = [DictTextNode(node.text, node.text_type, node.url) for node in text_to_textnodes(paragraph(i))]
+        children = []
+        for node in text_nodes:
+            if node.text_type == TextType.LINK:
+                children.append(DictHTMLNode("a", node.text, None, {"href": node.url}))
+            elif node.text_type == TextType.IMAGE:
+                children.append(DictHTMLNode("img", "", None, {"src": node.url, "alt": node.text}))
+            else:
+                children.append(DictHTMLNode(None, node.text))
+        nodes.append(DictHTMLNode("p", None, children))
+        nodes.append(text_nodes)
+    return nodes
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    nodes = build(count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del nodes
+    return current
+
+def main():
+    count = 20000
+    dict_based = measure(build_dict_based, count)
+    slotted = measure(build_slotted, count)
+    print(f"{count} paragraphs (~{count * 11} text nodes, ~{count * 12} html nodes)")
+    print(f"  __dict__ nodes: {dict_based / 1024 / 1024:8.1f} MiB")
+    print(f"  slotted nodes:  {slotted / 1024 / 1024:8.1f} MiB")
+    print(f"  reduction:      {(1 - slotted / dict_based) * 100:8.1f} %")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+'''
+Benchmark the build stage by stage on a synthetic content tree and print the results as JSON.
+Run with: python3 src/benchmark.py --pages 1000 --output bench.json
+'''
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from gencontent import find_markdown_files, generate_pages, extract_title
+from inline_markdown import text_to_textnodes
+from markdown_blocks import BlockType, markdown_to_blocks, block_to_block_type, markdown_to_html_node
+from page_template import CompiledTemplate
+from synthetic import DEFAULT_BLOCK_MIX, generate_content_tree
+
+BENCH_TEMPLATE = """<!doctype html>
+<html>
+  <head><title>{{ Title }}</title><link href="/index.css" rel="stylesheet" /></head>
+  <body><article>{{ Content }}</article></body>
+</html>"""
+
+
+def inline_texts(block, block_type):
+    '''
+    Return the inline markdown strings that block_to_html_node would hand to text_to_textnodes.
+    '''
+    lines = block.split("\n")
+    match block_type:
+        case BlockType.PARAGRAPH:
+            return [" ".join(lines)]
+        case BlockType.HEADING:
+            return [block.lstrip("#")[1:]]
+        case BlockType.QUOTE:
+            return [" ".join(line.lstrip(">").strip() for line in lines)]
+        case BlockType.ULIST:
+            return [line[2:] for line in lines]
+        case BlockType.OLIST:
+            return [line.split(". ", 1)[1] for line in lines]
+        case _:
+            return []
+
+
+class StageTimer():
+    def __init__(self):
+        '''
+        Constructor for StageTimer. Records the wall time of each named stage, in order.
+        '''
+        self.stages = {}
+
+    def run(self, name, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        self.stages[name] = time.perf_counter() - started
+        return result
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(work_dir, pages, depth, page_size, seed, block_mix, link_density, image_density, jobs):
+    content_dir = os.path.join(work_dir, "content")
+    dest_dir = os.path.join(work_dir, "public")
+    template_path = os.path.join(work_dir, "template.html")
+    with open(template_path, 'w') as file:
+        file.write(BENCH_TEMPLATE)
+    generate_content_tree(
+        content_dir,
+        page_count=pages,
+        depth=depth,
+        page_size=page_size,
+        seed=seed,
+        block_mix=block_mix,
+        link_density=link_density,
+        image_density=image_density,
+    )
+
+    timer = StageTimer()
+    page_paths = timer.run("discovery", find_markdown_files, content_dir, dest_dir)
+
+    def read_all():
+        documents = []
+        for from_path, _ in page_paths:
+            with open(from_path, 'r') as file:
+                documents.append(file.read())
+        return documents
+    documents = timer.run("read", read_all)
+    input_bytes = sum(len(document.encode("utf-8")) for document in documents)
+
+    blocks = timer.run("markdown_to_blocks", lambda: [markdown_to_blocks(document) for document in documents])
+    all_blocks = [block for page_blocks in blocks for block in page_blocks]
+    block_types = timer.run("block_to_block_type", lambda: [block_to_block_type(block) for block in all_blocks])
+    texts = [text for block, block_type in zip(all_blocks, block_types) for text in inline_texts(block, block_type)]
+    timer.run("text_to_textnodes", lambda: [text_to_textnodes(text) for text in texts])
+    nodes = timer.run("markdown_to_html_node", lambda: [markdown_to_html_node(document) for document in documents])
+    html = timer.run("to_html", lambda: [node.to_html("/") for node in nodes])
+
+    template = CompiledTemplate(BENCH_TEMPLATE, "/")
+    rendered = timer.run(
+        "template_fill",
+        lambda: [
+            template.render(Title=extract_title(document), Content=content)
+            for document, content in zip(documents, html)
+        ],
+    )
+
+    def write_all():
+        for (_, dest_path), page in zip(page_paths, rendered):
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            with open(dest_path, 'w') as file:
+                file.write(page)
+    timer.run("write", write_all)
+    output_bytes = sum(len(page.encode("utf-8")) for page in rendered)
+    del blocks, all_blocks, block_types, texts, nodes, html, rendered
+
+    timer.run("end_to_end", generate_pages, page_paths, template_path, "/", jobs)
+    end_to_end = timer.stages["end_to_end"]
+
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "parameters": {
+            "pages": pages,
+            "depth": depth,
+            "page_size": page_size,
+            "seed": seed,
+            "block_mix": block_mix,
+            "link_density": link_density,
+            "image_density": image_density,
+            "jobs": jobs,
+        },
+        "input_bytes": input_bytes,
+        "output_bytes": output_bytes,
+        "stages_seconds": timer.stages,
+        "pages_per_second": pages / end_to_end if end_to_end > 0 else None,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def parse_block_mix(value):
+    '''
+    Parse a block mix like "paragraph=5,code=1,ulist=2" into a dict of weights.
+    '''
+    block_mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_BLOCK_MIX:
+            raise argparse.ArgumentTypeError(f"unknown block type: {name}")
+        block_mix[name] = int(weight)
+    return block_mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the site generator on synthetic content")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--page-size", type=int, default=4000, help="approximate characters per page")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--block-mix", type=parse_block_mix, default=DEFAULT_BLOCK_MIX, help='e.g. "paragraph=5,code=1,ulist=2"')
+    parser.add_argument("--link-density", type=float, default=0.05)
+    parser.add_argument("--image-density", type=float, default=0.01)
+    parser.add_argument("--jobs", type=int, default=1, help="processes for the end-to-end stage")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = run_benchmark(
+            work_dir,
+            args.pages,
+            args.depth,
+            args.page_size,
+            args.seed,
+            args.block_mix,
+            args.link_density,
+            args.image_density,
+            args.jobs,
+        )
+    text = json.dumps(results, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w') as file:
+            file.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+from rendercache import GENERATOR_VERSION
+
+BLOCK_CACHE_VERSION = 2
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class BlockCache():
+    def __init__(self):
+        '''
+        Constructor for BlockCache.
+        An LRU cache of rendered HTML fragments keyed by a hash of the raw markdown block
+        (plus anything else that changes the output, such as the basepath). Identical blocks
+        shared by many pages (disclaimers, code samples, navigation lists) are then parsed
+        once per build. A saved cache is only loaded by the same GENERATOR_VERSION, so a
+        change to the parser or the emitter never serves stale fragments.
+        Disabled until configure() is called.
+        '''
+        self.reset()
+
+    def reset(self):
+        '''
+        Drop every entry and the configuration, leaving the cache disabled.
+        '''
+        self.enabled = False
+        self.max_bytes = DEFAULT_MAX_BYTES
+        self.path = None
+        self.entries = OrderedDict()
+        # The href/src references of the entries that were rendered while collecting them
+        self.refs = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.added = []
+
+    def configure(self, max_bytes=DEFAULT_MAX_BYTES, path=None):
+        '''
+        Enable the cache.
+
+        :param max_bytes: upper bound on the total size of the cached fragments
+        :param path: optional JSON file the cache is loaded from now and saved to by save()
+        '''
+        self.enabled = True
+        self.max_bytes = max_bytes
+        self.path = path
+        if path is not None:
+            self.load()
+
+    def key(self, block, *options):
+        digest = hashlib.blake2b(digest_size=16)
+        for option in options:
+            digest.update(str(option).encode("utf-8"))
+            digest.update(b"\0")
+        digest.update(block.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        html = self.entries.get(key)
+        if html is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return html
+
+    def get_refs(self, key):
+        return self.refs.get(key, [])
+
+    def put(self, key, html, refs=None, track=True):
+        '''
+        Add a rendered fragment, optionally with the (attribute, url) references it contains.
+        '''
+        if len(html) > self.max_bytes:
+            return
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+            self.refs.pop(key, None)
+        self.entries[key] = html
+        if refs:
+            self.refs[key] = refs
+        self.size += len(html)
+        if track:
+            self.added.append(key)
+        while self.size > self.max_bytes:
+            evicted_key, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.refs.pop(evicted_key, None)
+
+    def drain_updates(self):
+        '''
+        Return (and forget) the hit/miss counts and the entries added since the last drain,
+        so a worker process can hand them back to the parent's cache.
+        '''
+        updates = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": [(key, self.entries[key], self.get_refs(key)) for key in self.added if key in self.entries],
+        }
+        self.hits = 0
+        self.misses = 0
+        self.added = []
+        return updates
+
+    def absorb(self, updates):
+        self.hits += updates["hits"]
+        self.misses += updates["misses"]
+        for key, html, refs in updates["entries"]:
+            self.put(key, html, refs)
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups > 0 else 0.0
+        return f"{self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), {len(self.entries)} entries, {self.size / 1024:.0f} KiB"
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != BLOCK_CACHE_VERSION or data.get("generator") != GENERATOR_VERSION:
+            return
+        for key, html, refs in data.get("entries", []):
+            self.put(key, html, [tuple(ref) for ref in refs], track=False)
+
+    def save(self):
+        if self.path is None:
+            return
+        dir_path = os.path.dirname(self.path)
+        if dir_path != "":
+            os.makedirs(dir_path, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as file:
+            # Least recently used first, so reloading keeps the LRU order
+            entries = [(key, html, self.get_refs(key)) for key, html in self.entries.items()]
+            json.dump({"version": BLOCK_CACHE_VERSION, "generator": GENERATOR_VERSION, "entries": entries}, file)
+        os.replace(tmp_path, self.path)
+
+
+block_cache = BlockCache()
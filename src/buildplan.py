@@ -0,0 +1,116 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from copystatic import scan_tree
+from gencontent import find_markdown_files
+
+DEFAULT_SCAN_WORKERS = 4
+
+
+class PlanEntry():
+    __slots__ = ("kind", "source", "dest", "size", "mtime_ns")
+
+    def __init__(self, kind, source, dest, size, mtime_ns):
+        '''
+        Constructor for PlanEntry. One output of the build and the source it comes from.
+
+        :param kind: "page" for a markdown file that is rendered, "static" for a file that is copied
+        '''
+        self.kind = kind
+        self.source = source
+        self.dest = dest
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "source": self.source,
+            "dest": self.dest,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+        }
+
+
+class BuildPlan():
+    def __init__(self, static_dir_path, content_dir_path, dest_dir_path, static_tree, content_tree):
+        '''
+        Constructor for BuildPlan.
+        Everything a full build will do, worked out before anything is written: the output
+        directories to create, every static file to copy and every page to render.
+        Use plan_build to scan the source trees and make one.
+
+        :param static_tree: the scan_tree result for static_dir_path
+        :param content_tree: the scan_tree result for content_dir_path
+        '''
+        self.static_dir_path = static_dir_path
+        self.content_dir_path = content_dir_path
+        self.dest_dir_path = dest_dir_path
+        self.static_tree = static_tree
+        self.content_tree = content_tree
+
+        static_dirs, static_files = static_tree
+        directories = {os.path.normpath(os.path.join(dest_dir_path, rel_dir)) for rel_dir in static_dirs}
+        self.entries = []
+        for rel_path, size, mtime_ns in static_files:
+            self.entries.append(PlanEntry(
+                "static",
+                os.path.join(static_dir_path, rel_path),
+                os.path.join(dest_dir_path, rel_path),
+                size,
+                mtime_ns,
+            ))
+        file_info = {os.path.join(content_dir_path, rel_path): (size, mtime_ns) for rel_path, size, mtime_ns in content_tree[1]}
+        for from_path, dest_path in find_markdown_files(content_dir_path, dest_dir_path, tree=content_tree):
+            size, mtime_ns = file_info[from_path]
+            self.entries.append(PlanEntry("page", from_path, dest_path, size, mtime_ns))
+            directories.add(os.path.dirname(dest_path))
+        self.directories = sorted(directories)
+
+    def pages(self):
+        '''
+        :return: the (from_path, dest_path) tuples of the pages to render, as generate_pages takes them
+        '''
+        return [(entry.source, entry.dest) for entry in self.entries if entry.kind == "page"]
+
+    def static_files(self):
+        return [entry for entry in self.entries if entry.kind == "static"]
+
+    def summary(self):
+        pages = sum(1 for entry in self.entries if entry.kind == "page")
+        static_bytes = sum(entry.size for entry in self.entries if entry.kind == "static")
+        return f"{pages} pages, {len(self.entries) - pages} static files ({static_bytes / (1024 * 1024):.1f} MiB), {len(self.directories)} directories"
+
+    def to_dict(self):
+        return {
+            "static": self.static_dir_path,
+            "content": self.content_dir_path,
+            "dest": self.dest_dir_path,
+            "directories": self.directories,
+            "entries": [entry.to_dict() for entry in self.entries],
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+
+def plan_build(static_dir_path, content_dir_path, dest_dir_path, workers=DEFAULT_SCAN_WORKERS):
+    '''
+    Scan the static and content directories and return the BuildPlan of a full build.
+    The two trees are scanned at the same time and each one walks its subdirectories on up
+    to workers threads. Every file is stat'ed once, by its directory entry, and the copy and
+    render steps reuse the scan instead of walking the trees again.
+    '''
+    if workers <= 1:
+        return BuildPlan(
+            static_dir_path,
+            content_dir_path,
+            dest_dir_path,
+            scan_tree(static_dir_path),
+            scan_tree(content_dir_path),
+        )
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        static_tree = executor.submit(scan_tree, static_dir_path, workers)
+        content_tree = executor.submit(scan_tree, content_dir_path, workers)
+        return BuildPlan(static_dir_path, content_dir_path, dest_dir_path, static_tree.result(), content_tree.result())
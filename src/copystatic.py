@@ -1,23 +1,287 @@
 import os
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+from manifest import hash_file
+from fingerprint import asset_fingerprints
+from precompress import precompressor
 from logger_singleton import LoggerSingleton as logger
 
-def copy_files_recursive(source_dir_path, dest_dir_path):
+# ioctl request number for a copy-on-write clone on Linux (btrfs, xfs, ...)
+FICLONE = 0x40049409
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_COPY_WORKERS = 8
+
+def copy_files_recursive(source_dir_path, dest_dir_path, workers=DEFAULT_COPY_WORKERS, tree=None):
     '''
     Copy all files and subdirectories, nested files, etc.
+    The tree is scanned once, every destination directory is created up front, and the
+    files themselves are copied on a bounded pool of I/O threads.
     
     :param source: string representing directory to copy from
     :param dest: string representing directory to copy to
+    :param workers: maximum number of files copied at the same time
+    :param tree: the scan_tree result for source_dir_path, if it was already scanned (e.g. by a build plan)
+    :return: a CopyStats summary of the copy
+    '''
+    dir_paths, file_paths = tree if tree is not None else scan_tree(source_dir_path, workers)
+    for dir_path in dir_paths:
+        os.makedirs(os.path.join(dest_dir_path, dir_path), exist_ok=True)
+
+    stats = CopyStats()
+    def copy_one(rel_path):
+        for dest_rel_path in asset_fingerprints.dest_rel_paths(rel_path):
+            dest_path = os.path.join(dest_dir_path, dest_rel_path)
+            fast_copy(os.path.join(source_dir_path, rel_path), dest_path)
+            precompressor.submit(dest_path)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for rel_path, size, _ in file_paths:
+            stats.add(executor.submit(copy_one, rel_path), size)
+        stats.wait()
+    logger.info("Copied %s", stats.summary())
+    return stats
+
+def scan_tree(root_path, workers=1):
+    '''
+    Walk root_path with os.scandir, reusing the entry type information instead of a separate
+    stat call per entry. With workers > 1 the top level subdirectories are walked in parallel
+    on a thread pool (scandir releases the GIL while it waits on the filesystem).
+    
+    :return: a (dir_paths, file_paths) tuple of paths relative to root_path, where dir_paths
+        lists every directory (parents first, including "." for the root) and file_paths holds
+        (relative path, size, mtime_ns) tuples, each directory's files before its subdirectories
+    '''
+    file_paths, subdirs = scan_dir(root_path, ".")
+    dir_paths = ["."]
+    if workers > 1 and len(subdirs) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            subtrees = list(executor.map(lambda rel_dir: walk_subtree(root_path, rel_dir), subdirs))
+    else:
+        subtrees = [walk_subtree(root_path, rel_dir) for rel_dir in subdirs]
+    for subtree_dirs, subtree_files in subtrees:
+        dir_paths.extend(subtree_dirs)
+        file_paths.extend(subtree_files)
+    return dir_paths, file_paths
+
+def scan_dir(root_path, rel_dir):
+    '''
+    List one directory in name order.
+
+    :return: a (file_paths, subdirs) tuple, see scan_tree
+    '''
+    file_paths = []
+    subdirs = []
+    with os.scandir(os.path.join(root_path, rel_dir)) as entries:
+        for entry in sorted(entries, key=lambda entry: entry.name):
+            rel_path = os.path.normpath(os.path.join(rel_dir, entry.name))
+            if entry.is_dir():
+                subdirs.append(rel_path)
+            elif entry.is_file():
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # Deleted while we were scanning
+                    continue
+                file_paths.append((rel_path, stat.st_size, stat.st_mtime_ns))
+    return file_paths, subdirs
+
+def walk_subtree(root_path, rel_dir):
+    dir_paths = []
+    file_paths = []
+    stack = [rel_dir]
+    while stack:
+        current = stack.pop()
+        dir_paths.append(current)
+        files, subdirs = scan_dir(root_path, current)
+        file_paths.extend(files)
+        # Reversed, so the first subdirectory is popped next
+        stack.extend(reversed(subdirs))
+    return dir_paths, file_paths
+
+
+class CopyStats():
+    def __init__(self):
+        '''
+        Constructor for CopyStats.
+        Collects the copies submitted to a thread pool and summarizes how many files and bytes
+        were copied, so the copy logs one line at the end instead of one line per file.
+        '''
+        self.files = 0
+        self.bytes = 0
+        self.skipped = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.pending = []
+
+    def add(self, future, size):
+        self.pending.append((future, size))
+
+    def wait(self):
+        '''
+        Wait for every submitted copy, counting the ones that copied a file. A future that
+        returns False was skipped as unchanged. The first copy error is re-raised.
+        '''
+        for future, size in self.pending:
+            if future.result() is False:
+                self.skipped += 1
+                continue
+            self.files += 1
+            self.bytes += size
+        self.pending = []
+        self.elapsed = time.perf_counter() - self.started
+
+    def summary(self):
+        mib = self.bytes / (1024 * 1024)
+        rate = mib / self.elapsed if self.elapsed > 0 else 0.0
+        return f"{self.files} files ({mib:.1f} MiB) in {self.elapsed:.2f}s, {rate:.1f} MiB/s, {self.skipped} unchanged"
+
+def clone_file(from_fd, dest_fd):
+    '''
+    Try to make dest_fd a copy-on-write clone of from_fd. Returns False when the platform
+    or filesystem doesn't support it.
+    '''
+    try:
+        import fcntl
+        fcntl.ioctl(dest_fd, FICLONE, from_fd)
+        return True
+    except (ImportError, OSError):
+        return False
+
+def copy_file_kernel(from_fd, dest_fd, size):
+    '''
+    Copy size bytes between file descriptors inside the kernel with copy_file_range,
+    falling back to sendfile. Returns the name of the method used, or None if neither is available.
     '''
-    if not os.path.exists(dest_dir_path):
-        os.mkdir(dest_dir_path)
+    for method in ("copy_file_range", "sendfile"):
+        func = getattr(os, method, None)
+        if func is None:
+            continue
+        try:
+            copied = 0
+            while copied < size:
+                if method == "copy_file_range":
+                    sent = func(from_fd, dest_fd, min(COPY_CHUNK_SIZE, size - copied))
+                else:
+                    sent = func(dest_fd, from_fd, copied, min(COPY_CHUNK_SIZE, size - copied))
+                if sent == 0:
+                    break
+                copied += sent
+            if copied == size:
+                return method
+        except OSError:
+            pass
+        # Start over with the next method
+        os.lseek(from_fd, 0, os.SEEK_SET)
+        os.lseek(dest_fd, 0, os.SEEK_SET)
+        os.ftruncate(dest_fd, 0)
+    return None
 
-    for filename in os.listdir(source_dir_path):
-        from_path = os.path.join(source_dir_path, filename)
-        dest_path = os.path.join(dest_dir_path, filename)
-        logger.info(f" * {from_path} -> {dest_path}")
-        if os.path.isfile(from_path):
-            shutil.copy(from_path, dest_path)
+def fast_copy(from_path, dest_path, hardlink=False):
+    '''
+    Copy a single file as cheaply as the filesystem allows: a hardlink (only if requested),
+    a copy-on-write clone, an in-kernel copy, and finally a plain userspace copy.
+    The source mtime is carried over so later syncs can tell the file is unchanged.
+
+    :return: the name of the method that was used
+    '''
+    if os.path.lexists(dest_path):
+        # Never write through an existing hardlink into the source tree
+        os.remove(dest_path)
+    if hardlink:
+        try:
+            os.link(from_path, dest_path)
+            return "hardlink"
+        except OSError:
+            pass
+    stat = os.stat(from_path)
+    with open(from_path, 'rb') as source, open(dest_path, 'wb') as dest:
+        if clone_file(source.fileno(), dest.fileno()):
+            method = "reflink"
         else:
-            copy_files_recursive(from_path, dest_path)
+            method = copy_file_kernel(source.fileno(), dest.fileno(), stat.st_size)
+            if method is None:
+                shutil.copyfileobj(source, dest, COPY_CHUNK_SIZE)
+                method = "copy"
+    shutil.copymode(from_path, dest_path)
+    os.utime(dest_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    return method
+
+def is_unchanged(from_path, dest_path, checksum=False):
+    '''
+    Decide whether dest_path already holds the same file as from_path, by size and mtime
+    (or by content hash when checksum is True).
+    '''
+    try:
+        dest_stat = os.stat(dest_path)
+    except FileNotFoundError:
+        return False
+    from_stat = os.stat(from_path)
+    if from_stat.st_size != dest_stat.st_size:
+        return False
+    if checksum:
+        return hash_file(from_path) == hash_file(dest_path)
+    return from_stat.st_mtime_ns == dest_stat.st_mtime_ns
+
+def sync_files(source_dir_path, dest_dir_path, keep=frozenset(), hardlink=False, checksum=False, workers=DEFAULT_COPY_WORKERS, tree=None):
+    '''
+    Make dest_dir_path mirror source_dir_path without deleting and recopying everything.
+    Files that are unchanged in the destination are skipped, changed or new files are copied
+    with fast_copy on a bounded thread pool, and files in the destination that no longer exist
+    in the source are removed unless they are listed in keep (e.g. the pages generated into
+    the same directory).
+
+    :param keep: a set of destination paths that must not be treated as orphans
+    :param hardlink: link files into the destination instead of copying them, where possible
+    :param checksum: compare file contents instead of size and mtime
+    :param workers: maximum number of files compared and copied at the same time
+    :param tree: the scan_tree result for source_dir_path, if it was already scanned
+    :return: a (copied, skipped, removed) tuple of counts
+    '''
+    dir_paths, file_paths = tree if tree is not None else scan_tree(source_dir_path, workers)
+    for dir_path in dir_paths:
+        os.makedirs(os.path.join(dest_dir_path, dir_path), exist_ok=True)
+
+    def sync_one(rel_path):
+        from_path = os.path.join(source_dir_path, rel_path)
+        copied = False
+        for dest_rel_path in asset_fingerprints.dest_rel_paths(rel_path):
+            dest_path = os.path.join(dest_dir_path, dest_rel_path)
+            if not is_unchanged(from_path, dest_path, checksum):
+                fast_copy(from_path, dest_path, hardlink)
+                copied = True
+            precompressor.submit(dest_path)
+        return copied
+
+    stats = CopyStats()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for rel_path, size, _ in file_paths:
+            stats.add(executor.submit(sync_one, rel_path), size)
+        stats.wait()
+    # Variants still being written would look like orphans below
+    precompressor.wait()
+
+    expected = {
+        os.path.normpath(os.path.join(dest_dir_path, dest_rel_path))
+        for file_path in file_paths
+        for dest_rel_path in asset_fingerprints.dest_rel_paths(file_path[0])
+    }
+    keep = {os.path.normpath(path) for path in keep}
+    outputs = expected | keep
+    removed = 0
+    for root, dirs, files in os.walk(dest_dir_path, topdown=False):
+        for filename in files:
+            dest_path = os.path.normpath(os.path.join(root, filename))
+            if dest_path in outputs:
+                continue
+            if precompressor.is_variant(dest_path) and os.path.splitext(dest_path)[0] in outputs:
+                # A precompressed variant of a file that is still there
+                continue
+            logger.detail("orphaned files removed", " - removing orphaned %s", dest_path)
+            os.remove(dest_path)
+            removed += 1
+        if root != dest_dir_path and len(os.listdir(root)) == 0:
+            os.rmdir(root)
+    logger.info("Synced %s, %d removed", stats.summary(), removed)
+    return stats.files, stats.skipped, removed
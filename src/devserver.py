@@ -0,0 +1,210 @@
+import os
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from copystatic import fast_copy, scan_tree
+from gencontent import generate_page
+from imagesize import image_sizes
+from incremental import remove_output
+from precompress import precompressor
+from logger_singleton import LoggerSingleton as logger
+
+POLL_INTERVAL = 0.2
+LIVE_RELOAD_PATH = "/__livereload"
+LIVE_RELOAD_SCRIPT = f"""<script>
+new EventSource("{LIVE_RELOAD_PATH}").addEventListener("reload", () => location.reload());
+</script>"""
+
+
+class SiteWatcher():
+    def __init__(self, static_dir_path, content_dir_path, template_path, dest_dir_path, basepath, minify=False):
+        '''
+        Constructor for SiteWatcher.
+        Keeps a snapshot (mtime and size) of every watched source and knows which output each
+        source maps to, so a change only re-renders the page or re-copies the asset it affects.
+        Only a change to the template (or to the dimensions of an image, with image sizes on)
+        re-renders every page.
+        Watching is done by polling, which needs nothing outside the standard library.
+        '''
+        self.static_dir_path = static_dir_path
+        self.content_dir_path = content_dir_path
+        self.template_path = template_path
+        self.dest_dir_path = dest_dir_path
+        self.basepath = basepath
+        self.minify = minify
+        self.snapshot = self.scan()
+        self.version = 0
+        self.rebuilt = threading.Condition()
+
+    def scan(self):
+        snapshot = {}
+        for root in (self.static_dir_path, self.content_dir_path):
+            tree = scan_tree(root)
+            if root == self.static_dir_path:
+                # Kept to refresh the image dimensions from, see poll
+                self.static_tree = tree
+            for rel_path, size, mtime_ns in tree[1]:
+                snapshot[os.path.join(root, rel_path)] = (mtime_ns, size)
+        stat = os.stat(self.template_path)
+        snapshot[self.template_path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def output_path(self, path):
+        '''
+        Return the output a source file maps to, or None if it produces no output.
+        '''
+        if path.startswith(self.static_dir_path + os.sep):
+            return os.path.join(self.dest_dir_path, os.path.relpath(path, self.static_dir_path))
+        rel_path = os.path.relpath(path, self.content_dir_path)
+        if Path(rel_path).suffix == ".md":
+            return str(Path(self.dest_dir_path, rel_path).with_suffix(".html"))
+        return None
+
+    def rebuild(self, path):
+        dest_path = self.output_path(path)
+        if dest_path is None:
+            return
+        if path.startswith(self.static_dir_path + os.sep):
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            fast_copy(path, dest_path)
+            precompressor.submit(dest_path)
+        else:
+            generate_page(path, self.template_path, dest_path, self.basepath, self.minify)
+
+    def poll(self):
+        '''
+        Compare the sources with the last snapshot and rebuild what changed.
+
+        :return: the list of source paths that were added, changed or removed
+        '''
+        snapshot = self.scan()
+        changed = [path for path, state in snapshot.items() if self.snapshot.get(path) != state]
+        removed = [path for path in self.snapshot if path not in snapshot]
+        self.snapshot = snapshot
+        if len(changed) == 0 and len(removed) == 0:
+            return []
+
+        started = time.perf_counter()
+        rerender = self.template_path in changed
+        static_prefix = self.static_dir_path + os.sep
+        if image_sizes.enabled and any(path.startswith(static_prefix) for path in changed + removed):
+            # Pages only show new image dimensions once they are rendered again
+            digest = image_sizes.digest
+            image_sizes.index(self.static_tree)
+            rerender = rerender or image_sizes.digest != digest
+        if rerender:
+            # get_template notices the new mtime and recompiles on the first page. Static
+            # files changed in the same poll still have to be copied.
+            pages = [
+                path for path in snapshot
+                if path.startswith(self.content_dir_path + os.sep) and path not in changed
+            ]
+            changed = [path for path in changed if path != self.template_path] + pages
+        for path in removed:
+            dest_path = self.output_path(path)
+            if dest_path is not None:
+                remove_output(dest_path)
+        for path in changed:
+            try:
+                self.rebuild(path)
+            except Exception as e:
+                logger.warn("failed to rebuild %s: %s", path, e)
+        # Reload only once the variants a host would serve are up to date too
+        precompressor.wait()
+        elapsed = (time.perf_counter() - started) * 1000
+        logger.info("Rebuilt %d changed and removed %d sources in %.1fms", len(changed), len(removed), elapsed)
+
+        with self.rebuilt:
+            self.version += 1
+            self.rebuilt.notify_all()
+        return changed + removed
+
+    def watch(self, stop_event):
+        while not stop_event.is_set():
+            try:
+                self.poll()
+            except OSError as e:
+                # e.g. an editor replacing a file mid-save, the next poll picks it up
+                logger.warn("watch: %s", e)
+            stop_event.wait(POLL_INTERVAL)
+
+
+class LiveReloadHandler(SimpleHTTPRequestHandler):
+    '''
+    Serves the output directory, injects the live reload script into HTML pages and
+    streams a "reload" server-sent event to the pages whenever the watcher rebuilds something.
+    '''
+    watcher = None
+
+    def do_GET(self):
+        if self.path == LIVE_RELOAD_PATH:
+            return self.send_reload_events()
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.split("?", 1)[0].endswith("/"):
+            path = os.path.join(path, "index.html")
+        if path.endswith(".html") and os.path.isfile(path):
+            return self.send_html(path)
+        return super().do_GET()
+
+    def send_html(self, path):
+        with open(path, 'rb') as file:
+            body = file.read()
+        body = body.replace(b"</body>", LIVE_RELOAD_SCRIPT.encode("utf-8") + b"</body>", 1)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_reload_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        watcher = self.watcher
+        with watcher.rebuilt:
+            version = watcher.version
+        try:
+            while True:
+                with watcher.rebuilt:
+                    watcher.rebuilt.wait_for(lambda: watcher.version != version, timeout=15)
+                    current = watcher.version
+                if current != version:
+                    version = current
+                    self.wfile.write(b"event: reload\ndata: {}\n\n")
+                else:
+                    # Keep idle connections alive through proxies
+                    self.wfile.write(b": ping\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        logger.detail("requests served", "serve: " + format, *args)
+
+
+def serve_and_watch(static_dir_path, content_dir_path, template_path, dest_dir_path, basepath, port, minify=False):
+    '''
+    Watch the sources and serve dest_dir_path on port from the same process, rebuilding only
+    the affected outputs on every change and telling open pages to reload.
+    Blocks until interrupted.
+    '''
+    watcher = SiteWatcher(static_dir_path, content_dir_path, template_path, dest_dir_path, basepath, minify)
+    handler = type("Handler", (LiveReloadHandler,), {"watcher": watcher})
+    server = ThreadingHTTPServer(("", port), partial(handler, directory=dest_dir_path))
+    server.daemon_threads = True
+    stop_event = threading.Event()
+    watch_thread = threading.Thread(target=watcher.watch, args=(stop_event,), daemon=True)
+    watch_thread.start()
+    print(f"Serving {dest_dir_path} on http://localhost:{port}/ and watching for changes")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        server.server_close()
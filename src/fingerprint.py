@@ -0,0 +1,165 @@
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote
+
+from manifest import hash_bytes, hash_file
+from logger_singleton import LoggerSingleton as logger
+
+ASSET_MANIFEST_VERSION = 1
+# Long enough that two versions of a file never share a name in practice
+FINGERPRINT_LENGTH = 10
+DEFAULT_HASH_WORKERS = 4
+# Assets that are only ever reached through links in the pages; files fetched at fixed
+# URLs (favicon.ico, robots.txt, ...) keep their names
+FINGERPRINT_SUFFIXES = frozenset((
+    ".css", ".js", ".mjs", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".svg",
+    ".woff", ".woff2", ".ttf", ".otf", ".mp4", ".webm",
+))
+URL_SUFFIX = re.compile(r"[?#]")
+
+
+def fingerprinted_path(rel_path, digest):
+    '''
+    Return rel_path with the start of digest inserted before its suffix, e.g.
+    images/tom.png -> images/tom.3f2a9c1b04.png
+    '''
+    root, suffix = os.path.splitext(rel_path)
+    return f"{root}.{digest[:FINGERPRINT_LENGTH]}{suffix}"
+
+
+def url_path(rel_path):
+    return "/" + quote(rel_path.replace(os.sep, "/"))
+
+
+class AssetFingerprints():
+    def __init__(self):
+        '''
+        Constructor for AssetFingerprints.
+        Maps every fingerprintable static file to a name that contains its content hash, so
+        the files can be served with far-future cache headers: a changed file gets a new
+        URL instead of going stale in browser caches. Static files are copied to the new
+        names, and root-relative href/src values are rewritten to them while the template
+        is compiled and while pages are emitted (see get_template and emit_hooks).
+        The files are copied under their original names too, so whatever still asks for the
+        plain URL (url() in stylesheets, scripts, external links) keeps working.
+        Hashes are kept in the asset manifest with the size and mtime they were computed
+        for, so the next build only hashes files that changed.
+        Disabled until configure() is called.
+        '''
+        self.reset()
+
+    def reset(self):
+        '''
+        Forget the hashes, the URL map and the configuration; fingerprinting is off again.
+        '''
+        self.enabled = False
+        self.path = None
+        # rel_path -> [size, mtime_ns, digest], from the previous build until build() runs
+        self.hashes = {}
+        # Source rel_path -> fingerprinted rel_path, and the same as root-relative URLs
+        self.paths = {}
+        self.urls = {}
+        # Changes whenever any URL changes, for cache keys and manifest invalidation
+        self.digest = None
+        self.hashed = 0
+        self.reused = 0
+
+    def configure(self, path=None):
+        '''
+        :param path: string representing the JSON asset manifest, loaded now and written by save()
+        '''
+        self.enabled = True
+        self.path = path
+        if path is None or not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            # A corrupt manifest only costs us hashing every asset again
+            return
+        if data.get("version") == ASSET_MANIFEST_VERSION:
+            self.hashes = data.get("files", {})
+
+    def build(self, static_dir_path, tree, workers=DEFAULT_HASH_WORKERS):
+        '''
+        Hash the fingerprintable files in tree on a thread pool (hashlib releases the GIL
+        while it hashes) and work out their fingerprinted names. Files whose size and mtime
+        match the previous build keep their recorded hash without being read.
+
+        :param tree: the scan_tree result for static_dir_path
+        '''
+        _, file_paths = tree
+        previous = self.hashes
+        hashes = {}
+        pending = []
+        for rel_path, size, mtime_ns in file_paths:
+            if os.path.splitext(rel_path)[1].lower() not in FINGERPRINT_SUFFIXES:
+                continue
+            entry = previous.get(rel_path)
+            if entry is not None and entry[0] == size and entry[1] == mtime_ns:
+                hashes[rel_path] = entry
+                self.reused += 1
+            else:
+                pending.append((rel_path, size, mtime_ns))
+        if len(pending) > 0:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                digests = executor.map(lambda file_path: hash_file(os.path.join(static_dir_path, file_path[0])), pending)
+                for (rel_path, size, mtime_ns), digest in zip(pending, digests):
+                    hashes[rel_path] = [size, mtime_ns, digest]
+            self.hashed += len(pending)
+        self.hashes = hashes
+        self.paths = {rel_path: fingerprinted_path(rel_path, entry[2]) for rel_path, entry in hashes.items()}
+        self.urls = {url_path(rel_path): url_path(dest) for rel_path, dest in self.paths.items()}
+        self.digest = hash_bytes(json.dumps(self.urls, sort_keys=True))[:16]
+        logger.info("Fingerprinted %s", self.summary())
+
+    def dest_rel_paths(self, rel_path):
+        '''
+        Return the names the static file at rel_path is copied to: its own name, followed by
+        its fingerprinted name if it has one.
+        '''
+        fingerprinted = self.paths.get(rel_path)
+        if fingerprinted is None:
+            return (rel_path,)
+        return (rel_path, fingerprinted)
+
+    def rewrite(self, url):
+        '''
+        Return the fingerprinted form of a root-relative url (query and fragment are kept),
+        or url itself if it doesn't point at a fingerprinted file. The path may be written
+        percent-encoded or not ("/a%20b.png" and "/a b.png" are the same file).
+        '''
+        match = URL_SUFFIX.search(url)
+        end = len(url) if match is None else match.start()
+        path = url[:end]
+        fingerprinted = self.urls.get(path)
+        if fingerprinted is None:
+            fingerprinted = self.urls.get(quote(unquote(path)))
+            if fingerprinted is None:
+                return url
+        return fingerprinted + url[end:]
+
+    def save(self):
+        if self.path is None:
+            return
+        dir_path = os.path.dirname(self.path)
+        if dir_path != "":
+            os.makedirs(dir_path, exist_ok=True)
+        data = {
+            "version": ASSET_MANIFEST_VERSION,
+            "urls": self.urls,
+            "files": self.hashes,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(data, file, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def summary(self):
+        return f"{len(self.paths)} assets ({self.hashed} hashed, {self.reused} unchanged)"
+
+
+asset_fingerprints = AssetFingerprints()
@@ -1,10 +1,42 @@
+import io
 import os
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-from markdown_blocks import markdown_to_html_node
+from htmlnode import write_html
+from markdown_blocks import BlockReader, block_to_html_node
+from page_template import get_template
+from instrument import stats, count_nodes, CountingWriter
+from blockcache import block_cache
+from copystatic import scan_tree
+from manifest import hash_file
+from rendercache import render_cache
+from outputs import output_writer
+from linkindex import link_index
+from precompress import precompressor
+from fingerprint import asset_fingerprints
+from imagesize import image_sizes
 from logger_singleton import LoggerSingleton as logger
 
 DEFAULT_TITLE = "My Statically Generated Site"
+# Below this many pages, process pool startup costs more than it saves
+PARALLEL_MIN_PAGES = 32
+CHUNKS_PER_JOB = 4
+
+
+class PageGenerationError(Exception):
+    def __init__(self, errors):
+        '''
+        Raised once a batch of pages has been rendered and at least one of them failed.
+
+        :param errors: a list of (from_path, error message) tuples
+        '''
+        self.errors = errors
+        details = "\n".join(f"  {path}: {message}" for path, message in errors)
+        super().__init__(f"failed to generate {len(errors)} page(s):\n{details}")
+
 
 def extract_title(markdown):
     '''
@@ -18,49 +50,307 @@ def extract_title(markdown):
     return DEFAULT_TITLE
 
 
-def generate_page(from_path, template_path, dest_path, basepath):
-    '''
-    Read the markdown file at from_path and store the contents in a variable.
-    Read the template file at template_path and store the contents in a variable.
-    Use markdown_to_html_node function and .to_html() method to convert the markdown file to an HTML string.
-    Use the extract_title function to grab the title of the page.
-    Replace the {{ Title }} and {{ Content }} placeholders in the template.
-    Write the new full HTML page to a file at dest_path. 
-    Create any necessary directories if they don't exist.
-    '''
-    logger.info(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    with open(from_path, 'r') as file:
-        markdown_content = file.read()
-    with open(template_path, 'r') as file:
-        template = file.read()
-    
-    node = markdown_to_html_node(markdown_content)
-    html = node.to_html()
-
-    title = extract_title(markdown_content)
-    template = template.replace(r"{{ Title }}", title, 1)
-    template = template.replace(r"{{ Content }}", html, 1)
-    template = template.replace('href="/', f'href="{basepath}')
-    template = template.replace('src="/', f'src="{basepath}')
-    dest_dir_path = os.path.dirname(dest_path)
-    if dest_dir_path != "":
-        os.makedirs(dest_dir_path, exist_ok=True)
-    with open(dest_path, 'w') as file:
-        file.write(template)
-
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath):
+def render_page(markdown, template, basepath, refs=None, rewrite=None, image_props=None):
+    '''
+    Convert a markdown document to a full HTML page using a CompiledTemplate.
+    Root-relative links in the content are rewritten to basepath while the HTML is emitted,
+    and the content is minified if the template was compiled with minify.
+
+    :param refs: if given, a list the (attribute, url) references in the content are appended to
+    :param rewrite: if given, applied to root-relative href/src values in the content, see emit_hooks
+    :param image_props: if given, supplies the props of every <img> in the content, see emit_hooks
+    '''
+    parts = []
+    write_page(io.StringIO(markdown), template, basepath, parts.append, refs, rewrite, image_props)
+    return "".join(parts)
+
+def write_page(lines, template, basepath, write, refs=None, rewrite=None, image_props=None):
+    '''
+    Same as render_page, but read the markdown lazily from lines (e.g. an open file) and
+    stream the page to write, one block at a time.
+    The title slot usually comes before the content, so raw blocks are only held back until
+    the title line has been seen; after that each block is converted, written and dropped.
+
+    :param lines: an iterable of markdown lines with their line endings
+    :param write: a callable taking a string, e.g. the write method of an open file
+    '''
+    reader = BlockReader(lines)
+    blocks = iter(reader)
+    if stats.enabled:
+        blocks = timed_blocks(blocks)
+    pending = []
+    for block in blocks:
+        pending.append(block)
+        if reader.title is not None:
+            break
+    title = reader.title
+    if title is None:
+        logger.warn("no title extracted, using default")
+        title = DEFAULT_TITLE
+
+    def write_content(content_write):
+        content_write("<div>")
+        for block in pending:
+            write_block(block, basepath, content_write, template.minify, refs, rewrite, image_props)
+        pending.clear()
+        for block in blocks:
+            write_block(block, basepath, content_write, template.minify, refs, rewrite, image_props)
+        content_write("</div>")
+
+    template.render_to(write, Title=title, Content=write_content)
+
+def write_block(block, basepath, write, minify=False, refs=None, rewrite=None, image_props=None):
+    '''
+    Convert one markdown block and write its HTML. When the block cache is enabled, the
+    fragment is looked up by block content first and only rendered on a miss; its references
+    are cached with it, so a hit still reports them to refs.
+    '''
+    if not block_cache.enabled:
+        node = convert_block(block)
+        with stats.timer("html_emit"):
+            write_html(node, write, basepath, minify, refs, rewrite, image_props)
+        return
+    key = block_cache.key(block, basepath, *render_options(minify, refs is not None, rewrite, image_props))
+    html = block_cache.get(key)
+    if html is None:
+        node = convert_block(block)
+        block_refs = [] if refs is not None else None
+        with stats.timer("html_emit"):
+            parts = []
+            write_html(node, parts.append, basepath, minify, block_refs, rewrite, image_props)
+            html = "".join(parts)
+        block_cache.put(key, html, block_refs)
+        if refs is not None:
+            refs.extend(block_refs)
+    elif refs is not None:
+        refs.extend(block_cache.get_refs(key))
+    write(html)
+
+def emit_hooks():
+    '''
+    Return the hooks the configured build hands to write_page (and on to write_html) as
+    keyword arguments: the fingerprinted asset URL rewrite when fingerprinting is on, and
+    the image dimension (and lazy loading) attributes when image sizes are on.
+    The HTML nodes themselves never look at build configuration.
+    '''
+    return {
+        "rewrite": asset_fingerprints.rewrite if asset_fingerprints.enabled else None,
+        "image_props": image_sizes.with_dimensions if image_sizes.enabled else None,
+    }
+
+def render_options(minify, links=False, rewrite=None, image_props=None):
+    '''
+    Return the render options, besides the basepath, that cache keys have to cover.
+    Options that are off add nothing, so turning on a new one doesn't invalidate old entries.
+    Collecting links doesn't change the HTML, but entries made without it lack the references.
+    The hooks are the ones from emit_hooks: fingerprinted asset URLs are covered by the
+    digest of every URL, so any asset change invalidates the entries (any block may link to
+    any asset). Image dimensions work the same way.
+    '''
+    options = ()
+    if minify:
+        options += ("minify",)
+    if rewrite is not None:
+        options += ("assets", asset_fingerprints.digest)
+    if image_props is not None:
+        options += ("images", image_sizes.digest)
+    if links:
+        options += ("links",)
+    return options
+
+def convert_block(block):
+    with stats.timer("inline_parse"):
+        node = block_to_html_node(block)
+    if stats.enabled:
+        stats.count("blocks")
+        stats.count("nodes", count_nodes(node))
+    return node
+
+def timed_blocks(blocks):
+    '''
+    Wrap a block iterator so the time spent reading and splitting blocks is recorded.
+    Only used when instrumentation is enabled.
+    '''
+    while True:
+        with stats.timer("block_split"):
+            block = next(blocks, None)
+        if block is None:
+            return
+        yield block
+
+def generate_page(from_path, template_path, dest_path, basepath, minify=False):
+    '''
+    Open the markdown file at from_path, it is read lazily while the page is written.
+    Look up the compiled template for template_path (it is only read and parsed once per process).
+    If the render cache is enabled and already holds this exact page, copy it and stop there.
+    Otherwise stream the page with write_page, filling the {{ Title }} and {{ Content }} slots.
+    Write the new full HTML page to a file at dest_path, atomically through output_writer,
+    which also creates any necessary directories.
+    '''
+    logger.detail("pages generated", "Generating page from %s to %s using %s", from_path, dest_path, template_path)
+    started = time.perf_counter()
+    with stats.timer("template"):
+        template = get_template(template_path, basepath, minify)
+    hooks = emit_hooks()
+    refs = None
+    if link_index.enabled:
+        refs = []
+        link_index.record_template(template_path, template.refs)
+
+    cache_key = None
+    if render_cache.enabled:
+        with stats.timer("read"):
+            options = render_options(minify, refs is not None, **hooks)
+            cache_key = render_cache.key(hash_file(from_path), template.source_hash, basepath, *options)
+        cached_path = render_cache.lookup(cache_key)
+        if cached_path is not None:
+            with stats.timer("write"):
+                output_writer.copy(cached_path, dest_path)
+            if refs is not None:
+                link_index.record(dest_path, render_cache.lookup_refs(cache_key) or [])
+            if stats.enabled:
+                stats.count("pages")
+                stats.record_page(from_path, time.perf_counter() - started)
+            return
+
+    with stats.timer("read"):
+        source = open(from_path, 'r')
+    with source, output_writer.open(dest_path) as file:
+        if stats.enabled:
+            # Each chunk still goes straight to the file; its write is timed as a stage of
+            # its own instead of inside html_emit
+            writer = CountingWriter(file.write, stats)
+            write_page(source, template, basepath, writer.write, refs, **hooks)
+            with stats.timer("write"):
+                file.flush()
+            stats.count("bytes_written", writer.bytes_written)
+        else:
+            write_page(source, template, basepath, file.write, refs, **hooks)
+            file.flush()
+    if refs is not None:
+        link_index.record(dest_path, refs)
+    if cache_key is not None:
+        render_cache.store(cache_key, dest_path, refs)
+    if stats.enabled:
+        stats.count("pages")
+        stats.record_page(from_path, time.perf_counter() - started)
+
+def find_markdown_files(dir_path_content, dest_dir_path, workers=1, tree=None):
+    '''
+    Crawl every entry in the content directory and collect the markdown files to render.
+    Discovery is kept separate from rendering so the pages can be handed out to workers.
+
+    :param workers: threads used to walk the subdirectories of the content directory, see scan_tree
+    :param tree: the scan_tree result for dir_path_content, if it was already scanned
+    :return: a list of (from_path, dest_path) tuples in a stable, sorted order
+    '''
+    _, file_paths = tree if tree is not None else scan_tree(dir_path_content, workers)
+    pages = []
+    for rel_path in sorted((file_path[0] for file_path in file_paths), key=lambda path: path.split(os.sep)):
+        if Path(rel_path).suffix == ".md":
+            pages.append((os.path.join(dir_path_content, rel_path), page_dest_path(dest_dir_path, rel_path)))
+    return pages
+
+def page_dest_path(dest_dir_path, rel_path):
+    '''
+    Return where the markdown file at rel_path (relative to the content directory) is rendered to.
+    '''
+    return str(Path(dest_dir_path, rel_path).with_suffix(".html"))
+
+def generate_page_chunk(pages, template_path, basepath, collect_stats=False, worker=False, minify=False):
+    '''
+    Render a chunk of pages, capturing failures instead of aborting the whole chunk.
+
+    :param collect_stats: record instrumentation for the chunk and return it (used by worker processes)
+    :param worker: True when running in a pool worker, whose cache updates are handed back
+    :return: a dict with the list of (from_path, error message) tuples for the pages that
+        failed under "errors", plus the instrumentation snapshot and cache updates a worker
+        hands back to the parent process
+    '''
+    if collect_stats:
+        stats.enable()
+        stats.reset()
+    errors = []
+    for from_path, dest_path in pages:
+        try:
+            generate_page(from_path, template_path, dest_path, basepath, minify)
+        except Exception as e:
+            errors.append((from_path, f"{type(e).__name__}: {e}"))
+    # Workers can't hand their summary counts back, log them per chunk
+    logger.flush_summary()
+    result = {"errors": errors}
+    if collect_stats:
+        result["stats"] = stats.snapshot()
+    if worker and block_cache.enabled:
+        result["block_cache"] = block_cache.drain_updates()
+    if worker and render_cache.enabled:
+        result["render_cache"] = render_cache.drain_counts()
+    if worker:
+        result["outputs"] = output_writer.drain_counts()
+    if worker and precompressor.enabled:
+        result["precompress"] = precompressor.drain_counts()
+    if worker and link_index.enabled:
+        result["links"] = link_index.drain()
+    if worker and image_sizes.enabled:
+        result["image_sizes"] = image_sizes.drain()
+    return result
+
+def merge_chunk_result(result):
+    '''
+    Fold what a worker process handed back from generate_page_chunk into this process.
+
+    :return: the list of errors in the chunk
+    '''
+    if "stats" in result:
+        stats.merge(result["stats"])
+    if "block_cache" in result:
+        block_cache.absorb(result["block_cache"])
+    if "render_cache" in result:
+        render_cache.absorb(result["render_cache"])
+    if "outputs" in result:
+        output_writer.absorb(result["outputs"])
+    if "precompress" in result:
+        precompressor.absorb(result["precompress"])
+    if "links" in result:
+        link_index.absorb(result["links"])
+    if "image_sizes" in result:
+        image_sizes.absorb(result["image_sizes"])
+    return result["errors"]
+
+def generate_pages(pages, template_path, basepath, jobs=1, minify=False):
+    '''
+    Render every (from_path, dest_path) pair in pages.
+    With jobs > 1 the pages are split into chunks and fanned out to a process pool,
+    unless there are too few pages for the pool startup cost to pay off.
+    Errors are collected per file and raised together once every page has been attempted.
+
+    :param jobs: number of worker processes, 0 means one per CPU
+    :param minify: emit compact HTML, see CompiledTemplate and write_minified_html
+    '''
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    if jobs <= 1 or len(pages) < PARALLEL_MIN_PAGES:
+        errors = generate_page_chunk(pages, template_path, basepath, minify=minify)["errors"]
+    else:
+        chunk_size = max(1, math.ceil(len(pages) / (jobs * CHUNKS_PER_JOB)))
+        chunks = [pages[i:i + chunk_size] for i in range(0, len(pages), chunk_size)]
+        logger.info("Rendering %d pages in %d chunks on %d processes", len(pages), len(chunks), jobs)
+        errors = []
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(generate_page_chunk, chunk, template_path, basepath, stats.enabled, True, minify)
+                for chunk in chunks
+            ]
+            for future in futures:
+                errors.extend(merge_chunk_result(future.result()))
+    if len(errors) > 0:
+        raise PageGenerationError(errors)
+
+def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath, jobs=1, minify=False):
     '''
     Crawl every entry in the content directory
     For each markdown file found, generate a new .html file using the same template.html.
     The generated pages should be written to the public directory in the same directory structure.
     '''
-    for filename in os.listdir(dir_path_content):
-        from_path = os.path.join(dir_path_content, filename)
-        dest_path = os.path.join(dest_dir_path, filename)
-        if os.path.isfile(from_path):
-            if Path(dest_path).suffix == ".md":
-                dest_path = Path(dest_path).with_suffix(".html")
-                generate_page(from_path, template_path, dest_path, basepath)
-        else:
-            generate_pages_recursive(from_path, template_path, dest_path, basepath)
-    
\ No newline at end of file
+    pages = find_markdown_files(dir_path_content, dest_dir_path)
+    generate_pages(pages, template_path, basepath, jobs, minify)
@@ -1,4 +1,164 @@
+import re
+import sys
+
+
+URL_ATTRIBUTES = ("href", "src")
+# Whitespace inside these is significant and never collapsed when minifying
+PREFORMATTED_TAGS = frozenset(("pre", "code", "textarea", "script", "style"))
+# Elements that have no closing tag in HTML
+VOID_TAGS = frozenset(("area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"))
+WHITESPACE_RUN = re.compile(r"\s+")
+
+
+def rewrite_url(attribute, value, basepath, rewrite=None):
+    '''
+    Point a root-relative href/src value at basepath instead of "/", after passing it through
+    rewrite if given (e.g. AssetFingerprints.rewrite). Other attributes and values are
+    returned unchanged.
+    '''
+    if basepath is not None and attribute in URL_ATTRIBUTES and isinstance(value, str) and value.startswith("/"):
+        if rewrite is not None:
+            value = rewrite(value)
+        return basepath + value[1:]
+    return value
+
+
+def collect_refs(props, refs):
+    '''
+    Append an (attribute, url) tuple to refs for every href/src in props, as written in the
+    source (before any basepath rewrite).
+    '''
+    for attribute in URL_ATTRIBUTES:
+        value = props.get(attribute)
+        if value is not None:
+            refs.append((attribute, value))
+
+
+def attributes_html(props, basepath=None, rewrite=None):
+    '''
+    Render props as HTML attributes, see rewrite_url for basepath and rewrite.
+    '''
+    if props is None or len(props) == 0:
+        return ""
+    return "".join(
+        f' {k}="{rewrite_url(k, v, basepath, rewrite)}"' for k, v in props.items()
+    )
+
+
+def node_attributes(node, basepath, rewrite, image_props):
+    '''
+    Render the attributes of node, with the props of an <img> passed through image_props first
+    if given (e.g. ImageSizes.with_dimensions).
+    '''
+    if image_props is not None and node.tag == "img":
+        return attributes_html(image_props(node.props or {}), basepath, rewrite)
+    return attributes_html(node.props, basepath, rewrite)
+
+
+def write_html(node, write, basepath=None, minify=False, refs=None, rewrite=None, image_props=None):
+    '''
+    Serialize node and all of its descendants by passing successive chunks of HTML to write.
+    The tree is walked iteratively with an explicit stack, so arbitrarily deep nesting never
+    hits the recursion limit, and no intermediate strings are built for subtrees.
+    
+    :param node: the root HTMLNode to serialize
+    :param write: a callable taking a string, e.g. the write method of an open file or list.append
+    :param basepath: if given, root-relative href/src values are rewritten to start with it
+    :param minify: emit compact HTML, see write_minified_html
+    :param refs: if given, a list the href/src references of the emitted nodes are appended to, see collect_refs
+    :param rewrite: if given, a callable applied to root-relative href/src values before the basepath, see rewrite_url
+    :param image_props: if given, a callable that returns the props to emit for an <img>, see node_attributes
+    '''
+    if minify:
+        write_minified_html(node, write, basepath, refs, rewrite, image_props)
+        return
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            # A closing tag pushed when its parent was opened
+            write(item)
+        elif isinstance(item, ParentNode):
+            if item.tag is None:
+                raise ValueError("invalid HTML: no tag")
+            if item.children is None:
+                raise ValueError("invalid HTML: no children")
+            write(f"<{item.tag}{node_attributes(item, basepath, rewrite, image_props)}>")
+            if refs is not None and item.props:
+                collect_refs(item.props, refs)
+            stack.append(f"</{item.tag}>")
+            stack.extend(reversed(item.children))
+        elif isinstance(item, LeafNode) and item.tag is not None:
+            if item.value is None:
+                raise ValueError("invalid HTML: no value")
+            write(f"<{item.tag}{node_attributes(item, basepath, rewrite, image_props)}>{item.value}</{item.tag}>")
+            if refs is not None and item.props:
+                collect_refs(item.props, refs)
+        else:
+            write(item.to_html(basepath, rewrite))
+            if refs is not None and item.props:
+                collect_refs(item.props, refs)
+
+
+def has_whitespace_run(text):
+    # Substring checks are much cheaper than running the regex on every text node
+    return "  " in text or "\n" in text or "\t" in text or "\r" in text
+
+
+def write_minified_html(node, write, basepath=None, refs=None, rewrite=None, image_props=None):
+    '''
+    Same as write_html, but runs of whitespace in text are collapsed to a single space and
+    empty void elements (e.g. img) are written without a closing tag. Text inside pre and
+    code elements is written exactly as it is.
+    '''
+    stack = [node]
+    preformatted = 0
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            write(item)
+        elif isinstance(item, tuple):
+            # The closing tag of a preformatted element
+            preformatted -= 1
+            write(item[0])
+        elif isinstance(item, ParentNode):
+            if item.tag is None:
+                raise ValueError("invalid HTML: no tag")
+            if item.children is None:
+                raise ValueError("invalid HTML: no children")
+            write(f"<{item.tag}{node_attributes(item, basepath, rewrite, image_props)}>")
+            if refs is not None and item.props:
+                collect_refs(item.props, refs)
+            if item.tag in PREFORMATTED_TAGS:
+                preformatted += 1
+                stack.append((f"</{item.tag}>",))
+            else:
+                stack.append(f"</{item.tag}>")
+            stack.extend(reversed(item.children))
+        elif isinstance(item, LeafNode):
+            if item.value is None:
+                raise ValueError("invalid HTML: no value")
+            if refs is not None and item.props:
+                collect_refs(item.props, refs)
+            value = item.value
+            if preformatted == 0 and item.tag not in PREFORMATTED_TAGS and has_whitespace_run(value):
+                value = WHITESPACE_RUN.sub(" ", value)
+            if item.tag is None:
+                write(value)
+            elif item.tag in VOID_TAGS and value == "":
+                write(f"<{item.tag}{node_attributes(item, basepath, rewrite, image_props)}>")
+            else:
+                write(f"<{item.tag}{node_attributes(item, basepath, rewrite, image_props)}>{value}</{item.tag}>")
+        else:
+            write(item.to_html(basepath, rewrite))
+            if refs is not None and item.props:
+                collect_refs(item.props, refs)
+
+
 class HTMLNode():
+    # Nodes are created by the million on large sites, so no per-instance __dict__
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         '''
         Constructor for HTMLNode. 
@@ -12,27 +172,31 @@ class HTMLNode():
         :param children: A list of HTMLNode objects representing the children of this node
         :param props: A dictionary of key-value pairs representing the attributes of the HTML tag
         '''
-        self.tag = tag
+        # Tags come from a tiny vocabulary, share one string object per tag name
+        self.tag = sys.intern(tag) if type(tag) is str else tag
         self.value = value
         self.children = children
         self.props = props
 
-    def to_html(self):
+    def to_html(self, basepath=None, rewrite=None):
         raise NotImplementedError("to_html method is not yet implemented")
     
-    def props_to_html(self):
-        if self.props is None or len(self.props) == 0:
-            return ""
-        result = ""
-        for k, v in self.props.items():
-            result += f' {k}="{v}"'
-        return result
+    def props_to_html(self, basepath=None, rewrite=None):
+        '''
+        Render the props as HTML attributes.
+        
+        :param basepath: if given, root-relative href/src values are rewritten to start with it instead of "/"
+        :param rewrite: if given, a callable applied to root-relative href/src values first, see rewrite_url
+        '''
+        return attributes_html(self.props, basepath, rewrite)
     
     def __repr__(self):
         return f"HTMLNode({self.tag}, {self.value}, children: {self.children}, {self.props})"
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
         '''
         Constructor for LeafNode. 
@@ -44,18 +208,20 @@ class LeafNode(HTMLNode):
         '''
         super().__init__(tag, value, None, props)
 
-    def to_html(self):
+    def to_html(self, basepath=None, rewrite=None):
         if self.value is None:
             raise ValueError("invalid HTML: no value")
         if self.tag is None:
             return self.value
-        return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
+        return f"<{self.tag}{self.props_to_html(basepath, rewrite)}>{self.value}</{self.tag}>"
     
     def __repr__(self):
         return f"LeafNode({self.tag}, {self.value}, {self.props})"
 
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         '''
         Constructor for ParentNode. 
@@ -67,15 +233,14 @@ class ParentNode(HTMLNode):
         '''
         super().__init__(tag, None, children, props)
 
-    def to_html(self):
+    def to_html(self, basepath=None, rewrite=None):
         if self.tag is None:
             raise ValueError("invalid HTML: no tag")
         if self.children is None:
             raise ValueError("invalid HTML: no children")
-        children_html = ""
-        for child in self.children:
-            children_html += child.to_html()
-        return f"<{self.tag}{self.props_to_html()}>{children_html}</{self.tag}>"
+        parts = []
+        write_html(self, parts.append, basepath, rewrite=rewrite)
+        return "".join(parts)
     
     def __repr__(self):
         return f"ParentNode({self.tag}, children: {self.children}, {self.props})"
@@ -0,0 +1,237 @@
+import json
+import os
+import posixpath
+import re
+import struct
+from urllib.parse import unquote
+
+from manifest import hash_bytes
+from logger_singleton import LoggerSingleton as logger
+
+IMAGE_SIZE_CACHE_VERSION = 1
+IMAGE_SUFFIXES = frozenset((".png", ".jpg", ".jpeg", ".gif"))
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Start of frame markers hold the dimensions; DHT (C4), JPG (C8) and DAC (CC) share the range
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Markers without a length field: TEM, RST0-7 and SOI
+JPEG_STANDALONE_MARKERS = frozenset(range(0xD0, 0xD9)) | {0x01}
+JPEG_END_MARKERS = frozenset((0xD9, 0xDA))
+URL_SUFFIX = re.compile(r"[?#]")
+
+
+def read_image_size(path):
+    '''
+    Read the intrinsic dimensions of a PNG, GIF or JPEG image from its header, without
+    reading the image data (for a JPEG, only the segment headers before the frame header
+    are read, the segments themselves are skipped with seeks).
+
+    :return: a (width, height) tuple, or None if the format isn't recognized
+    '''
+    with open(path, 'rb') as file:
+        header = file.read(24)
+        if header.startswith(PNG_SIGNATURE) and header[12:16] == b"IHDR":
+            return struct.unpack(">II", header[16:24])
+        if header[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", header[6:10])
+        if header[:2] == b"\xff\xd8":
+            file.seek(2)
+            return read_jpeg_size(file)
+    return None
+
+def read_jpeg_size(file):
+    while True:
+        marker = file.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        while code == 0xFF:
+            # Fill bytes before the marker code
+            fill = file.read(1)
+            if fill == b"":
+                return None
+            code = fill[0]
+        if code in JPEG_END_MARKERS:
+            # End of image or start of scan without a frame header
+            return None
+        if code in JPEG_STANDALONE_MARKERS:
+            continue
+        length = file.read(2)
+        if len(length) < 2:
+            return None
+        if code in JPEG_SOF_MARKERS:
+            frame = file.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">xHH", frame)
+            return width, height
+        file.seek(struct.unpack(">H", length)[0] - 2, os.SEEK_CUR)
+
+
+class ImageSizes():
+    def __init__(self):
+        '''
+        Constructor for ImageSizes.
+        Supplies width and height attributes for <img> elements whose src is a root-relative
+        URL of a PNG, GIF or JPEG in the static directory, so browsers can reserve the space
+        before the image arrives. The dimensions are read from the image headers the first
+        time an image is referenced and cached with the size and mtime of the file, across
+        builds if a cache path is given. Optionally adds loading="lazy" and decoding="async".
+        Pages get the attributes through with_dimensions, which emit_hooks hands to write_html.
+        Disabled until configure() is called.
+        '''
+        self.reset()
+
+    def reset(self):
+        '''
+        Forget the known dimensions and the configuration, leaving image sizes disabled.
+        '''
+        self.enabled = False
+        self.static_dir_path = None
+        self.path = None
+        self.lazy = False
+        # "images/tom.png" -> [size, mtime_ns, width, height], width and height None if unreadable
+        self.sizes = {}
+        # Size and mtime of the images in the static directory, from index()
+        self.files = {}
+        self.added = {}
+        # Changes whenever the dimensions of an image in the static directory or the options
+        # change, for cache keys and manifest invalidation
+        self.digest = None
+        self.read = 0
+
+    def configure(self, static_dir_path, path=None, lazy=False):
+        '''
+        :param static_dir_path: the directory root-relative image URLs are resolved in
+        :param path: optional JSON file the dimensions are loaded from now and saved to by save()
+        :param lazy: also add loading="lazy" and decoding="async" to every image
+        '''
+        self.enabled = True
+        self.static_dir_path = static_dir_path
+        self.path = path
+        self.lazy = lazy
+        self.update_digest()
+        if path is None or not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            # A corrupt cache only costs us reading the headers again
+            return
+        if data.get("version") == IMAGE_SIZE_CACHE_VERSION:
+            self.sizes = data.get("images", {})
+
+    def index(self, tree):
+        '''
+        Take the size and mtime of every image from an already scanned static directory, so
+        looking up an image doesn't need a stat call of its own, and resolve the dimensions
+        of all of them for the digest. Only headers of new or changed files are read.
+        The digest covers the dimensions alone, so touching an image (or a fresh checkout
+        resetting every mtime) leaves the cached pages valid.
+
+        :param tree: the scan_tree result for the static directory
+        '''
+        _, file_paths = tree
+        self.files = {
+            rel_path.replace(os.sep, "/"): (size, mtime_ns)
+            for rel_path, size, mtime_ns in file_paths
+            if os.path.splitext(rel_path)[1].lower() in IMAGE_SUFFIXES
+        }
+        # Forget images that were deleted since the cache was saved
+        self.sizes = {rel_path: entry for rel_path, entry in self.sizes.items() if rel_path in self.files}
+        for rel_path in self.files:
+            self.lookup(rel_path)
+        self.update_digest()
+
+    def update_digest(self):
+        resolved = sorted((rel_path, entry[2], entry[3]) for rel_path, entry in self.sizes.items() if rel_path in self.files)
+        self.digest = hash_bytes(json.dumps([self.lazy, resolved]))[:16]
+
+    def dimensions(self, url):
+        '''
+        :return: the (width, height) of the image a root-relative url points at, or None
+        '''
+        if not isinstance(url, str) or not url.startswith("/"):
+            return None
+        match = URL_SUFFIX.search(url)
+        if match is not None:
+            url = url[:match.start()]
+        rel_path = posixpath.normpath(unquote(url)).lstrip("/")
+        if rel_path.startswith("..") or os.path.splitext(rel_path)[1].lower() not in IMAGE_SUFFIXES:
+            return None
+        return self.lookup(rel_path)
+
+    def lookup(self, rel_path):
+        '''
+        :param rel_path: the path of an image relative to the static directory, with "/" separators
+        :return: its (width, height), or None
+        '''
+        version = self.files.get(rel_path)
+        if version is None:
+            try:
+                stat = os.stat(os.path.join(self.static_dir_path, rel_path))
+            except OSError:
+                return None
+            version = (stat.st_size, stat.st_mtime_ns)
+        entry = self.sizes.get(rel_path)
+        if entry is None or entry[0] != version[0] or entry[1] != version[1]:
+            try:
+                size = read_image_size(os.path.join(self.static_dir_path, rel_path))
+            except OSError:
+                size = None
+            if size is None:
+                logger.warn("could not read the dimensions of %s", rel_path)
+            entry = [version[0], version[1], *(size or (None, None))]
+            self.sizes[rel_path] = entry
+            self.added[rel_path] = entry
+            self.read += 1
+        if entry[2] is None:
+            return None
+        return entry[2], entry[3]
+
+    def with_dimensions(self, props):
+        '''
+        Return the props of an <img> with the width/height (and loading/decoding) attributes
+        added. Attributes already present are left as they are.
+        '''
+        size = self.dimensions(props.get("src"))
+        if size is None and not self.lazy:
+            return props
+        props = dict(props)
+        if size is not None:
+            props.setdefault("width", str(size[0]))
+            props.setdefault("height", str(size[1]))
+        if self.lazy:
+            props.setdefault("loading", "lazy")
+            props.setdefault("decoding", "async")
+        return props
+
+    def drain(self):
+        '''
+        Return (and forget) the dimensions read since the last drain, so a worker process
+        can hand them to the parent.
+        '''
+        added = self.added
+        self.added = {}
+        return added
+
+    def absorb(self, added):
+        self.sizes.update(added)
+
+    def save(self):
+        if self.path is None:
+            return
+        dir_path = os.path.dirname(self.path)
+        if dir_path != "":
+            os.makedirs(dir_path, exist_ok=True)
+        data = {"version": IMAGE_SIZE_CACHE_VERSION, "images": self.sizes}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(data, file, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def summary(self):
+        return f"{len(self.sizes)} images known, {self.read} headers read"
+
+
+image_sizes = ImageSizes()
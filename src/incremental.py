@@ -0,0 +1,146 @@
+import os
+from pathlib import Path
+
+from copystatic import fast_copy
+from fingerprint import asset_fingerprints
+from imagesize import image_sizes
+from gencontent import generate_pages, PageGenerationError
+from linkindex import link_index
+from page_template import get_template
+from manifest import BuildManifest, hash_file
+from precompress import precompressor, variant_paths
+from logger_singleton import LoggerSingleton as logger
+
+
+def walk_files(dir_path):
+    '''
+    Yield the path of every file under dir_path, in a stable (sorted) order.
+    '''
+    for root, dirs, files in os.walk(dir_path):
+        dirs.sort()
+        for filename in sorted(files):
+            yield os.path.join(root, filename)
+
+
+def remove_output(path):
+    '''
+    Delete a stale output file, its precompressed variants and any directories left empty by its removal.
+    '''
+    if not os.path.exists(path):
+        return
+    logger.detail("stale outputs removed", " - removing stale %s", path)
+    os.remove(path)
+    for variant_path in variant_paths(path):
+        if os.path.exists(variant_path):
+            os.remove(variant_path)
+    dir_path = os.path.dirname(path)
+    while dir_path != "" and os.path.isdir(dir_path) and len(os.listdir(dir_path)) == 0:
+        os.rmdir(dir_path)
+        dir_path = os.path.dirname(dir_path)
+
+
+def build_incremental(static_dir_path, content_dir_path, template_path, dest_dir_path, basepath, manifest_path, jobs=1, minify=False):
+    '''
+    Bring dest_dir_path up to date without wiping it first.
+    Only static files and markdown pages whose content hash changed since the last build are
+    copied or re-rendered, outputs whose sources disappeared are deleted, and everything else
+    is left untouched on disk. A change to the template, the basepath, minify, any
+    fingerprinted asset URL or any image (with image sizes on) invalidates every page.
+
+    :param manifest_path: string representing where the build manifest is persisted between runs
+    :param jobs: number of processes used to render the changed pages, see generate_pages
+    :return: a (written, skipped, removed) tuple of counts
+    '''
+    manifest = BuildManifest(manifest_path)
+    template_hash = hash_file(template_path)
+    pages_invalidated = (
+        manifest.template_hash != template_hash
+        or manifest.basepath != basepath
+        or manifest.minify != minify
+        or manifest.assets != asset_fingerprints.digest
+        or manifest.images != image_sizes.digest
+    )
+    if pages_invalidated:
+        logger.info("Template, basepath, minify, asset fingerprints or images changed, regenerating every page")
+
+    seen = set()
+    written = 0
+    skipped = 0
+
+    for from_path in walk_files(static_dir_path):
+        seen.add(from_path)
+        dest_paths = [
+            os.path.join(dest_dir_path, dest_rel_path)
+            for dest_rel_path in asset_fingerprints.dest_rel_paths(os.path.relpath(from_path, static_dir_path))
+        ]
+        digest, stat = manifest.source_hash(from_path)
+        outputs = manifest.entries.get(from_path, {}).get("outputs")
+        if manifest.is_fresh(from_path, digest) and outputs == dest_paths:
+            for dest_path in dest_paths:
+                # Only a stat unless precompression was just turned on
+                precompressor.submit(dest_path)
+            skipped += 1
+            continue
+        logger.detail("static files copied", " * %s -> %s", from_path, ", ".join(dest_paths))
+        for output in outputs or []:
+            if output not in dest_paths:
+                # Copied under a different fingerprint (or none) last time
+                remove_output(output)
+        for dest_path in dest_paths:
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            fast_copy(from_path, dest_path)
+            precompressor.submit(dest_path)
+        manifest.record(from_path, digest, stat, dest_paths)
+        written += 1
+
+    stale_pages = []
+    for from_path in walk_files(content_dir_path):
+        if Path(from_path).suffix != ".md":
+            continue
+        seen.add(from_path)
+        rel_path = os.path.relpath(from_path, content_dir_path)
+        dest_path = str(Path(dest_dir_path, rel_path).with_suffix(".html"))
+        digest, stat = manifest.source_hash(from_path)
+        refs = manifest.entries.get(from_path, {}).get("refs")
+        # A page last built without collecting links is rendered again to get its references
+        missing_refs = link_index.enabled and refs is None
+        if not missing_refs and not pages_invalidated and manifest.is_fresh(from_path, digest):
+            precompressor.submit(dest_path)
+            if link_index.enabled:
+                link_index.record(dest_path, [tuple(ref) for ref in refs])
+            skipped += 1
+            continue
+        stale_pages.append((from_path, dest_path, digest, stat))
+    if link_index.enabled:
+        link_index.record_template(template_path, get_template(template_path, basepath, minify).refs)
+
+    failed = set()
+    error = None
+    try:
+        generate_pages([(page[0], page[1]) for page in stale_pages], template_path, basepath, jobs, minify)
+    except PageGenerationError as e:
+        # Record the pages that did render so the next run only retries the failures
+        failed = {path for path, _ in e.errors}
+        error = e
+    for from_path, dest_path, digest, stat in stale_pages:
+        if from_path in failed:
+            manifest.entries.pop(from_path, None)
+            continue
+        manifest.record(from_path, digest, stat, [dest_path], link_index.pages.get(dest_path))
+        written += 1
+
+    removed = 0
+    for output in manifest.forget_missing(seen):
+        remove_output(output)
+        removed += 1
+
+    manifest.template_hash = template_hash
+    manifest.basepath = basepath
+    manifest.minify = minify
+    manifest.assets = asset_fingerprints.digest
+    manifest.images = image_sizes.digest
+    manifest.save()
+    if error is not None:
+        raise error
+    logger.info("Incremental build: %d written, %d unchanged, %d removed", written, skipped, removed)
+    return written, skipped, removed
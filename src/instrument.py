@@ -0,0 +1,183 @@
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+STAGES = ("read", "block_split", "inline_parse", "html_emit", "template", "write")
+
+
+class NullTimer():
+    '''
+    Stands in for a stage timer when instrumentation is disabled, so the hot path pays for
+    one attribute check and nothing else.
+    '''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_TIMER = NullTimer()
+
+
+class StageTimer():
+    __slots__ = ("stats", "stage", "started", "nested", "parent")
+
+    def __init__(self, stats, stage):
+        self.stats = stats
+        self.stage = stage
+
+    def __enter__(self):
+        # Time spent in a stage timed inside this one is only counted for the inner stage
+        self.nested = 0.0
+        self.parent = self.stats.current
+        self.stats.current = self
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        self.stats.stage_seconds[self.stage] += elapsed - self.nested
+        self.stats.current = self.parent
+        if self.parent is not None:
+            self.parent.nested += elapsed
+        return False
+
+
+class BuildStats():
+    def __init__(self):
+        '''
+        Constructor for BuildStats.
+        Collects per-stage timings, counters (nodes created, bytes written, ...) and per-page
+        timings for a build. Everything is a no-op until enable() is called.
+        '''
+        self.enabled = False
+        # The innermost running StageTimer
+        self.current = None
+        self.reset()
+
+    def reset(self):
+        self.stage_seconds = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.page_seconds = {}
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def timer(self, stage):
+        if not self.enabled:
+            return NULL_TIMER
+        return StageTimer(self, stage)
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] += amount
+
+    def record_page(self, path, seconds):
+        if self.enabled:
+            self.page_seconds[path] = seconds
+
+    def snapshot(self):
+        '''
+        Return the collected data as plain dicts, e.g. to send it back from a worker process.
+        '''
+        return {
+            "stage_seconds": dict(self.stage_seconds),
+            "counters": dict(self.counters),
+            "page_seconds": dict(self.page_seconds),
+        }
+
+    def merge(self, snapshot):
+        for stage, seconds in snapshot["stage_seconds"].items():
+            self.stage_seconds[stage] += seconds
+        for name, amount in snapshot["counters"].items():
+            self.counters[name] += amount
+        self.page_seconds.update(snapshot["page_seconds"])
+
+    def slowest_pages(self, limit=10):
+        return sorted(self.page_seconds.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def report(self, limit=10):
+        '''
+        Format the stage timings, counters and the slowest pages as a human readable report.
+        '''
+        lines = ["Build stages:"]
+        stages = list(STAGES) + [stage for stage in self.stage_seconds if stage not in STAGES]
+        for stage in stages:
+            if stage in self.stage_seconds:
+                lines.append(f"  {stage:<14} {self.stage_seconds[stage] * 1000:10.1f} ms")
+        lines.append("Counters:")
+        for name in sorted(self.counters):
+            lines.append(f"  {name:<14} {self.counters[name]:>10}")
+        lines.append(f"Slowest {limit} pages:")
+        for path, seconds in self.slowest_pages(limit):
+            lines.append(f"  {seconds * 1000:10.1f} ms  {path}")
+        return "\n".join(lines)
+
+
+stats = BuildStats()
+
+
+def count_nodes(node):
+    '''
+    Count node and all of its descendants without recursion.
+    '''
+    total = 0
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        total += 1
+        if item.children is not None:
+            stack.extend(item.children)
+    return total
+
+
+class CountingWriter():
+    __slots__ = ("write_func", "stats", "bytes_written")
+
+    def __init__(self, write_func, stats):
+        '''
+        Wraps a write callable, e.g. the write method of an open file, so every chunk is
+        passed straight through while the calls are timed as the "write" stage and the
+        chunks are measured in UTF-8 bytes rather than characters.
+        '''
+        self.write_func = write_func
+        self.stats = stats
+        self.bytes_written = 0
+
+    def write(self, text):
+        with self.stats.timer("write"):
+            self.write_func(text)
+        self.bytes_written += len(text.encode("utf-8"))
+
+
+@contextmanager
+def profiled(pstats_path, limit=25):
+    '''
+    Run the body under cProfile and tracemalloc, dump the profile to pstats_path and yield
+    a list that receives the formatted report lines once the body is done.
+    '''
+    report = []
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        yield report
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        profiler.dump_stats(pstats_path)
+
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+        report.append(out.getvalue())
+        report.append(f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB")
+        report.append("Top allocations:")
+        for stat in snapshot.statistics("lineno")[:limit]:
+            report.append(f"  {stat}")
+        report.append(f"Profile written to {pstats_path}")
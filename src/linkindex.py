@@ -0,0 +1,167 @@
+import os
+import posixpath
+from urllib.parse import unquote, urlsplit
+
+from copystatic import scan_tree
+from fingerprint import asset_fingerprints
+from precompress import VARIANT_SUFFIXES
+
+
+class LinkReport():
+    def __init__(self, broken, orphans, checked):
+        '''
+        Constructor for LinkReport.
+
+        :param broken: a list of (page or template path, attribute, url) tuples whose target doesn't exist
+        :param orphans: output paths of files (other than pages) that nothing links to
+        :param checked: the number of internal references that were resolved
+        '''
+        self.broken = broken
+        self.orphans = orphans
+        self.checked = checked
+
+    def summary(self):
+        return f"{self.checked} internal references checked, {len(self.broken)} broken, {len(self.orphans)} orphaned files"
+
+    def lines(self):
+        lines = [f"Links: {self.summary()}"]
+        for path, attribute, url in self.broken:
+            lines.append(f"  broken {attribute}: {url} in {path}")
+        for path in self.orphans:
+            lines.append(f"  orphaned: {path}")
+        return lines
+
+
+class LinkIndex():
+    def __init__(self):
+        '''
+        Constructor for LinkIndex.
+        Holds every href/src reference of every page, collected while the pages are emitted
+        (see write_html), plus the references in the templates. check() then resolves the
+        internal ones against the files in the output directory with set lookups, so the
+        cost grows with the number of references and files, not with pages times files.
+        Disabled until configure() is called.
+        '''
+        self.reset()
+
+    def reset(self):
+        '''
+        Forget the recorded references and stop collecting them.
+        '''
+        self.enabled = False
+        self.pages = {}
+        self.templates = {}
+
+    def configure(self):
+        self.enabled = True
+
+    def record(self, page_path, refs):
+        '''
+        :param page_path: the output path of the page
+        :param refs: a list of (attribute, url) tuples as written in the source
+        '''
+        self.pages[page_path] = refs
+
+    def record_template(self, template_path, refs):
+        self.templates[template_path] = refs
+
+    def drain(self):
+        '''
+        Return (and forget) what was recorded, so a worker process can hand it to the parent.
+        '''
+        updates = {"pages": self.pages, "templates": self.templates}
+        self.pages = {}
+        self.templates = {}
+        return updates
+
+    def absorb(self, updates):
+        self.pages.update(updates["pages"])
+        self.templates.update(updates["templates"])
+
+    def check(self, dest_dir_path):
+        '''
+        Resolve every internal reference against the files in dest_dir_path.
+
+        :return: a LinkReport
+        '''
+        _, file_paths = scan_tree(dest_dir_path)
+        outputs = {rel_path.replace(os.sep, "/") for rel_path, _, _ in file_paths}
+        referenced = set()
+        broken = []
+        checked = 0
+        sources = []
+        page_dirs = set()
+        for page_path, refs in self.pages.items():
+            rel_dir = posixpath.dirname(os.path.relpath(page_path, dest_dir_path).replace(os.sep, "/"))
+            page_dirs.add(rel_dir)
+            sources.append((page_path, rel_dir, refs))
+        for template_path, refs in self.templates.items():
+            # The template is emitted in every page directory, so a relative reference in it
+            # has to resolve from each of them; root-relative and external ones are checked once
+            relative = [ref for ref in refs if not is_root_relative_or_external(ref[1])]
+            sources.append((template_path, "", [ref for ref in refs if is_root_relative_or_external(ref[1])]))
+            if len(relative) > 0:
+                for rel_dir in sorted(page_dirs):
+                    sources.append((f"{template_path} (in {rel_dir or '.'}/)", rel_dir, relative))
+        for path, rel_dir, refs in sources:
+            for attribute, url in refs:
+                # The references are recorded as written, the output holds the fingerprinted names
+                target = asset_fingerprints.rewrite(url) if asset_fingerprints.enabled else url
+                candidates = resolve_url(target, rel_dir)
+                if candidates is None:
+                    continue
+                checked += 1
+                for candidate in candidates:
+                    if candidate in outputs:
+                        referenced.add(candidate)
+                        break
+                else:
+                    broken.append((path, attribute, url))
+        # Fingerprinted assets are also kept under their original names for unrewritten
+        # references (url() in stylesheets, scripts, ...) that can't be seen from here
+        originals = {rel_path.replace(os.sep, "/") for rel_path in asset_fingerprints.paths} if asset_fingerprints.enabled else set()
+        orphans = sorted(
+            os.path.join(dest_dir_path, rel_path)
+            for rel_path in outputs
+            if rel_path not in referenced and rel_path not in originals and not is_page_or_variant(rel_path)
+        )
+        return LinkReport(broken, orphans, checked)
+
+
+def resolve_url(url, rel_dir):
+    '''
+    Work out which output files an internal url can point to, relative to the output directory.
+    "/blog/tom" may be served by blog/tom, blog/tom/index.html or blog/tom.html.
+
+    :param rel_dir: the directory of the page the url appears in, relative to the output directory
+    :return: a tuple of candidate paths, or None for urls that aren't checked (external
+        links, mailto:, data:, in-page anchors, ...)
+    '''
+    parts = urlsplit(url)
+    if parts.scheme != "" or parts.netloc != "":
+        return None
+    path = unquote(parts.path)
+    if path == "":
+        return None
+    if path.startswith("/"):
+        path = path[1:]
+    else:
+        path = posixpath.join(rel_dir, path)
+    path = posixpath.normpath(path) if path != "" else "."
+    if path == ".":
+        return ("index.html",)
+    return (path, f"{path}/index.html", f"{path}.html")
+
+
+def is_root_relative_or_external(url):
+    parts = urlsplit(url)
+    return parts.scheme != "" or parts.netloc != "" or parts.path == "" or parts.path.startswith("/")
+
+
+def is_page_or_variant(rel_path):
+    if rel_path.endswith(".html"):
+        return True
+    return any(rel_path.endswith(suffix) for suffix in VARIANT_SUFFIXES.values())
+
+
+link_index = LinkIndex()
@@ -1,23 +1,162 @@
+import atexit
 import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import threading
+from collections import Counter
+
+LOG_PATH = 'info.log'
+LEVEL_TAGS = {
+    logging.DEBUG: "DEBUG",
+    logging.INFO: "INFO",
+    logging.WARNING: "WARN",
+    logging.ERROR: "ERROR",
+}
+
+
+class TaggedFormatter(logging.Formatter):
+    '''
+    Formats records as "<time> (<LEVEL>): <message>", the format info.log has always used.
+    '''
+    def format(self, record):
+        record.tag = LEVEL_TAGS.get(record.levelno, record.levelname)
+        return super().format(record)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    '''
+    A QueueHandler that leaves message formatting to the listener thread instead of doing it
+    on the caller's thread.
+    '''
+    def prepare(self, record):
+        return record
+
 
 class LoggerSingleton:
     _instance = None
+    # Copy, compress and server threads may log before the main thread does
+    _instance_lock = threading.Lock()
+    level = logging.INFO
+    summary_mode = False
 
     def __new__(cls):
-        if LoggerSingleton._instance is None:
-            obj = super().__new__(cls)
-            obj.logger = logging.getLogger(__name__)
-            logging.basicConfig(format='%(asctime)s %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p', filename='info.log', level=logging.INFO)
-            LoggerSingleton._instance = obj
-            LoggerSingleton.info(f"Created a new {cls.__name__} object")
+        with LoggerSingleton._instance_lock:
+            if LoggerSingleton._instance is None:
+                obj = super().__new__(cls)
+                obj.logger = logging.getLogger(__name__)
+                obj.logger.setLevel(LoggerSingleton.level)
+                obj.logger.propagate = False
+                obj.counts = Counter()
+                obj.counts_lock = threading.Lock()
+                file_handler = logging.FileHandler(LOG_PATH)
+                file_handler.setFormatter(TaggedFormatter('%(asctime)s (%(tag)s): %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p'))
+                obj.file_handler = file_handler
+                obj.listener = None
+                # Decided per process, whichever thread happens to log first
+                in_worker_process = multiprocessing.parent_process() is not None
+                if not in_worker_process:
+                    # Writes happen on a background thread, the build only pays for a queue put
+                    log_queue = queue.SimpleQueue()
+                    obj.logger.handlers = [DeferredQueueHandler(log_queue)]
+                    obj.listener = logging.handlers.QueueListener(log_queue, file_handler)
+                    obj.listener.start()
+                    atexit.register(LoggerSingleton.shutdown)
+                else:
+                    # Worker processes exit without running atexit hooks, so a queue could
+                    # lose their last messages; write synchronously instead
+                    obj.logger.handlers = [file_handler]
+                LoggerSingleton._instance = obj
+                LoggerSingleton.info("Created a new %s object", cls.__name__)
         return LoggerSingleton._instance
 
-    def info(message):
-        singleton = LoggerSingleton()
-        logger = singleton._instance.logger
-        logger.info(f"(INFO): {message}")
+    def configure(level=None, summary=None):
+        '''
+        Set the minimum level that is logged and whether per-file messages are aggregated
+        into counts (see detail).
+
+        :param level: a logging level such as logging.WARNING
+        :param summary: True to enable summary mode
+        '''
+        if level is not None:
+            LoggerSingleton.level = level
+            if LoggerSingleton._instance is not None:
+                LoggerSingleton._instance.logger.setLevel(level)
+        if summary is not None:
+            LoggerSingleton.summary_mode = summary
+
+    def enabled_for(level):
+        singleton = LoggerSingleton._instance or LoggerSingleton()
+        return singleton.logger.isEnabledFor(level)
+
+    def debug(message, *args):
+        singleton = LoggerSingleton._instance or LoggerSingleton()
+        if singleton.logger.isEnabledFor(logging.DEBUG):
+            singleton.logger.debug(message, *args)
+
+    def info(message, *args):
+        '''
+        Log message at INFO level. Arguments are %-formatted into the message only if the
+        message passes the level filter, and then on the writer thread.
+        '''
+        singleton = LoggerSingleton._instance or LoggerSingleton()
+        if singleton.logger.isEnabledFor(logging.INFO):
+            singleton.logger.info(message, *args)
+
+    def warn(message, *args):
+        singleton = LoggerSingleton._instance or LoggerSingleton()
+        if singleton.logger.isEnabledFor(logging.WARNING):
+            singleton.logger.warning(message, *args)
+
+    def detail(category, message, *args):
+        '''
+        Log a per-file message (one page generated, one file copied, ...) at INFO level.
+        In summary mode the message is not logged at all, only counted under category,
+        and flush_summary logs one line per category instead.
+        '''
+        singleton = LoggerSingleton._instance or LoggerSingleton()
+        if not singleton.logger.isEnabledFor(logging.INFO):
+            return
+        if LoggerSingleton.summary_mode:
+            with singleton.counts_lock:
+                singleton.counts[category] += 1
+            return
+        singleton.logger.info(message, *args)
+
+    def flush_summary():
+        '''
+        Log the counts collected in summary mode and reset them.
+        '''
+        singleton = LoggerSingleton._instance
+        if singleton is None:
+            return
+        with singleton.counts_lock:
+            counts = sorted(singleton.counts.items())
+            singleton.counts.clear()
+        for category, count in counts:
+            singleton.logger.info("%s: %d", category, count)
+
+    def shutdown():
+        '''
+        Log any pending summary and wait for the writer thread to drain the queue.
+        '''
+        singleton = LoggerSingleton._instance
+        if singleton is None:
+            return
+        LoggerSingleton.flush_summary()
+        if singleton.listener is not None:
+            singleton.listener.stop()
+            singleton.listener = None
+        singleton.file_handler.close()
+        singleton.logger.handlers = []
+        LoggerSingleton._instance = None
+
+
+def _after_fork_in_child():
+    # The writer thread doesn't exist in a forked child, start over with a fresh instance
+    LoggerSingleton._instance = None
+    LoggerSingleton._instance_lock = threading.Lock()
 
-    def warn(message):
-        singleton = LoggerSingleton()
-        logger = singleton._instance.logger
-        logger.info(f"(WARN): {message}")
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
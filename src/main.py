@@ -1,36 +1,356 @@
 import os
 import sys
+import argparse
+import logging
 import shutil
 
-from copystatic import copy_files_recursive
-from gencontent import generate_pages_recursive
+from buildplan import plan_build
+from devserver import serve_and_watch
+from previewserver import serve_preview
+from copystatic import copy_files_recursive, scan_tree, sync_files, DEFAULT_COPY_WORKERS
+from gencontent import generate_pages, PageGenerationError
+from incremental import build_incremental
+from blockcache import block_cache
+from instrument import stats, profiled
+from rendercache import render_cache
+from outputs import output_writer
+from linkindex import link_index
+from fingerprint import asset_fingerprints
+from imagesize import image_sizes
+from precompress import precompressor, available_formats
 from logger_singleton import LoggerSingleton as logger
 
 DIR_PATH_STATIC = "./static"
 DIR_PATH_PUBLIC = "./public" # for local testing only
 DIR_PATH_CONTENT = "./content"
 DIR_PATH_DOCS = "./docs"
+DIR_PATH_STATE = "./.sitegen"
 PATH_TEMPLATE = "./template.html"
+LOG_LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warn": logging.WARNING,
+    "error": logging.ERROR,
+}
+PATH_BLOCK_CACHE = os.path.join(DIR_PATH_STATE, "block-cache.json")
+PATH_PROFILE = os.path.join(DIR_PATH_STATE, "profile.pstats")
+PATH_ASSET_MANIFEST = os.path.join(DIR_PATH_STATE, "assets.json")
+PATH_IMAGE_SIZES = os.path.join(DIR_PATH_STATE, "image-sizes.json")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a static site from ./content and ./static")
+    parser.add_argument(
+        "basepath",
+        nargs="?",
+        help="production basepath (e.g. /static-site-generator/); builds into docs/ instead of public/",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only rebuild pages and copy assets whose content changed since the last build",
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="sync static files into the existing output directory instead of deleting and recopying it",
+    )
+    parser.add_argument(
+        "--hardlink",
+        action="store_true",
+        help="with --sync, hardlink static files into the output directory instead of copying them",
+    )
+    parser.add_argument(
+        "--checksum",
+        action="store_true",
+        help="with --sync, compare static files by content hash instead of size and mtime",
+    )
+    parser.add_argument(
+        "--copy-workers",
+        type=int,
+        default=DEFAULT_COPY_WORKERS,
+        metavar="N",
+        help=f"copy up to N static files at the same time (default {DEFAULT_COPY_WORKERS})",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="after building, serve the output and rebuild changed pages and assets as they are edited",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8888,
+        help="port for the --watch and --preview servers (default 8888)",
+    )
+    parser.add_argument(
+        "--preview",
+        action="store_true",
+        help="serve the site without building it: each page is rendered from its markdown on its first request",
+    )
+    parser.add_argument(
+        "--preview-cache",
+        type=int,
+        default=64,
+        metavar="MIB",
+        help="with --preview, keep up to MIB megabytes of rendered pages in memory (default 64)",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="collect per-stage and per-page timings and print a report after the build",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=f"run the build under cProfile and tracemalloc (implies --stats), dumping to {PATH_PROFILE}",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=sorted(LOG_LEVELS),
+        default="info",
+        help="minimum level written to info.log (default info)",
+    )
+    parser.add_argument(
+        "--log-summary",
+        action="store_true",
+        help="log a count per kind of per-file message (pages generated, files copied, ...) instead of one line per file",
+    )
+    parser.add_argument(
+        "--block-cache",
+        type=int,
+        default=0,
+        metavar="MIB",
+        help="cache up to MIB megabytes of rendered blocks, so blocks repeated across pages are rendered once",
+    )
+    parser.add_argument(
+        "--block-cache-persist",
+        action="store_true",
+        help=f"with --block-cache, keep the cache in {PATH_BLOCK_CACHE} between builds",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        help="keep a content-addressed cache of rendered pages in DIR (e.g. restored from a CI artifact)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=1024,
+        metavar="MIB",
+        help="evict the least recently used pages once --cache-dir exceeds MIB megabytes (default 1024)",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="emit compact HTML: insignificant whitespace is stripped from the template and the content (pre and code blocks are kept as they are)",
+    )
+    parser.add_argument(
+        "--write-if-changed",
+        action="store_true",
+        help="leave a generated page untouched (keeping its mtime) when its new content is identical; useful with --sync and --incremental",
+    )
+    parser.add_argument(
+        "--precompress",
+        nargs="?",
+        const="gzip",
+        metavar="FORMATS",
+        help=f"write precompressed variants of pages and text assets next to them, e.g. \"gzip,br\" (available: {', '.join(available_formats())}; default gzip)",
+    )
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help=f"also copy stylesheets, scripts, images and fonts to names containing their content hash and point the pages at those, so they can be cached forever (manifest in {PATH_ASSET_MANIFEST})",
+    )
+    parser.add_argument(
+        "--image-sizes",
+        action="store_true",
+        help=f"add width and height to images in the content, read from the PNG, GIF and JPEG headers (cached in {PATH_IMAGE_SIZES})",
+    )
+    parser.add_argument(
+        "--lazy-images",
+        action="store_true",
+        help="add loading=\"lazy\" and decoding=\"async\" to images in the content; implies --image-sizes",
+    )
+    parser.add_argument(
+        "--check-links",
+        action="store_true",
+        help="after building, report broken internal links and images and static files nothing links to; exits with status 1 on broken links",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="print the build plan (every output and the source it comes from) as JSON and exit without building",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="render pages on N processes (0 = one per CPU); small sites always render serially",
+    )
+    args = parser.parse_args()
+    if args.precompress is not None:
+        for compression in args.precompress.split(","):
+            if compression not in available_formats():
+                parser.error(f"--precompress: {compression} is not available (available: {', '.join(available_formats())})")
+    if args.fingerprint and (args.watch or args.preview):
+        parser.error("--fingerprint is for deploy builds and can't be combined with --watch or --preview")
+    if args.plan and args.fingerprint:
+        # The plan is worked out before any asset is hashed, so it would leave out every
+        # fingerprinted copy the build writes
+        parser.error("--plan can't be combined with --fingerprint")
+    if args.preview:
+        # The preview renders straight from the sources and never sets these up, so they
+        # would be silently ignored and the preview would differ from the build
+        ignored = [
+            option for option, used in (
+                ("--image-sizes", args.image_sizes),
+                ("--lazy-images", args.lazy_images),
+                ("--block-cache", args.block_cache > 0),
+            ) if used
+        ]
+        if len(ignored) > 0:
+            parser.error(f"{', '.join(ignored)} can't be combined with --preview")
+    return args
 
 def main():
-    basepath = "/"
-    dest_path = DIR_PATH_PUBLIC
-    if len(sys.argv) > 1:
+    args = parse_args()
+    logger.configure(level=LOG_LEVELS[args.log_level], summary=args.log_summary)
+    if args.plan:
+        dest_path, _ = output_paths(args)
+        print(plan_build(DIR_PATH_STATIC, DIR_PATH_CONTENT, dest_path).to_json())
+        return
+    if args.preview:
+        _, basepath = output_paths(args)
+        serve_preview(DIR_PATH_STATIC, DIR_PATH_CONTENT, PATH_TEMPLATE, basepath, args.port, args.minify, args.preview_cache * 1024 * 1024)
+        return
+    if args.stats or args.profile:
+        stats.enable()
+    if args.block_cache > 0:
+        block_cache.configure(
+            max_bytes=args.block_cache * 1024 * 1024,
+            path=PATH_BLOCK_CACHE if args.block_cache_persist else None,
+        )
+    if args.cache_dir is not None:
+        render_cache.configure(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024)
+    output_writer.configure(skip_unchanged=args.write_if_changed)
+    if args.precompress is not None:
+        precompressor.configure(args.precompress.split(","))
+    if args.check_links:
+        link_index.configure()
+    if args.fingerprint:
+        asset_fingerprints.configure(PATH_ASSET_MANIFEST)
+    if args.image_sizes or args.lazy_images:
+        image_sizes.configure(DIR_PATH_STATIC, PATH_IMAGE_SIZES, lazy=args.lazy_images)
+    try:
+        if args.profile:
+            os.makedirs(DIR_PATH_STATE, exist_ok=True)
+            with profiled(PATH_PROFILE) as profile_report:
+                dest_path, basepath = build(args)
+        else:
+            dest_path, basepath = build(args)
+    except PageGenerationError as e:
+        logger.warn(str(e))
+        sys.exit(str(e))
+    finally:
+        logger.info("Pages: %s", output_writer.summary())
+        if precompressor.enabled:
+            precompressor.wait()
+            logger.info("Precompressed: %s", precompressor.summary())
+        if render_cache.enabled:
+            evicted = render_cache.evict()
+            logger.info("Render cache: %s, %d evicted", render_cache.summary(), evicted)
+        if block_cache.enabled:
+            logger.info("Block cache: %s", block_cache.summary())
+            block_cache.save()
+        if asset_fingerprints.enabled:
+            asset_fingerprints.save()
+        if image_sizes.enabled:
+            logger.info("Image sizes: %s", image_sizes.summary())
+            image_sizes.save()
+        if stats.enabled:
+            print(stats.report())
+            if block_cache.enabled:
+                print(f"Block cache: {block_cache.summary()}")
+            if render_cache.enabled:
+                print(f"Render cache: {render_cache.summary()}")
+    if args.profile:
+        print("\n".join(profile_report))
+    if link_index.enabled:
+        report = link_index.check(dest_path)
+        logger.info("Links: %s", report.summary())
+        for path, attribute, url in report.broken:
+            logger.warn("broken %s %s in %s", attribute, url, path)
+        print("\n".join(report.lines()))
+        if len(report.broken) > 0 and not args.watch:
+            sys.exit(1)
+    if args.watch:
+        serve_and_watch(DIR_PATH_STATIC, DIR_PATH_CONTENT, PATH_TEMPLATE, dest_path, basepath, args.port, args.minify)
+
+def output_paths(args):
+    '''
+    :return: a (dest_path, basepath) tuple, docs/ and the given basepath in production mode
+    '''
+    if args.basepath is not None:
         # Production mode
-        basepath = sys.argv[1]
-        dest_path = DIR_PATH_DOCS
+        return DIR_PATH_DOCS, args.basepath
+    return DIR_PATH_PUBLIC, "/"
+
+def build(args):
+    dest_path, basepath = output_paths(args)
+    if args.incremental or args.sync:
+        # The output directory is kept, a full build deletes it anyway
+        output_writer.sweep(dest_path)
+
+    if args.incremental:
+        manifest_path = os.path.join(DIR_PATH_STATE, f"manifest-{os.path.basename(dest_path)}.json")
+        logger.info("Incrementally building %s directory...", dest_path[2:])
+        if asset_fingerprints.enabled or image_sizes.enabled:
+            static_tree = scan_tree(DIR_PATH_STATIC, args.copy_workers)
+            if asset_fingerprints.enabled:
+                asset_fingerprints.build(DIR_PATH_STATIC, static_tree, args.copy_workers)
+            if image_sizes.enabled:
+                image_sizes.index(static_tree)
+        build_incremental(DIR_PATH_STATIC, DIR_PATH_CONTENT, PATH_TEMPLATE, dest_path, basepath, manifest_path, args.jobs, args.minify)
+        logger.info("Finished")
+        return dest_path, basepath
+
+    plan = plan_build(DIR_PATH_STATIC, DIR_PATH_CONTENT, dest_path)
+    logger.info("Build plan: %s", plan.summary())
+    pages = plan.pages()
+    if asset_fingerprints.enabled:
+        asset_fingerprints.build(DIR_PATH_STATIC, plan.static_tree, args.copy_workers)
+    if image_sizes.enabled:
+        image_sizes.index(plan.static_tree)
+
+    if args.sync:
+        logger.info("Syncing static files to %s directory...", dest_path[2:])
+        sync_files(
+            DIR_PATH_STATIC,
+            dest_path,
+            keep={page[1] for page in pages},
+            hardlink=args.hardlink,
+            checksum=args.checksum,
+            workers=args.copy_workers,
+            tree=plan.static_tree,
+        )
+        logger.info("Generating content...")
+        generate_pages(pages, PATH_TEMPLATE, basepath, args.jobs, args.minify)
+        logger.info("Finished")
+        return dest_path, basepath
 
     if os.path.exists(dest_path):
-        logger.info(f"Deleting {dest_path[2:]} directory...")
+        logger.info("Deleting %s directory...", dest_path[2:])
         shutil.rmtree(dest_path)
 
-    logger.info(f"Copying static files to {dest_path[2:]} directory...")
-    copy_files_recursive(DIR_PATH_STATIC, dest_path)
-    
+    logger.info("Copying static files to %s directory...", dest_path[2:])
+    copy_files_recursive(DIR_PATH_STATIC, dest_path, args.copy_workers, tree=plan.static_tree)
+
     logger.info("Generating content...")
-    generate_pages_recursive(DIR_PATH_CONTENT, PATH_TEMPLATE, dest_path, basepath)
+    generate_pages(pages, PATH_TEMPLATE, basepath, args.jobs, args.minify)
 
     logger.info("Finished")
+    return dest_path, basepath
 
 
 if __name__ == "__main__":
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+
+MANIFEST_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_bytes(data):
+    '''
+    Return the hex sha256 digest of the given bytes (or str, encoded as utf-8).
+    '''
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    '''
+    Return the hex sha256 digest of the file at path, read in chunks so large assets
+    never have to fit in memory.
+    '''
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildManifest():
+    def __init__(self, path):
+        '''
+        Constructor for BuildManifest.
+        The manifest records, for every source file of a build, the content hash of the
+        source and the output paths it produced. On the next build it is used to work out
+        which outputs are stale and which can be left untouched on disk.
+
+        :param path: string representing the JSON file the manifest is loaded from and saved to
+        '''
+        self.path = path
+        self.template_hash = None
+        self.basepath = None
+        self.minify = False
+        self.assets = None
+        self.images = None
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            # A corrupt manifest only costs us a full rebuild
+            return
+        if data.get("version") != MANIFEST_VERSION:
+            return
+        self.template_hash = data.get("template_hash")
+        self.basepath = data.get("basepath")
+        self.minify = data.get("minify", False)
+        self.assets = data.get("assets")
+        self.images = data.get("images")
+        self.entries = data.get("entries", {})
+
+    def save(self):
+        dir_path = os.path.dirname(self.path)
+        if dir_path != "":
+            os.makedirs(dir_path, exist_ok=True)
+        data = {
+            "version": MANIFEST_VERSION,
+            "template_hash": self.template_hash,
+            "basepath": self.basepath,
+            "minify": self.minify,
+            "assets": self.assets,
+            "images": self.images,
+            "entries": self.entries,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(data, file, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def source_hash(self, path):
+        '''
+        Hash the source file at path, reusing the recorded hash when its size and mtime
+        have not changed since the last build.
+        '''
+        stat = os.stat(path)
+        entry = self.entries.get(path)
+        if (
+            entry is not None
+            and entry.get("size") == stat.st_size
+            and entry.get("mtime_ns") == stat.st_mtime_ns
+        ):
+            return entry["hash"], stat
+        return hash_file(path), stat
+
+    def is_fresh(self, path, digest):
+        '''
+        Return True if the source at path still has the recorded digest and every output it
+        produced last time is still on disk.
+        '''
+        entry = self.entries.get(path)
+        if entry is None or entry.get("hash") != digest:
+            return False
+        for output in entry.get("outputs", []):
+            if not os.path.exists(output):
+                return False
+        return True
+
+    def record(self, path, digest, stat, outputs, refs=None):
+        '''
+        :param refs: the (attribute, url) references of a page, kept if links are being checked
+        '''
+        self.entries[path] = {
+            "hash": digest,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "outputs": list(outputs),
+        }
+        if refs is not None:
+            self.entries[path]["refs"] = refs
+
+    def forget_missing(self, seen):
+        '''
+        Drop every entry whose source is not in seen and return the outputs those sources
+        had produced, so the caller can delete them.
+        '''
+        stale_outputs = []
+        for path in list(self.entries):
+            if path not in seen:
+                stale_outputs.extend(self.entries.pop(path).get("outputs", []))
+        return stale_outputs
@@ -1,3 +1,4 @@
+import io
 from enum import Enum
 
 from htmlnode import ParentNode
@@ -13,6 +14,39 @@ class BlockType(Enum):
     OLIST = "ordered_list"
 
 
+class BlockReader():
+    def __init__(self, lines):
+        '''
+        Constructor for BlockReader.
+        Iterating a BlockReader yields the markdown blocks of a document one at a time, reading
+        the source lazily line by line, so a huge file never has to be held in memory.
+        While reading it also records the page title (the first line starting with "# "),
+        so the document only has to be scanned once.
+        
+        :param lines: an iterable of lines with their line endings, e.g. an open file
+        '''
+        self.lines = lines
+        self.title = None
+
+    def __iter__(self):
+        block_lines = []
+        for line in self.lines:
+            if line == "\n":
+                # A blank line ends the current block
+                if len(block_lines) > 0:
+                    block = "".join(block_lines).strip()
+                    block_lines = []
+                    if len(block) > 0:
+                        yield block
+                continue
+            if self.title is None and line.startswith("# "):
+                self.title = line[2:].strip()
+            block_lines.append(line)
+        block = "".join(block_lines).strip()
+        if len(block) > 0:
+            yield block
+
+
 def markdown_to_blocks(markdown) -> list[str]:
     '''
     Split the given markdown document into a list of blocks
@@ -21,13 +55,26 @@ def markdown_to_blocks(markdown) -> list[str]:
     :return: a list of "block" strings
     :rtype: list[str]
     '''
-    blocks = []
-    sections = markdown.split("\n\n")
-    for section in sections:
-        if len(section) == 0:
-            continue
-        blocks.append(section.strip())
-    return blocks
+    return list(BlockReader(io.StringIO(markdown)))
+
+HEADING_PREFIXES = ("# ", "## ", "### ", "#### ", "##### ", "###### ")
+# "1. ", "2. ", ... grown on demand by olist_prefixes, so checking an ordered list doesn't
+# format a new string for every line
+OLIST_PREFIXES = ()
+
+
+def olist_prefixes(count):
+    '''
+    Return at least count ordered list prefixes. The table is never mutated: a longer one
+    is built and swapped in with a single assignment, so threads rendering at the same
+    time (e.g. the preview server) can only ever see a complete table.
+    '''
+    global OLIST_PREFIXES
+    prefixes = OLIST_PREFIXES
+    if len(prefixes) < count:
+        prefixes = tuple(f"{number}. " for number in range(1, max(count, 2 * len(prefixes)) + 1))
+        OLIST_PREFIXES = prefixes
+    return prefixes
 
 def block_to_block_type(block) -> BlockType:
     '''
@@ -37,38 +84,44 @@ def block_to_block_type(block) -> BlockType:
     :return: the enum representing the identified markdown block type
     :rtype: BlockType
     '''
-    lines = block.split("\n")
+    return classify_block(block)[0]
 
-    if block.startswith(("# ", "## ", "### ", "#### ", "##### ", "###### ")):
+def classify_block(block):
+    '''
+    Identify the type of the markdown block, splitting it into lines at most once.
+    Quotes and unordered lists are recognised by counting line starts instead of looping over
+    the lines, and the lines of list and quote blocks are handed back so the converters below
+    don't have to split the block again.
+    
+    :param block: a single block of markdown text, assume all leading and trailing whitespace was stripped
+    :return: a (BlockType, lines) tuple; lines is None for the block types whose converters
+        don't work line by line (paragraphs, headings and code blocks)
+    '''
+    if block.startswith(HEADING_PREFIXES):
         # Headings start with 1-6 # characters, followed by a space and then the heading text.
-        return BlockType.HEADING
-    if len(lines) > 1 and lines[0].startswith("```") and lines[-1].startswith("```"):
+        return BlockType.HEADING, None
+    if block.startswith("```"):
         # Multiline Code blocks must start with 3 backticks and a newline, then end with 3 backticks.
-        return BlockType.CODE
-    if block.startswith(">"):
+        last_line = block.rfind("\n")
+        if last_line != -1 and block.startswith("```", last_line + 1):
+            return BlockType.CODE, None
+    elif block.startswith(">"):
         # Every line in a quote block must start with a "greater-than" character: > followed by the quote text. 
         # A space after > is allowed but not required.
-        for line in lines:
-            if not line.startswith(">"):
-                return BlockType.PARAGRAPH
-        return BlockType.QUOTE
-    if block.startswith('- '):
+        if block.count("\n") == block.count("\n>"):
+            return BlockType.QUOTE, block.split("\n")
+    elif block.startswith("- "):
         # Every line in an unordered list block must start with a - character, followed by a space.
-        for line in lines:
-            if not line.startswith("- "):
-                return BlockType.PARAGRAPH
-        return BlockType.ULIST
-    if block.startswith('1. '):
+        if block.count("\n") == block.count("\n- "):
+            return BlockType.ULIST, block.split("\n")
+    elif block.startswith("1. "):
         # Every line in an ordered list block must start with a number followed by a . character and a space.
         # The number must start at 1 and increment by 1 for each line.
-        i = 1
-        for line in lines:
-            if not line.startswith(f"{i}. "):
-                return BlockType.PARAGRAPH
-            i += 1
-        return BlockType.OLIST
+        lines = block.split("\n")
+        if all(map(str.startswith, lines, olist_prefixes(len(lines)))):
+            return BlockType.OLIST, lines
     # If none of the above conditions are met, the block is a normal paragraph.
-    return BlockType.PARAGRAPH
+    return BlockType.PARAGRAPH, None
 
 def markdown_to_html_node(markdown):
     blocks = markdown_to_blocks(markdown)
@@ -79,7 +132,7 @@ def markdown_to_html_node(markdown):
     return ParentNode("div", block_nodes)
 
 def block_to_html_node(block):
-    block_type = block_to_block_type(block)
+    block_type, lines = classify_block(block)
     match block_type:
         case BlockType.PARAGRAPH:
             return paragraph_to_html_node(block)
@@ -88,11 +141,11 @@ def block_to_html_node(block):
         case BlockType.CODE:
             return code_to_html_node(block)
         case BlockType.QUOTE:
-            return quote_to_html_node(block)
+            return quote_to_html_node(block, lines)
         case BlockType.ULIST:
-            return ulist_to_html_node(block)
+            return ulist_to_html_node(block, lines)
         case BlockType.OLIST:
-            return olist_to_html_node(block)
+            return olist_to_html_node(block, lines)
         case _:
             raise ValueError("invalid block type")
 
@@ -105,8 +158,7 @@ def text_to_children(text):
     return children
 
 def paragraph_to_html_node(block):
-    lines = block.split("\n")
-    paragraph = " ".join(lines)
+    paragraph = block.replace("\n", " ")
     children = text_to_children(paragraph)
     return ParentNode("p", children)
 
@@ -131,8 +183,9 @@ def code_to_html_node(block):
     code_node = ParentNode("code", [html_node])
     return ParentNode("pre", [code_node])
 
-def quote_to_html_node(block):
-    lines = block.split("\n")
+def quote_to_html_node(block, lines=None):
+    if lines is None:
+        lines = block.split("\n")
     new_lines = []
     for line in lines:
         if not line.startswith(">"):
@@ -142,8 +195,8 @@ def quote_to_html_node(block):
     children = text_to_children(content)
     return ParentNode("blockquote", children)
 
-def ulist_to_html_node(block):
-    items = block.split("\n")
+def ulist_to_html_node(block, lines=None):
+    items = lines if lines is not None else block.split("\n")
     html_items = []
     for item in items:
         text = item[2:]
@@ -151,8 +204,8 @@ def ulist_to_html_node(block):
         html_items.append(ParentNode("li", children))
     return ParentNode("ul", html_items)
 
-def olist_to_html_node(block):
-    items = block.split("\n")
+def olist_to_html_node(block, lines=None):
+    items = lines if lines is not None else block.split("\n")
     html_items = []
     for item in items:
         parts = item.split(". ", 1)
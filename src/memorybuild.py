@@ -0,0 +1,52 @@
+import posixpath
+from collections.abc import Mapping
+
+from gencontent import PageGenerationError, render_page
+from page_template import CompiledTemplate
+from logger_singleton import LoggerSingleton as logger
+
+
+def build_in_memory(pages, template, static=(), basepath="/", minify=False):
+    '''
+    Build a site without touching the disk: every markdown source is rendered through the
+    template and yielded as soon as it is done, so the caller can serve, upload or compare
+    the output as it is produced.
+    Like generate_pages, a failing page doesn't stop the others; once everything else has
+    been yielded, a PageGenerationError lists the failures.
+
+    :param pages: (rel_path, markdown) pairs, or a mapping of rel_path to markdown (e.g. a
+        virtual content directory); rel_paths use "/" and only .md entries are rendered
+    :param template: a CompiledTemplate, or the raw template source to compile with basepath and minify
+    :param static: (rel_path, bytes) pairs or a mapping of them, yielded unchanged after the pages
+    :return: a generator of (output rel_path, bytes) tuples, e.g. ("blog/tom/index.html", b"...")
+    '''
+    if not isinstance(template, CompiledTemplate):
+        template = CompiledTemplate(template, basepath, minify)
+    errors = []
+    for rel_path, markdown in items(pages):
+        if posixpath.splitext(rel_path)[1] != ".md":
+            continue
+        try:
+            html = render_page(markdown, template, template.basepath)
+        except Exception as e:
+            logger.warn("failed to generate %s: %s", rel_path, e)
+            errors.append((rel_path, f"{type(e).__name__}: {e}"))
+            continue
+        yield page_output_path(rel_path), html.encode("utf-8")
+    for rel_path, data in items(static):
+        yield rel_path, data
+    if len(errors) > 0:
+        raise PageGenerationError(errors)
+
+
+def page_output_path(rel_path):
+    '''
+    Return the output path of the markdown source at rel_path, see page_dest_path.
+    '''
+    return posixpath.splitext(rel_path)[0] + ".html"
+
+
+def items(sources):
+    if isinstance(sources, Mapping):
+        return sources.items()
+    return sources
@@ -0,0 +1,174 @@
+import os
+import re
+from contextlib import contextmanager
+
+from copystatic import fast_copy
+from manifest import hash_file
+from precompress import precompressor
+from logger_singleton import LoggerSingleton as logger
+
+OUTPUT_BUFFER_SIZE = 256 * 1024
+# "<output>.<pid>.tmp", for a page or a precompressed variant; other files that happen to
+# end in .tmp (e.g. a static backup.2024.tmp) never match
+TEMP_FILE_PATTERN = re.compile(r"\.(?:html|gz|br)\.(\d+)\.tmp$")
+
+
+def process_exists(pid):
+    '''
+    True if a process with this pid is running. Where that can't be checked safely, every
+    process is assumed to be running.
+    '''
+    if os.name != "posix":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running, but owned by someone else
+        return True
+    return True
+
+
+class OutputWriter():
+    def __init__(self):
+        '''
+        Constructor for OutputWriter.
+        Writes generated files atomically: the content goes to a temporary file next to the
+        destination, which is renamed over it only once it is complete, so a crashed build
+        never leaves a half-written page behind. With skip_unchanged, an output whose content
+        is identical to the file already on disk is dropped instead, leaving the old file
+        (and its mtime) alone. Directories are created once per run, not once per page.
+        '''
+        self.reset()
+
+    def reset(self):
+        '''
+        Go back to the defaults, clearing the counts and the directories known to exist.
+        '''
+        self.skip_unchanged = False
+        self.created_dirs = set()
+        self.written = 0
+        self.unchanged = 0
+
+    def configure(self, skip_unchanged=False):
+        self.skip_unchanged = skip_unchanged
+
+    def ensure_dir(self, dir_path):
+        if dir_path == "" or dir_path in self.created_dirs:
+            return
+        os.makedirs(dir_path, exist_ok=True)
+        self.created_dirs.add(dir_path)
+
+    def temp_path(self, dest_path):
+        return f"{dest_path}.{os.getpid()}.tmp"
+
+    def sweep(self, dest_dir_path):
+        '''
+        Remove the temporary files a killed build left behind in dest_dir_path. Nothing
+        else knows about them (the manifest never saw them), so without this they would
+        be deployed. Files of a build that is still running are left alone.
+
+        :return: the number of files removed
+        '''
+        removed = 0
+        for dir_path, _, file_names in os.walk(dest_dir_path):
+            for file_name in file_names:
+                match = TEMP_FILE_PATTERN.search(file_name)
+                if match is None or process_exists(int(match.group(1))):
+                    continue
+                try:
+                    os.remove(os.path.join(dir_path, file_name))
+                except FileNotFoundError:
+                    continue
+                removed += 1
+        if removed > 0:
+            logger.info("Removed %d temporary files left behind by an interrupted build", removed)
+        return removed
+
+    @contextmanager
+    def open(self, dest_path):
+        '''
+        Open a buffered text file that becomes dest_path when the block exits without an error.
+        On an error the temporary file is removed and dest_path is left as it was.
+        '''
+        tmp_path = self.temp_path(dest_path)
+        file = self.in_dir(dest_path, lambda: open(tmp_path, 'w', buffering=OUTPUT_BUFFER_SIZE))
+        try:
+            with file:
+                yield file
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self.commit(tmp_path, dest_path)
+
+    def copy(self, from_path, dest_path):
+        '''
+        Atomically replace dest_path with a copy of the file at from_path.
+        '''
+        tmp_path = self.temp_path(dest_path)
+        self.in_dir(dest_path, lambda: fast_copy(from_path, tmp_path))
+        self.commit(tmp_path, dest_path)
+
+    def in_dir(self, dest_path, create):
+        '''
+        Make sure the directory of dest_path exists and call create.
+        '''
+        dir_path = os.path.dirname(dest_path)
+        self.ensure_dir(dir_path)
+        try:
+            return create()
+        except FileNotFoundError:
+            if dir_path not in self.created_dirs:
+                raise
+            # The directory was deleted since it was created (e.g. between two watch rebuilds)
+            self.created_dirs.discard(dir_path)
+            self.ensure_dir(dir_path)
+            return create()
+
+    def commit(self, tmp_path, dest_path):
+        '''
+        Rename the finished temporary file over dest_path, or drop it if skip_unchanged is on
+        and dest_path already holds the same content. Either way dest_path is then handed to
+        the precompressor.
+
+        :return: True if dest_path was written
+        '''
+        if self.skip_unchanged and self.same_content(tmp_path, dest_path):
+            os.remove(tmp_path)
+            self.unchanged += 1
+            # Still checked, its variants may be missing
+            precompressor.submit(dest_path)
+            return False
+        os.replace(tmp_path, dest_path)
+        self.written += 1
+        precompressor.submit(dest_path)
+        return True
+
+    def same_content(self, tmp_path, dest_path):
+        try:
+            dest_size = os.stat(dest_path).st_size
+        except FileNotFoundError:
+            return False
+        if os.stat(tmp_path).st_size != dest_size:
+            return False
+        return hash_file(tmp_path) == hash_file(dest_path)
+
+    def drain_counts(self):
+        '''
+        Return (and reset) the written/unchanged counts, so a worker process can hand them to the parent.
+        '''
+        counts = {"written": self.written, "unchanged": self.unchanged}
+        self.written = 0
+        self.unchanged = 0
+        return counts
+
+    def absorb(self, counts):
+        self.written += counts["written"]
+        self.unchanged += counts["unchanged"]
+
+    def summary(self):
+        return f"{self.written} written, {self.unchanged} unchanged"
+
+
+output_writer = OutputWriter()
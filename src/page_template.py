@@ -0,0 +1,171 @@
+import hashlib
+import os
+import re
+
+from fingerprint import asset_fingerprints
+
+SLOT_PATTERN = re.compile(r"\{\{ (\w+) \}\}")
+# Tags, comments, and elements whose content must be kept as it is, as single tokens
+MARKUP_PATTERN = re.compile(r"<(pre|textarea|script|style)\b.*?</\1\s*>|<!--.*?-->|<[^>]*>", re.IGNORECASE | re.DOTALL)
+TAG_NAME_PATTERN = re.compile(r"</?(!doctype|[a-z][\w-]*)", re.IGNORECASE)
+WHITESPACE_RUN = re.compile(r"\s+")
+REF_PATTERN = re.compile(r"""\b(href|src)=["']([^"']*)["']""")
+ROOT_RELATIVE_REF = re.compile(r"""\b(href|src)=(["'])(/[^"']*)\2""")
+# Whitespace next to these never renders, so it is dropped instead of collapsed
+BLOCK_TAGS = frozenset((
+    "!doctype", "html", "head", "body", "title", "meta", "link", "script", "style", "base",
+    "header", "footer", "main", "nav", "article", "section", "aside", "div", "p", "pre",
+    "blockquote", "figure", "figcaption", "ul", "ol", "li", "dl", "dt", "dd", "hr", "table",
+    "thead", "tbody", "tfoot", "tr", "th", "td", "form", "fieldset",
+    "h1", "h2", "h3", "h4", "h5", "h6",
+))
+
+_compiled_templates = {}
+
+
+def rewrite_basepath(html, basepath):
+    '''
+    Point root-relative href and src attributes at basepath instead of "/".
+    '''
+    if basepath == "/":
+        return html
+    html = html.replace('href="/', f'href="{basepath}')
+    return html.replace('src="/', f'src="{basepath}')
+
+
+def rewrite_refs(html, rewrite):
+    '''
+    Pass the root-relative href and src values in a fragment of static HTML through rewrite.
+    '''
+    return ROOT_RELATIVE_REF.sub(lambda match: f"{match.group(1)}={match.group(2)}{rewrite(match.group(3))}{match.group(2)}", html)
+
+
+def is_block_tag(token):
+    if token is None:
+        return False
+    match = TAG_NAME_PATTERN.match(token)
+    return match is not None and match.group(1).lower() in BLOCK_TAGS
+
+
+def minify_html(html):
+    '''
+    Strip insignificant whitespace and comments from a fragment of static HTML.
+    Whitespace next to a block level tag is dropped, any other run of whitespace becomes a
+    single space, and pre, textarea, script and style elements are kept exactly as they are.
+    Conditional comments (<!--[if ...]>) are kept.
+    '''
+    tokens = []
+    position = 0
+    for match in MARKUP_PATTERN.finditer(html):
+        tokens.append(html[position:match.start()])
+        tokens.append(match.group(0))
+        position = match.end()
+    tokens.append(html[position:])
+
+    # Even indexes hold text, odd indexes hold markup
+    parts = []
+    for index, token in enumerate(tokens):
+        if index % 2 == 1:
+            if not token.startswith("<!--") or token.startswith("<!--[if"):
+                parts.append(token)
+        elif token.strip() == "":
+            if token == "":
+                continue
+            before = tokens[index - 1] if index > 0 else None
+            after = tokens[index + 1] if index + 1 < len(tokens) else None
+            if not is_block_tag(before) and not is_block_tag(after):
+                parts.append(" ")
+        else:
+            parts.append(WHITESPACE_RUN.sub(" ", token))
+    return "".join(parts)
+
+
+class CompiledTemplate():
+    def __init__(self, source, basepath="/", minify=False, rewrite=None):
+        '''
+        Constructor for CompiledTemplate.
+        The template is split once into static segments and named slots (e.g. {{ Title }}),
+        and the basepath rewrite is applied to the static segments up front, so rendering
+        a page is a single join.
+
+        :param source: string representing the raw template HTML
+        :param basepath: string that root-relative href/src attributes in the template are rewritten to
+        :param minify: strip insignificant whitespace from the static segments, see minify_html
+        :param rewrite: if given, applied to root-relative href/src values before the basepath, see rewrite_refs
+        '''
+        self.basepath = basepath
+        self.minify = minify
+        self.rewrite = rewrite
+        self.source_hash = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        self.parts = []
+        self.slots = []
+        position = 0
+        for match in SLOT_PATTERN.finditer(source):
+            self.parts.append(self.compile_static(source[position:match.start()]))
+            self.slots.append((len(self.parts), match.group(1), match.group(0)))
+            self.parts.append(match.group(0))
+            position = match.end()
+        self.parts.append(self.compile_static(source[position:]))
+        # Every (attribute, url) the template itself links to, as written in the source
+        self.refs = REF_PATTERN.findall(source)
+
+    def compile_static(self, html):
+        if self.minify:
+            html = minify_html(html)
+        if self.rewrite is not None:
+            html = rewrite_refs(html, self.rewrite)
+        return rewrite_basepath(html, self.basepath)
+
+    @classmethod
+    def load(cls, template_path, basepath="/", minify=False, rewrite=None):
+        with open(template_path, 'r') as file:
+            return cls(file.read(), basepath, minify, rewrite)
+
+    def slot_names(self):
+        return [name for _, name, _ in self.slots]
+
+    def render(self, **values):
+        '''
+        Fill every slot with the value passed under its name and return the full page.
+        Slots without a value are left in place verbatim.
+        '''
+        parts = list(self.parts)
+        for index, name, placeholder in self.slots:
+            parts[index] = values.get(name, placeholder)
+        return "".join(parts)
+
+    def render_to(self, write, **values):
+        '''
+        Stream the page to write (e.g. the write method of an open file) instead of building it
+        in memory. A slot value may be a string, or a callable that is handed write and streams
+        the slot content itself.
+        '''
+        slots = {index: (name, placeholder) for index, name, placeholder in self.slots}
+        for index, part in enumerate(self.parts):
+            if index not in slots:
+                write(part)
+                continue
+            name, placeholder = slots[index]
+            value = values.get(name, placeholder)
+            if callable(value):
+                value(write)
+            else:
+                write(value)
+
+
+def get_template(template_path, basepath="/", minify=False):
+    '''
+    Return the compiled template at template_path, compiling it only the first time it is
+    requested in this process (or again after the file changes on disk). Asset URLs are
+    fingerprinted when fingerprinting is on, see AssetFingerprints.
+    '''
+    stat = os.stat(template_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    key = (template_path, basepath, minify, asset_fingerprints.digest)
+    cached = _compiled_templates.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    rewrite = asset_fingerprints.rewrite if asset_fingerprints.enabled else None
+    template = CompiledTemplate.load(template_path, basepath, minify, rewrite)
+    _compiled_templates[key] = (version, template)
+    return template
@@ -0,0 +1,194 @@
+import gzip
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    # Optional, brotli is not in the standard library
+    import brotli
+except ImportError:
+    brotli = None
+
+VARIANT_SUFFIXES = {"gzip": ".gz", "br": ".br"}
+COMPRESSIBLE_SUFFIXES = frozenset((".html", ".css", ".js", ".mjs", ".json", ".svg", ".xml", ".txt", ".map"))
+# Smaller files don't get any smaller, the host serves them as they are
+MIN_COMPRESS_SIZE = 256
+DEFAULT_COMPRESS_WORKERS = 4
+# Files are spread over a fixed set of locks, so the locks never grow with the site
+PATH_LOCK_STRIPES = 64
+
+
+def available_formats():
+    return ["gzip", "br"] if brotli is not None else ["gzip"]
+
+
+def compress_bytes(data, compression):
+    if compression == "gzip":
+        # mtime=0 keeps the output byte for byte reproducible
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if compression == "br":
+        return brotli.compress(data, quality=11)
+    raise ValueError(f"unknown compression: {compression}")
+
+
+def variant_paths(path):
+    '''
+    Return every precompressed variant path path could have, whether or not it is enabled.
+    '''
+    return [path + suffix for suffix in VARIANT_SUFFIXES.values()]
+
+
+class Precompressor():
+    def __init__(self):
+        '''
+        Constructor for Precompressor.
+        Writes precompressed variants (index.html.gz, index.html.br) next to text outputs, so a
+        static host can serve them without compressing on the fly. Files are handed over with
+        submit() as soon as they are written and compressed on a thread pool (zlib and brotli
+        release the GIL) while the build carries on. A variant carries the mtime of the file
+        it was made from, so an output that didn't change since the last build is never
+        compressed again. Disabled until configure() is called.
+        '''
+        self.reset()
+
+    def reset(self):
+        '''
+        Disable precompression and forget the pool and the queued files (without waiting for them).
+        '''
+        self.enabled = False
+        self.formats = ()
+        self.workers = DEFAULT_COMPRESS_WORKERS
+        self.executor = None
+        self.pending = []
+        # The same file can be queued twice (written, then confirmed unchanged) and must not
+        # be compressed on two threads at once, see path_lock
+        self.path_locks = new_path_locks()
+        self.compressed = 0
+        self.current = 0
+
+    def configure(self, formats=("gzip",), workers=DEFAULT_COMPRESS_WORKERS):
+        '''
+        Enable precompression.
+
+        :param formats: names from available_formats()
+        :param workers: threads compressing at the same time
+        '''
+        for compression in formats:
+            if compression not in available_formats():
+                raise ValueError(f"compression not available: {compression}")
+        self.enabled = True
+        self.formats = tuple(formats)
+        self.workers = workers
+
+    def wants(self, path):
+        return self.enabled and Path(path).suffix in COMPRESSIBLE_SUFFIXES
+
+    def is_variant(self, path):
+        '''
+        True if path is an enabled variant of another file, e.g. to keep it when syncing.
+        '''
+        return self.enabled and any(path.endswith(VARIANT_SUFFIXES[compression]) for compression in self.formats)
+
+    def submit(self, path):
+        '''
+        Queue the freshly written (or confirmed unchanged) file at path for compression.
+        Does nothing for files that aren't compressible text.
+        '''
+        if not self.wants(path):
+            return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=max(1, self.workers))
+        self.pending.append(self.executor.submit(self.compress, path))
+
+    def compress(self, path):
+        '''
+        Bring the variants of path up to date.
+
+        :return: a (compressed, current) tuple counting the variants written and the ones
+            that were already up to date
+        '''
+        with self.path_lock(path):
+            return self.compress_locked(path)
+
+    def path_lock(self, path):
+        '''
+        Return the lock for path. Two files may share a lock, which only means they are
+        compressed one after the other.
+        '''
+        return self.path_locks[hash(path) % len(self.path_locks)]
+
+    def compress_locked(self, path):
+        stat = os.stat(path)
+        data = None
+        compressed = 0
+        current = 0
+        for compression in self.formats:
+            variant_path = path + VARIANT_SUFFIXES[compression]
+            if stat.st_size < MIN_COMPRESS_SIZE:
+                if os.path.exists(variant_path):
+                    os.remove(variant_path)
+                continue
+            try:
+                if os.stat(variant_path).st_mtime_ns == stat.st_mtime_ns:
+                    current += 1
+                    continue
+            except FileNotFoundError:
+                pass
+            if data is None:
+                with open(path, 'rb') as file:
+                    data = file.read()
+            tmp_path = f"{variant_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as file:
+                file.write(compress_bytes(data, compression))
+            os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            os.replace(tmp_path, variant_path)
+            compressed += 1
+        return compressed, current
+
+    def wait(self):
+        '''
+        Wait for every queued file, adding up the counts. The first compression error is re-raised.
+        '''
+        pending = self.pending
+        self.pending = []
+        for future in pending:
+            compressed, current = future.result()
+            self.compressed += compressed
+            self.current += current
+
+    def drain_counts(self):
+        '''
+        Wait for the queued files and return (and reset) the counts, so a worker process can
+        hand them to the parent.
+        '''
+        self.wait()
+        counts = {"compressed": self.compressed, "current": self.current}
+        self.compressed = 0
+        self.current = 0
+        return counts
+
+    def absorb(self, counts):
+        self.compressed += counts["compressed"]
+        self.current += counts["current"]
+
+    def summary(self):
+        return f"{self.compressed} variants written, {self.current} up to date ({', '.join(self.formats)})"
+
+
+def new_path_locks():
+    return tuple(threading.Lock() for _ in range(PATH_LOCK_STRIPES))
+
+
+precompressor = Precompressor()
+
+
+def _after_fork_in_child():
+    # The pool's threads don't exist in a forked child, it starts its own when needed
+    precompressor.executor = None
+    precompressor.pending = []
+    # A lock held by a pool thread at fork time would never be released in the child
+    precompressor.path_locks = new_path_locks()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,230 @@
+import mimetypes
+import os
+import posixpath
+import shutil
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from gencontent import emit_hooks, render_page
+from page_template import get_template
+from logger_singleton import LoggerSingleton as logger
+
+DEFAULT_PAGE_CACHE_BYTES = 64 * 1024 * 1024
+SEND_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class PageCache():
+    def __init__(self, max_bytes=DEFAULT_PAGE_CACHE_BYTES):
+        '''
+        Constructor for PageCache.
+        An LRU cache of rendered pages, bounded by the total size of the pages. Each entry
+        remembers the version of the source and the template it was rendered from, and is
+        only returned while both are unchanged. Safe to share between request threads.
+        '''
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, body):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[1])
+            self.entries[key] = (version, body)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def summary(self):
+        with self.lock:
+            return f"{self.hits} hits, {self.misses} misses, {len(self.entries)} pages, {self.size / 1024:.0f} KiB"
+
+
+class PreviewSite():
+    def __init__(self, static_dir_path, content_dir_path, template_path, basepath="/", minify=False, cache_bytes=DEFAULT_PAGE_CACHE_BYTES):
+        '''
+        Constructor for PreviewSite.
+        Maps request paths to sources without building anything up front: "/blog/tom/" is
+        rendered from content/blog/tom/index.md on its first request, anything else is looked
+        up in the static directory. Nothing is scanned or rendered at startup, so a preview
+        of a huge site starts as fast as a small one.
+        '''
+        self.static_dir_path = os.path.realpath(static_dir_path)
+        self.content_dir_path = os.path.realpath(content_dir_path)
+        self.template_path = template_path
+        self.basepath = basepath
+        self.minify = minify
+        self.cache = PageCache(cache_bytes)
+
+    def site_path(self, request_path):
+        '''
+        Return the request path relative to the site root (with the basepath removed and
+        "." and ".." segments resolved), or None if it is outside the site.
+        '''
+        path = unquote(urlsplit(request_path).path)
+        if not path.startswith(self.basepath):
+            return None
+        rel_path = posixpath.normpath("/" + path[len(self.basepath):]).lstrip("/")
+        if rel_path.startswith("..") or "\0" in rel_path:
+            return None
+        if path.endswith("/") and rel_path != "":
+            rel_path += "/"
+        return rel_path
+
+    def page_source(self, rel_path):
+        '''
+        Return the markdown source for a page path ("", "blog/tom/", "blog/tom/index.html",
+        "about.html"), or None if the path isn't a page.
+        '''
+        if rel_path == "" or rel_path.endswith("/"):
+            candidate = os.path.join(self.content_dir_path, rel_path, "index.md")
+        elif rel_path.endswith(".html"):
+            candidate = os.path.join(self.content_dir_path, rel_path[:-len(".html")] + ".md")
+        else:
+            return None
+        return candidate if os.path.isfile(candidate) else None
+
+    def is_page_directory(self, rel_path):
+        '''
+        True for a path like "blog/tom" that needs a trailing slash to be served as a page.
+        '''
+        return os.path.isfile(os.path.join(self.content_dir_path, rel_path, "index.md"))
+
+    def static_file(self, rel_path):
+        path = os.path.realpath(os.path.join(self.static_dir_path, rel_path))
+        if not path.startswith(self.static_dir_path + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def render(self, source_path):
+        '''
+        Return the rendered page for source_path as bytes, from the cache if neither the
+        source nor the template changed since it was rendered.
+        '''
+        template = get_template(self.template_path, self.basepath, self.minify)
+        stat = os.stat(source_path)
+        version = (stat.st_mtime_ns, stat.st_size, template.source_hash)
+        body = self.cache.get(source_path, version)
+        if body is not None:
+            return body
+        with open(source_path, 'r') as file:
+            markdown = file.read()
+        body = render_page(markdown, template, self.basepath, **emit_hooks()).encode("utf-8")
+        self.cache.put(source_path, version, body)
+        logger.detail("pages rendered on demand", "Rendered %s on demand", source_path)
+        return body
+
+
+def send_file(sock, file, size):
+    '''
+    Send size bytes of file over sock with os.sendfile, so the data never passes through
+    Python. Falls back to a plain copy where sendfile isn't available.
+    '''
+    if hasattr(os, "sendfile"):
+        offset = 0
+        try:
+            while offset < size:
+                sent = os.sendfile(sock.fileno(), file.fileno(), offset, min(SEND_CHUNK_SIZE, size - offset))
+                if sent == 0:
+                    break
+                offset += sent
+            return
+        except OSError:
+            if offset > 0:
+                raise
+    with sock.makefile('wb') as out:
+        shutil.copyfileobj(file, out)
+
+
+class PreviewHandler(BaseHTTPRequestHandler):
+    '''
+    Serves a PreviewSite: pages are rendered on demand, static files are sent with sendfile.
+    '''
+    site = None
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def respond(self, send_body):
+        site = self.site
+        rel_path = site.site_path(self.path)
+        if rel_path is None:
+            return self.send_error(HTTPStatus.NOT_FOUND)
+        source_path = site.page_source(rel_path)
+        if source_path is not None:
+            try:
+                body = site.render(source_path)
+            except Exception as e:
+                logger.warn("failed to render %s: %s", source_path, e)
+                return self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR, f"{type(e).__name__}: {e}")
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+            return
+        if not rel_path.endswith("/") and site.is_page_directory(rel_path):
+            self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+            self.send_header("Location", f"{site.basepath}{rel_path}/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        static_path = site.static_file(rel_path)
+        if static_path is None:
+            return self.send_error(HTTPStatus.NOT_FOUND)
+        with open(static_path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            content_type, _ = mimetypes.guess_type(static_path)
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", content_type or "application/octet-stream")
+            self.send_header("Content-Length", str(size))
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            if send_body:
+                self.wfile.flush()
+                send_file(self.connection, file, size)
+
+    def log_message(self, format, *args):
+        logger.detail("requests served", "preview: " + format, *args)
+
+
+def serve_preview(static_dir_path, content_dir_path, template_path, basepath, port, minify=False, cache_bytes=DEFAULT_PAGE_CACHE_BYTES):
+    '''
+    Serve the site on port, rendering each page on its first request. Blocks until interrupted.
+    '''
+    site = PreviewSite(static_dir_path, content_dir_path, template_path, basepath, minify, cache_bytes)
+    handler = type("Handler", (PreviewHandler,), {"site": site})
+    server = ThreadingHTTPServer(("", port), handler)
+    server.daemon_threads = True
+    print(f"Previewing {content_dir_path} on http://localhost:{port}{basepath}, pages are rendered on request")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info("Preview page cache: %s", site.cache.summary())
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+
+from copystatic import fast_copy
+
+# Bump whenever a change to the generator (markdown_blocks, inline_markdown, htmlnode, ...)
+# changes the HTML it produces; it invalidates the render cache and saved block caches
+GENERATOR_VERSION = "1"
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+
+class RenderCache():
+    def __init__(self):
+        '''
+        Constructor for RenderCache.
+        A content-addressed directory of finished pages. The key covers everything the output
+        depends on (markdown hash, template hash, basepath and other render options, generator
+        version), so the directory can be shared between machines, e.g. restored from a CI
+        artifact, and a hit never needs to be validated. Disabled until configure() is called.
+        '''
+        self.reset()
+
+    def reset(self):
+        '''
+        Disable the cache and clear the hit and miss counts. Nothing on disk is touched.
+        '''
+        self.enabled = False
+        self.dir_path = None
+        self.max_bytes = DEFAULT_MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, dir_path, max_bytes=DEFAULT_MAX_BYTES):
+        self.enabled = True
+        self.dir_path = dir_path
+        self.max_bytes = max_bytes
+        os.makedirs(dir_path, exist_ok=True)
+
+    def key(self, markdown_hash, template_hash, *options):
+        digest = hashlib.sha256()
+        for part in (GENERATOR_VERSION, markdown_hash, template_hash) + options:
+            digest.update(str(part).encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.dir_path, key[:2], f"{key[2:]}.html")
+
+    def refs_path(self, entry_path):
+        # The page's href/src references, next to the page (see LinkIndex)
+        return entry_path[:-len(".html")] + ".refs.json"
+
+    def lookup(self, key):
+        '''
+        Return the path of the cached page for key, or None on a miss.
+        A hit refreshes the entry's mtime, which is what eviction orders by.
+        '''
+        path = self.entry_path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def lookup_refs(self, key):
+        '''
+        Return the references stored with the page under key, or None if none were stored.
+        '''
+        try:
+            with open(self.refs_path(self.entry_path(key)), 'r') as file:
+                return [tuple(ref) for ref in json.load(file)]
+        except (OSError, ValueError):
+            return None
+
+    def store(self, key, page_path, refs=None):
+        '''
+        Add the rendered page at page_path to the cache under key, with its (attribute, url)
+        references if they were collected.
+        '''
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if refs is not None:
+            # Written first, so a page is never in the cache without its references
+            refs_path = self.refs_path(path)
+            tmp_path = f"{refs_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as file:
+                json.dump(refs, file)
+            os.replace(tmp_path, refs_path)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fast_copy(page_path, tmp_path)
+        os.replace(tmp_path, path)
+        os.utime(path)
+
+    def drain_counts(self):
+        '''
+        Return (and reset) the hit/miss counts, so a worker process can hand them to the parent.
+        '''
+        counts = {"hits": self.hits, "misses": self.misses}
+        self.hits = 0
+        self.misses = 0
+        return counts
+
+    def absorb(self, counts):
+        self.hits += counts["hits"]
+        self.misses += counts["misses"]
+
+    def evict(self):
+        '''
+        Delete the least recently used entries until the cache fits in max_bytes.
+
+        :return: the number of entries deleted
+        '''
+        entries = []
+        total = 0
+        with os.scandir(self.dir_path) as shards:
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as files:
+                    for entry in files:
+                        if not entry.name.endswith(".html"):
+                            # References are evicted along with their page
+                            continue
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                        total += stat.st_size
+        removed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            try:
+                os.remove(self.refs_path(path))
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups > 0 else 0.0
+        return f"{self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)"
+
+
+render_cache = RenderCache()
@@ -0,0 +1,128 @@
+import os
+import random
+
+BLOCK_TYPES = ("paragraph", "heading", "code", "quote", "ulist", "olist")
+DEFAULT_BLOCK_MIX = {
+    "paragraph": 50,
+    "heading": 10,
+    "code": 10,
+    "quote": 10,
+    "ulist": 10,
+    "olist": 10,
+}
+WORDS = (
+    "elves", "hobbit", "ring", "shire", "mountain", "river", "forest", "wizard", "king",
+    "road", "song", "stone", "tower", "valley", "light", "shadow", "journey", "ancient",
+    "golden", "silver", "quiet", "under", "over", "beyond", "and", "the", "of", "to",
+)
+
+
+class ContentGenerator():
+    def __init__(self, seed=0, block_mix=None, link_density=0.05, image_density=0.01, emphasis_density=0.05):
+        '''
+        Constructor for ContentGenerator.
+        Produces random but valid markdown documents for benchmarking. The output is fully
+        determined by the seed, so benchmark runs across commits see the same content.
+
+        :param block_mix: a dict of block type to relative weight, see DEFAULT_BLOCK_MIX
+        :param link_density: probability that an inline word is replaced by a link
+        :param image_density: probability that an inline word is replaced by an image
+        :param emphasis_density: probability that an inline word is wrapped in bold/italic/code
+        '''
+        self.random = random.Random(seed)
+        block_mix = block_mix or DEFAULT_BLOCK_MIX
+        self.block_types = [block_type for block_type in BLOCK_TYPES if block_mix.get(block_type, 0) > 0]
+        self.block_weights = [block_mix[block_type] for block_type in self.block_types]
+        self.link_density = link_density
+        self.image_density = image_density
+        self.emphasis_density = emphasis_density
+
+    def word(self):
+        return self.random.choice(WORDS)
+
+    def plain(self, count):
+        return " ".join(self.word() for _ in range(count))
+
+    def inline(self, count):
+        parts = []
+        for _ in range(count):
+            roll = self.random.random()
+            if roll < self.link_density:
+                parts.append(f"[{self.word()} {self.word()}](/blog/{self.word()}/)")
+            elif roll < self.link_density + self.image_density:
+                parts.append(f"![{self.word()}](/images/{self.word()}.png)")
+            elif roll < self.link_density + self.image_density + self.emphasis_density:
+                delimiter = self.random.choice(("**", "_", "`"))
+                parts.append(f"{delimiter}{self.word()}{delimiter}")
+            else:
+                parts.append(self.word())
+        return " ".join(parts)
+
+    def block(self, block_type):
+        lines = self.random.randint(1, 6)
+        match block_type:
+            case "paragraph":
+                return "\n".join(self.inline(self.random.randint(8, 20)) for _ in range(lines))
+            case "heading":
+                return f"{'#' * self.random.randint(2, 6)} {self.inline(self.random.randint(2, 8))}"
+            case "code":
+                body = "\n".join(f"    {self.plain(self.random.randint(2, 8))}" for _ in range(lines))
+                return f"```\n{body}\n```"
+            case "quote":
+                return "\n".join(f"> {self.inline(self.random.randint(5, 15))}" for _ in range(lines))
+            case "ulist":
+                return "\n".join(f"- {self.inline(self.random.randint(3, 10))}" for _ in range(lines))
+            case "olist":
+                return "\n".join(f"{i}. {self.inline(self.random.randint(3, 10))}" for i in range(1, lines + 1))
+            case _:
+                raise ValueError(f"unknown block type: {block_type}")
+
+    def page(self, page_size):
+        '''
+        Return a markdown document of roughly page_size characters, starting with an h1 title.
+        '''
+        blocks = [f"# {self.plain(self.random.randint(2, 6))}"]
+        size = len(blocks[0])
+        while size < page_size:
+            block_type = self.random.choices(self.block_types, self.block_weights)[0]
+            block = self.block(block_type)
+            blocks.append(block)
+            size += len(block) + 2
+        return "\n\n".join(blocks) + "\n"
+
+
+def page_paths(page_count, depth, fanout=10):
+    '''
+    Spread page_count pages over a directory tree depth levels deep, each page being an
+    index.md in its own directory like the real content tree.
+    '''
+    paths = []
+    for i in range(page_count):
+        parts = []
+        n = i
+        for _ in range(depth - 1):
+            parts.append(f"d{n % fanout}")
+            n //= fanout
+        parts.append(f"page{i}")
+        paths.append(os.path.join(*parts, "index.md"))
+    return paths
+
+
+def generate_content_tree(root_path, page_count=100, depth=3, page_size=4000, seed=0, **generator_options):
+    '''
+    Write a synthetic content tree of page_count markdown pages under root_path.
+
+    :param depth: how many directory levels the pages are nested in
+    :param page_size: approximate size in characters of each page
+    :param generator_options: passed on to ContentGenerator (block_mix, link_density, ...)
+    :return: the list of markdown paths that were written
+    '''
+    generator = ContentGenerator(seed, **generator_options)
+    written = []
+    for rel_path in page_paths(page_count, depth):
+        path = os.path.join(root_path, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(generator.page(page_size))
+        written.append(path)
+    return written
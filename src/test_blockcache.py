@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+
+import blockcache
+from blockcache import BlockCache, block_cache
+from gencontent import render_page
+from page_template import CompiledTemplate
+
+
+class TestBlockCache(unittest.TestCase):
+    def test_get_put(self):
+        cache = BlockCache()
+        key = cache.key("# heading", "/")
+        self.assertIsNone(cache.get(key))
+        cache.put(key, "<h1>heading</h1>")
+        self.assertEqual(cache.get(key), "<h1>heading</h1>")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_key_includes_options(self):
+        cache = BlockCache()
+        self.assertNotEqual(cache.key("[a](/b)", "/"), cache.key("[a](/b)", "/site/"))
+        self.assertEqual(cache.key("[a](/b)", "/"), cache.key("[a](/b)", "/"))
+
+    def test_lru_eviction(self):
+        cache = BlockCache()
+        cache.configure(max_bytes=10)
+        cache.put("a", "aaaa")
+        cache.put("b", "bbbb")
+        cache.get("a")
+        cache.put("c", "cccc")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "aaaa")
+        self.assertEqual(cache.get("c"), "cccc")
+        self.assertEqual(cache.size, 8)
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.json")
+            cache = BlockCache()
+            cache.configure(path=path)
+            cache.put("a", "<p>a</p>")
+            cache.save()
+            reloaded = BlockCache()
+            reloaded.configure(path=path)
+            self.assertEqual(reloaded.get("a"), "<p>a</p>")
+
+    def test_other_generator_version_is_not_loaded(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.json")
+            cache = BlockCache()
+            cache.configure(path=path)
+            cache.put("a", "<p>a</p>")
+            cache.save()
+            version = blockcache.GENERATOR_VERSION
+            blockcache.GENERATOR_VERSION = version + ".next"
+            try:
+                reloaded = BlockCache()
+                reloaded.configure(path=path)
+            finally:
+                blockcache.GENERATOR_VERSION = version
+            self.assertIsNone(reloaded.get("a"))
+
+    def test_drain_and_absorb(self):
+        worker = BlockCache()
+        worker.configure()
+        worker.put("a", "<p>a</p>")
+        worker.get("a")
+        parent = BlockCache()
+        parent.configure()
+        parent.absorb(worker.drain_updates())
+        self.assertEqual((parent.hits, parent.misses), (1, 0))
+        self.assertEqual(parent.get("a"), "<p>a</p>")
+        self.assertEqual(worker.drain_updates(), {"hits": 0, "misses": 0, "entries": []})
+
+    def test_render_page_with_cache(self):
+        template = CompiledTemplate("{{ Title }}|{{ Content }}")
+        md = "# Title\n\nshared [link](/x) block\n\n- a\n- b"
+        expected = render_page(md, template, "/site/")
+        block_cache.configure()
+        try:
+            self.assertEqual(render_page(md, template, "/site/"), expected)
+            self.assertEqual(render_page(md, template, "/site/"), expected)
+            self.assertEqual(block_cache.hits, 3)
+        finally:
+            block_cache.reset()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import unittest
+
+from buildplan import plan_build
+from copystatic import scan_tree
+
+
+class TestBuildPlan(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.static = os.path.join(root, "static")
+        self.content = os.path.join(root, "content")
+        self.dest = os.path.join(root, "public")
+        for rel_dir in ("images", "fonts"):
+            os.makedirs(os.path.join(self.static, rel_dir))
+        for rel_dir in ("blog/a", "blog/b", "about"):
+            os.makedirs(os.path.join(self.content, rel_dir))
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.write(os.path.join(self.static, "images", "a.png"), "png")
+        self.write(os.path.join(self.static, "fonts", "f.woff"), "woff")
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog", "a", "index.md"), "# A")
+        self.write(os.path.join(self.content, "blog", "b", "index.md"), "# B")
+        self.write(os.path.join(self.content, "about", "index.md"), "# About")
+        self.write(os.path.join(self.content, "about", "notes.txt"), "not a page")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, 'w') as file:
+            file.write(text)
+
+    def test_plan_lists_every_output(self):
+        plan = plan_build(self.static, self.content, self.dest)
+        self.assertEqual(
+            plan.pages(),
+            [
+                (os.path.join(self.content, "about", "index.md"), os.path.join(self.dest, "about", "index.html")),
+                (os.path.join(self.content, "blog", "a", "index.md"), os.path.join(self.dest, "blog", "a", "index.html")),
+                (os.path.join(self.content, "blog", "b", "index.md"), os.path.join(self.dest, "blog", "b", "index.html")),
+                (os.path.join(self.content, "index.md"), os.path.join(self.dest, "index.html")),
+            ],
+        )
+        static = {entry.dest: entry.size for entry in plan.static_files()}
+        self.assertEqual(
+            static,
+            {
+                os.path.join(self.dest, "index.css"): 7,
+                os.path.join(self.dest, "fonts", "f.woff"): 4,
+                os.path.join(self.dest, "images", "a.png"): 3,
+            },
+        )
+        self.assertIn(os.path.join(self.dest, "blog", "b"), plan.directories)
+        self.assertIn(os.path.join(self.dest, "images"), plan.directories)
+
+    def test_parallel_scan_matches_serial(self):
+        self.assertEqual(scan_tree(self.content, workers=4), scan_tree(self.content))
+        parallel = plan_build(self.static, self.content, self.dest, workers=4)
+        serial = plan_build(self.static, self.content, self.dest, workers=1)
+        self.assertEqual(parallel.to_dict(), serial.to_dict())
+
+    def test_plan_json(self):
+        plan = json.loads(plan_build(self.static, self.content, self.dest).to_json())
+        self.assertEqual(plan["dest"], self.dest)
+        kinds = sorted(entry["kind"] for entry in plan["entries"])
+        self.assertEqual(kinds, ["page"] * 4 + ["static"] * 3)
+        page = next(entry for entry in plan["entries"] if entry["source"].endswith(os.path.join("about", "index.md")))
+        self.assertEqual(page["size"], 7)
+        self.assertEqual(page["mtime_ns"], os.stat(page["source"]).st_mtime_ns)
+
+
+if __name__ == "__main__":
+    unittest.main()
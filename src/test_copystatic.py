@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+from copystatic import copy_files_recursive, fast_copy, scan_tree, sync_files
+
+
+class TestCopyStatic(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.dest = os.path.join(self.tmp.name, "public")
+        os.makedirs(os.path.join(self.static, "images"))
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.write(os.path.join(self.static, "images", "a.png"), "png bytes")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(text)
+
+    def read(self, path):
+        with open(path) as file:
+            return file.read()
+
+    def test_fast_copy(self):
+        dest_path = os.path.join(self.tmp.name, "copy.css")
+        method = fast_copy(os.path.join(self.static, "index.css"), dest_path)
+        self.assertIn(method, ("reflink", "copy_file_range", "sendfile", "copy"))
+        self.assertEqual(self.read(dest_path), "body {}")
+        self.assertEqual(
+            os.stat(dest_path).st_mtime_ns,
+            os.stat(os.path.join(self.static, "index.css")).st_mtime_ns,
+        )
+
+    def test_fast_copy_replaces_hardlink_without_touching_source(self):
+        from_path = os.path.join(self.static, "index.css")
+        dest_path = os.path.join(self.tmp.name, "linked.css")
+        self.assertEqual(fast_copy(from_path, dest_path, hardlink=True), "hardlink")
+        other = os.path.join(self.tmp.name, "other.css")
+        self.write(other, "changed")
+        fast_copy(other, dest_path)
+        self.assertEqual(self.read(from_path), "body {}")
+        self.assertEqual(self.read(dest_path), "changed")
+
+    def test_sync_skips_unchanged_and_removes_orphans(self):
+        self.assertEqual(sync_files(self.static, self.dest), (2, 0, 0))
+        self.assertEqual(sync_files(self.static, self.dest), (0, 2, 0))
+
+        page = os.path.join(self.dest, "blog", "index.html")
+        self.write(page, "<p>generated</p>")
+        self.write(os.path.join(self.dest, "old", "gone.png"), "stale")
+        self.write(os.path.join(self.static, "index.css"), "body { color: red }")
+        self.assertEqual(sync_files(self.static, self.dest, keep={page}), (1, 1, 1))
+        self.assertEqual(self.read(os.path.join(self.dest, "index.css")), "body { color: red }")
+        self.assertTrue(os.path.exists(page))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "old")))
+
+    def test_scan_tree(self):
+        dir_paths, file_paths = scan_tree(self.static)
+        self.assertEqual(dir_paths, [".", "images"])
+        self.assertEqual(
+            [(rel_path, size) for rel_path, size, _ in file_paths],
+            [("index.css", 7), (os.path.join("images", "a.png"), 9)],
+        )
+        self.assertEqual(file_paths[0][2], os.stat(os.path.join(self.static, "index.css")).st_mtime_ns)
+
+    def test_copy_files_recursive(self):
+        stats = copy_files_recursive(self.static, self.dest, workers=2)
+        self.assertEqual((stats.files, stats.bytes), (2, 16))
+        self.assertEqual(self.read(os.path.join(self.dest, "images", "a.png")), "png bytes")
+
+    def test_sync_checksum(self):
+        sync_files(self.static, self.dest)
+        dest_path = os.path.join(self.dest, "index.css")
+        self.write(dest_path, "body {}")
+        self.assertEqual(sync_files(self.static, self.dest, checksum=True), (0, 2, 0))
+        self.write(dest_path, "body!!!")
+        self.assertEqual(sync_files(self.static, self.dest, checksum=True), (1, 1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
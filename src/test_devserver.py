@@ -0,0 +1,101 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from copystatic import scan_tree
+from devserver import SiteWatcher
+from imagesize import image_sizes
+
+
+class TestSiteWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.static = os.path.join(root, "static")
+        self.content = os.path.join(root, "content")
+        self.dest = os.path.join(root, "public")
+        self.template = os.path.join(root, "template.html")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog")
+        self.write(self.template, "{{ Title }}")
+        self.watcher = SiteWatcher(self.static, self.content, self.template, self.dest, "/")
+
+    def tearDown(self):
+        image_sizes.reset()
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(text)
+        # Make sure the change is visible even on coarse mtime filesystems
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def read(self, rel_path):
+        with open(os.path.join(self.dest, rel_path)) as file:
+            return file.read()
+
+    def test_no_changes(self):
+        self.assertEqual(self.watcher.poll(), [])
+        self.assertEqual(self.watcher.version, 0)
+
+    def test_changed_page_only(self):
+        path = os.path.join(self.content, "blog", "index.md")
+        self.write(path, "# New blog")
+        self.assertEqual(self.watcher.poll(), [path])
+        self.assertEqual(self.read("blog/index.html"), "New blog")
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "index.html")))
+        self.assertEqual(self.watcher.version, 1)
+
+    def test_changed_asset(self):
+        self.write(os.path.join(self.static, "index.css"), "body { margin: 0 }")
+        self.watcher.poll()
+        self.assertEqual(self.read("index.css"), "body { margin: 0 }")
+
+    def test_template_change_rebuilds_all_pages(self):
+        self.write(self.template, "<h1>{{ Title }}</h1>")
+        self.assertEqual(len(self.watcher.poll()), 2)
+        self.assertEqual(self.read("index.html"), "<h1>Home</h1>")
+        self.assertEqual(self.read("blog/index.html"), "<h1>Blog</h1>")
+
+    def test_template_and_asset_change_together(self):
+        self.write(self.template, "<h1>{{ Title }}</h1>")
+        self.write(os.path.join(self.static, "index.css"), "body { margin: 0 }")
+        self.assertEqual(len(self.watcher.poll()), 3)
+        self.assertEqual(self.read("index.css"), "body { margin: 0 }")
+        self.assertEqual(self.read("index.html"), "<h1>Home</h1>")
+
+    def test_changed_image_dimensions_rerender_pages(self):
+        def png(width, height):
+            return b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", width, height) + b"\x00" * 32
+
+        image = os.path.join(self.static, "a.png")
+        with open(image, 'wb') as file:
+            file.write(png(640, 480))
+        image_sizes.configure(self.static)
+        image_sizes.index(scan_tree(self.static))
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n![a](/a.png)")
+        self.write(self.template, "{{ Content }}")
+        self.watcher.poll()
+        self.assertIn('width="640"', self.read("index.html"))
+
+        with open(image, 'wb') as file:
+            file.write(png(320, 240) + b"\x00")
+        self.watcher.poll()
+        self.assertIn('width="320"', self.read("index.html"))
+        # Every page was rendered again, not only the one that changed
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "blog", "index.html")))
+
+    def test_removed_page(self):
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog")
+        self.watcher.poll()
+        os.remove(os.path.join(self.content, "blog", "index.md"))
+        self.watcher.poll()
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog", "index.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+
+from copystatic import copy_files_recursive, scan_tree, sync_files
+from fingerprint import AssetFingerprints, asset_fingerprints, fingerprinted_path
+from gencontent import render_page
+from incremental import build_incremental
+from manifest import hash_file
+from page_template import CompiledTemplate, rewrite_refs
+
+
+class TestAssetFingerprints(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.static = os.path.join(self.root, "static")
+        self.css = self.write("static/index.css", "body {}")
+        self.png = self.write("static/images/a b.png", "png")
+        self.write("static/robots.txt", "")
+
+    def tearDown(self):
+        asset_fingerprints.reset()
+        self.tmp.cleanup()
+
+    def write(self, rel_path, text):
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(text)
+        return path
+
+    def fingerprint(self, fingerprints=asset_fingerprints, path=None):
+        fingerprints.configure(path)
+        fingerprints.build(self.static, scan_tree(self.static))
+        return fingerprints
+
+    def test_fingerprinted_path(self):
+        self.assertEqual(fingerprinted_path("images/tom.png", "0123456789abcdef"), "images/tom.0123456789.png")
+
+    def test_build_maps_urls(self):
+        fingerprints = self.fingerprint(AssetFingerprints())
+        css = "/" + fingerprinted_path("index.css", hash_file(self.css))
+        self.assertEqual(sorted(fingerprints.paths), ["images/a b.png", "index.css"])
+        self.assertEqual(fingerprints.rewrite("/index.css"), css)
+        self.assertEqual(fingerprints.rewrite("/index.css?v=1#x"), css + "?v=1#x")
+        self.assertTrue(fingerprints.rewrite("/images/a%20b.png").startswith("/images/a%20b."))
+        self.assertEqual(fingerprints.rewrite("/images/a b.png"), fingerprints.rewrite("/images/a%20b.png"))
+        self.assertEqual(fingerprints.rewrite("/robots.txt"), "/robots.txt")
+        self.assertEqual(rewrite_refs('<link href="/index.css"><a href="/x">', fingerprints.rewrite), f'<link href="{css}"><a href="/x">')
+
+    def test_hashes_are_reused(self):
+        manifest = os.path.join(self.root, "assets.json")
+        self.fingerprint(AssetFingerprints(), manifest).save()
+        fingerprints = self.fingerprint(AssetFingerprints(), manifest)
+        self.assertEqual((fingerprints.hashed, fingerprints.reused), (0, 2))
+
+    def test_pages_and_copies_use_fingerprinted_names(self):
+        self.fingerprint()
+        css = fingerprinted_path("index.css", hash_file(self.css))
+        template = CompiledTemplate('<link href="/index.css">{{ Content }}', "/site/", rewrite=asset_fingerprints.rewrite)
+        html = render_page("![x](/index.css)", template, "/site/", rewrite=asset_fingerprints.rewrite)
+        self.assertEqual(html, f'<link href="/site/{css}"><div><p><img src="/site/{css}" alt="x"></img></p></div>')
+        # Nothing is rewritten unless the hook is passed in
+        self.assertEqual(render_page("![x](/index.css)", CompiledTemplate("{{ Content }}", "/site/"), "/site/"), '<div><p><img src="/site/index.css" alt="x"></img></p></div>')
+
+        dest = os.path.join(self.root, "public")
+        copy_files_recursive(self.static, dest)
+        self.assertTrue(os.path.exists(os.path.join(dest, css)))
+        self.assertTrue(os.path.exists(os.path.join(dest, "index.css")))
+        self.assertTrue(os.path.exists(os.path.join(dest, "robots.txt")))
+        self.assertEqual(sync_files(self.static, dest), (0, 3, 0))
+
+    def test_incremental_replaces_old_fingerprint(self):
+        content = os.path.dirname(self.write("content/index.md", "# Home"))
+        template = self.write("template.html", '<link href="/index.css">{{ Content }}')
+        dest = os.path.join(self.root, "public")
+        manifest = os.path.join(self.root, "manifest.json")
+        self.fingerprint()
+        build_incremental(self.static, content, template, dest, "/", manifest)
+        old = os.path.join(dest, fingerprinted_path("index.css", hash_file(self.css)))
+        self.assertTrue(os.path.exists(old))
+
+        self.write("static/index.css", "body { color: red }")
+        self.fingerprint()
+        self.assertEqual(build_incremental(self.static, content, template, dest, "/", manifest), (2, 2, 0))
+        new = fingerprinted_path("index.css", hash_file(self.css))
+        self.assertFalse(os.path.exists(old))
+        with open(os.path.join(dest, "index.html")) as file:
+            self.assertIn(f'href="/{new}"', file.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,15 @@
+import os
+import tempfile
 import unittest
 from gencontent import (
     extract_title,
+    render_page,
+    find_markdown_files,
+    generate_pages,
+    PageGenerationError,
     DEFAULT_TITLE
 )
+from page_template import CompiledTemplate
 
 class TestGencontent(unittest.TestCase):
     def test_extract_title_basic_md(self):
@@ -69,5 +76,87 @@ This is **bolded** paragraph
             "Title one"
         )
 
+    def test_render_page_title_after_content(self):
+        template = CompiledTemplate("<title>{{ Title }}</title>{{ Content }}")
+        md = "intro text\n\n[home](/index.html)\n\n# Late title\n\nmore"
+        self.assertEqual(
+            render_page(md, template, "/site/"),
+            '<title>Late title</title><div><p>intro text</p><p><a href="/site/index.html">home</a></p><h1>Late title</h1><p>more</p></div>',
+        )
+
+    def test_render_page_minify(self):
+        template = CompiledTemplate("<title>{{ Title }}</title>\n<main>\n  {{ Content }}\n</main>\n", minify=True)
+        md = "# Title\n\nsome  text\nwrapped\n\n```\nkeep   this\n  indented\n```"
+        self.assertEqual(
+            render_page(md, template, "/"),
+            "<title>Title</title><main><div><h1>Title</h1><p>some text wrapped</p>"
+            "<pre><code>keep   this\n  indented\n</code></pre></div></main>",
+        )
+
+    def test_render_page_no_title(self):
+        template = CompiledTemplate("{{ Title }}|{{ Content }}")
+        self.assertEqual(render_page("just text", template, "/"), f"{DEFAULT_TITLE}|<div><p>just text</p></div>")
+
+
+class TestGeneratePages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.dest = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        with open(self.template, 'w') as file:
+            file.write("{{ Title }}|{{ Content }}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add_page(self, rel_path, markdown):
+        path = os.path.join(self.content, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(markdown)
+
+    def read_output(self, rel_path):
+        with open(os.path.join(self.dest, rel_path)) as file:
+            return file.read()
+
+    def test_find_markdown_files(self):
+        self.add_page("index.md", "# a")
+        self.add_page("blog/b/index.md", "# b")
+        self.add_page("blog/notes.txt", "ignored")
+        pages = find_markdown_files(self.content, self.dest)
+        self.assertEqual(
+            pages,
+            [
+                (os.path.join(self.content, "blog", "b", "index.md"), os.path.join(self.dest, "blog", "b", "index.html")),
+                (os.path.join(self.content, "index.md"), os.path.join(self.dest, "index.html")),
+            ],
+        )
+
+    def test_generate_pages_parallel(self):
+        for i in range(40):
+            self.add_page(f"p{i}/index.md", f"# Page {i}\n\ntext {i}")
+        pages = find_markdown_files(self.content, self.dest)
+        generate_pages(pages, self.template, "/", jobs=2)
+        for i in range(40):
+            self.assertEqual(
+                self.read_output(f"p{i}/index.html"),
+                f"Page {i}|<div><h1>Page {i}</h1><p>text {i}</p></div>",
+            )
+
+    def test_generate_pages_aggregates_errors(self):
+        self.add_page("bad1/index.md", "# Bad\n\nunclosed **bold")
+        self.add_page("good/index.md", "# Good")
+        self.add_page("bad2/index.md", "# Bad\n\nunclosed `code")
+        pages = find_markdown_files(self.content, self.dest)
+        with self.assertRaises(PageGenerationError) as cm:
+            generate_pages(pages, self.template, "/")
+        failed = [path for path, _ in cm.exception.errors]
+        self.assertEqual(
+            failed,
+            [os.path.join(self.content, "bad1", "index.md"), os.path.join(self.content, "bad2", "index.md")],
+        )
+        self.assertEqual(self.read_output("good/index.html"), "Good|<div><h1>Good</h1></div>")
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
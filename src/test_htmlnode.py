@@ -1,6 +1,7 @@
+import io
 import unittest
 
-from htmlnode import HTMLNode, LeafNode, ParentNode
+from htmlnode import HTMLNode, LeafNode, ParentNode, write_html
 
 
 class TestHTMLNode(unittest.TestCase):
@@ -78,6 +79,62 @@ class TestHTMLNode(unittest.TestCase):
             "<p><b>Bold text</b>Normal text<i>italic text</i>Normal text</p>",
         )
 
+    def test_to_html_basepath(self):
+        node = ParentNode(
+            "p",
+            [
+                LeafNode("a", "home", {"href": "/blog/"}),
+                LeafNode("a", "out", {"href": "https://www.duckduckgo.com"}),
+                LeafNode("img", "", {"src": "/images/tom.png", "alt": "/tom"}),
+            ],
+        )
+        self.assertEqual(
+            node.to_html("/site/"),
+            '<p><a href="/site/blog/">home</a><a href="https://www.duckduckgo.com">out</a><img src="/site/images/tom.png" alt="/tom"></img></p>',
+        )
+
+    def test_write_html_to_stream(self):
+        node = ParentNode(
+            "ul",
+            [ParentNode("li", [LeafNode("a", f"item {i}", {"href": f"/p/{i}"})]) for i in range(3)],
+        )
+        out = io.StringIO()
+        write_html(node, out.write, "/site/")
+        self.assertEqual(out.getvalue(), node.to_html("/site/"))
+        self.assertEqual(
+            out.getvalue(),
+            '<ul><li><a href="/site/p/0">item 0</a></li><li><a href="/site/p/1">item 1</a></li><li><a href="/site/p/2">item 2</a></li></ul>',
+        )
+
+    def test_write_html_minify(self):
+        node = ParentNode(
+            "div",
+            [
+                ParentNode("p", [LeafNode(None, "two  spaces\nand a newline "), LeafNode("code", "keep  this")]),
+                ParentNode("pre", [ParentNode("code", [LeafNode(None, "def f():\n    return  1\n")])]),
+                LeafNode("img", "", {"src": "/a.png", "alt": "a"}),
+            ],
+        )
+        parts = []
+        write_html(node, parts.append, "/site/", minify=True)
+        self.assertEqual(
+            "".join(parts),
+            '<div><p>two spaces and a newline <code>keep  this</code></p>'
+            '<pre><code>def f():\n    return  1\n</code></pre><img src="/site/a.png" alt="a"></div>',
+        )
+
+    def test_to_html_deep_nesting(self):
+        node = LeafNode(None, "deep")
+        for _ in range(5000):
+            node = ParentNode("div", [node])
+        html = node.to_html()
+        self.assertEqual(html, "<div>" * 5000 + "deep" + "</div>" * 5000)
+
+    def test_to_html_no_children(self):
+        node = ParentNode("div", [ParentNode("p", None)])
+        with self.assertRaises(ValueError):
+            node.to_html()
+
     def test_headings(self):
         node = ParentNode(
             "h2",
@@ -0,0 +1,100 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from copystatic import scan_tree
+from gencontent import render_page
+from imagesize import ImageSizes, image_sizes, read_image_size
+from page_template import CompiledTemplate
+
+
+def png(width, height):
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", width, height) + b"\x08\x06\x00\x00\x00" + b"\x00" * 64
+
+def jpeg(width, height):
+    exif = b"\xff\xe1" + struct.pack(">H", 18) + b"Exif\x00\x00" + b"\x00" * 10
+    frame = b"\xff\xc2" + struct.pack(">HBHHB", 11, 8, height, width, 1) + b"\x01\x11\x00"
+    return b"\xff\xd8" + exif + b"\xff" + frame + b"\xff\xda" + b"\x00" * 64
+
+
+class TestImageSizes(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.write("images/a.png", png(640, 480))
+        self.write("images/b.jpg", jpeg(1024, 768))
+        self.write("images/c.gif", b"GIF89a" + struct.pack("<HH", 16, 8) + b"\x00" * 16)
+        self.write("images/broken.png", b"not an image")
+
+    def tearDown(self):
+        image_sizes.reset()
+        self.tmp.cleanup()
+
+    def write(self, rel_path, data):
+        path = os.path.join(self.static, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(data)
+        return path
+
+    def test_read_image_size(self):
+        images = os.path.join(self.static, "images")
+        self.assertEqual(read_image_size(os.path.join(images, "a.png")), (640, 480))
+        self.assertEqual(read_image_size(os.path.join(images, "b.jpg")), (1024, 768))
+        self.assertEqual(read_image_size(os.path.join(images, "c.gif")), (16, 8))
+        self.assertIsNone(read_image_size(os.path.join(images, "broken.png")))
+
+    def test_dimensions_are_cached(self):
+        path = os.path.join(self.tmp.name, "image-sizes.json")
+        sizes = ImageSizes()
+        sizes.configure(self.static, path)
+        sizes.index(scan_tree(self.static))
+        self.assertEqual(sizes.dimensions("/images/a.png?v=2"), (640, 480))
+        self.assertEqual(sizes.dimensions("/images/a.png"), (640, 480))
+        self.assertIsNone(sizes.dimensions("/images/broken.png"))
+        self.assertIsNone(sizes.dimensions("/images/missing.png"))
+        self.assertIsNone(sizes.dimensions("https://example.com/a.png"))
+        # Every image in the static directory is read once, by index()
+        self.assertEqual(sizes.read, 4)
+        sizes.save()
+
+        sizes = ImageSizes()
+        sizes.configure(self.static, path)
+        sizes.index(scan_tree(self.static))
+        self.assertEqual(sizes.dimensions("/images/a.png"), (640, 480))
+        self.assertEqual(sizes.read, 0)
+        self.write("images/a.png", png(320, 240) + b"\x00")
+        sizes.index(scan_tree(self.static))
+        self.assertEqual(sizes.dimensions("/images/a.png"), (320, 240))
+        self.assertEqual(list(sizes.drain()), ["images/a.png"])
+
+    def test_digest_only_changes_with_dimensions(self):
+        sizes = ImageSizes()
+        sizes.configure(self.static)
+        sizes.index(scan_tree(self.static))
+        digest = sizes.digest
+        path = os.path.join(self.static, "images", "a.png")
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        sizes.index(scan_tree(self.static))
+        self.assertEqual(sizes.digest, digest)
+        self.write("images/a.png", png(320, 240))
+        sizes.index(scan_tree(self.static))
+        self.assertNotEqual(sizes.digest, digest)
+
+    def test_emitted_images_get_dimensions(self):
+        image_sizes.configure(self.static, lazy=True)
+        template = CompiledTemplate("{{ Content }}")
+        html = render_page("![a](/images/b.jpg) ![b](images/b.jpg)", template, "/site/", image_props=image_sizes.with_dimensions)
+        self.assertEqual(
+            html,
+            '<div><p><img src="/site/images/b.jpg" alt="a" width="1024" height="768" loading="lazy" decoding="async"></img>'
+            ' <img src="images/b.jpg" alt="b" loading="lazy" decoding="async"></img></p></div>',
+        )
+        # The nodes themselves never pick up the configured sizes
+        self.assertEqual(render_page("![a](/images/b.jpg)", template, "/"), '<div><p><img src="/images/b.jpg" alt="a"></img></p></div>')
+
+
+if __name__ == "__main__":
+    unittest.main()
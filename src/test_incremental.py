@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+from incremental import build_incremental
+
+
+class TestIncremental(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.static = os.path.join(root, "static")
+        self.content = os.path.join(root, "content")
+        self.dest = os.path.join(root, "public")
+        self.template = os.path.join(root, "template.html")
+        self.manifest = os.path.join(root, "state", "manifest.json")
+        os.makedirs(os.path.join(self.static, "images"))
+        os.makedirs(os.path.join(self.content, "blog"))
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.write(os.path.join(self.static, "images", "a.png"), "png")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nhello")
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog\n\nposts")
+        self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, 'w') as file:
+            file.write(text)
+
+    def build(self):
+        return build_incremental(self.static, self.content, self.template, self.dest, "/", self.manifest)
+
+    def test_first_build_writes_everything(self):
+        self.assertEqual(self.build(), (4, 0, 0))
+        with open(os.path.join(self.dest, "blog", "index.html")) as file:
+            self.assertEqual(file.read(), "<title>Blog</title><div><h1>Blog</h1><p>posts</p></div>")
+
+    def test_unchanged_build_touches_nothing(self):
+        self.build()
+        page = os.path.join(self.dest, "index.html")
+        mtime = os.stat(page).st_mtime_ns
+        self.assertEqual(self.build(), (0, 4, 0))
+        self.assertEqual(os.stat(page).st_mtime_ns, mtime)
+
+    def test_changed_page_only(self):
+        self.build()
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nchanged")
+        self.assertEqual(self.build(), (1, 3, 0))
+
+    def test_template_change_invalidates_pages(self):
+        self.build()
+        self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        self.assertEqual(self.build(), (2, 2, 0))
+
+    def test_removed_source_deletes_output(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "index.md"))
+        self.assertEqual(self.build(), (0, 3, 1))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog")))
+
+    def test_missing_output_is_rebuilt(self):
+        self.build()
+        os.remove(os.path.join(self.dest, "index.css"))
+        self.assertEqual(self.build(), (1, 3, 0))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "index.css")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -162,5 +162,41 @@ class TestInlineMarkdown(unittest.TestCase):
             nodes
         )
 
+    def test_text_to_textnodes_matches_split_pipeline(self):
+        texts = [
+            "plain text only",
+            "**bold** at start and `code` at end `x`",
+            "[link](https://boot.dev)[back to back](/b)![img](/i.png)",
+            "a****b and ____ and ``",
+            "an ![image](/a.png) then [a [bad link and [good](/g)",
+            "not ![an image and [not a link]",
+            "",
+        ]
+        for text in texts:
+            nodes = [TextNode(text, TextType.TEXT)]
+            nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+            nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+            nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+            nodes = split_nodes_image(nodes)
+            nodes = split_nodes_link(nodes)
+            self.assertListEqual(nodes, text_to_textnodes(text), text)
+
+    def test_text_to_textnodes_unclosed(self):
+        with self.assertRaises(Exception):
+            text_to_textnodes("this is **not closed")
+        with self.assertRaises(Exception):
+            text_to_textnodes("this is `not closed")
+
+    def test_text_to_textnodes_link_url_with_underscore(self):
+        nodes = text_to_textnodes("see [docs](https://example.com/a_b) now")
+        self.assertListEqual(
+            [
+                TextNode("see ", TextType.TEXT),
+                TextNode("docs", TextType.LINK, "https://example.com/a_b"),
+                TextNode(" now", TextType.TEXT),
+            ],
+            nodes,
+        )
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,69 @@
+import time
+import unittest
+
+from htmlnode import LeafNode, ParentNode
+from instrument import BuildStats, CountingWriter, NULL_TIMER, count_nodes
+
+
+class TestBuildStats(unittest.TestCase):
+    def test_disabled_is_noop(self):
+        stats = BuildStats()
+        self.assertIs(stats.timer("read"), NULL_TIMER)
+        with stats.timer("read"):
+            pass
+        stats.count("pages")
+        stats.record_page("a.md", 1.0)
+        self.assertEqual(stats.snapshot(), {"stage_seconds": {}, "counters": {}, "page_seconds": {}})
+
+    def test_enabled(self):
+        stats = BuildStats()
+        stats.enable()
+        with stats.timer("read"):
+            pass
+        stats.count("pages")
+        stats.count("nodes", 5)
+        stats.record_page("a.md", 0.5)
+        stats.record_page("b.md", 1.5)
+        self.assertIn("read", stats.stage_seconds)
+        self.assertEqual(stats.counters, {"pages": 1, "nodes": 5})
+        self.assertEqual(stats.slowest_pages(1), [("b.md", 1.5)])
+        self.assertIn("b.md", stats.report())
+
+    def test_merge(self):
+        stats = BuildStats()
+        stats.enable()
+        stats.count("pages", 2)
+        stats.merge({"stage_seconds": {"write": 0.25}, "counters": {"pages": 3}, "page_seconds": {"c.md": 0.1}})
+        self.assertEqual(stats.counters["pages"], 5)
+        self.assertEqual(stats.stage_seconds["write"], 0.25)
+        self.assertEqual(stats.page_seconds, {"c.md": 0.1})
+
+    def test_count_nodes(self):
+        node = ParentNode("div", [ParentNode("p", [LeafNode(None, "a"), LeafNode("b", "c")]), LeafNode("hr", "")])
+        self.assertEqual(count_nodes(node), 5)
+
+    def test_nested_stages_are_exclusive(self):
+        stats = BuildStats()
+        stats.enable()
+        with stats.timer("html_emit"):
+            with stats.timer("write"):
+                time.sleep(0.02)
+        self.assertGreaterEqual(stats.stage_seconds["write"], 0.02)
+        self.assertLess(stats.stage_seconds["html_emit"], 0.02)
+        self.assertIsNone(stats.current)
+
+    def test_counting_writer_passes_chunks_through(self):
+        stats = BuildStats()
+        stats.enable()
+        written = []
+        writer = CountingWriter(written.append, stats)
+        writer.write("caf")
+        self.assertEqual(written, ["caf"])
+        writer.write("é ✓")
+        self.assertEqual(written, ["caf", "é ✓"])
+        self.assertEqual(writer.bytes_written, 9)
+        self.assertIn("write", stats.stage_seconds)
+
+
+if __name__ == "__main__":
+    unittest.main()
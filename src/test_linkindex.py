@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+
+from blockcache import block_cache
+from gencontent import generate_pages, render_page
+from incremental import build_incremental
+from linkindex import LinkIndex, link_index, resolve_url
+from page_template import CompiledTemplate
+from rendercache import render_cache
+
+
+class TestLinkIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.tmp.name, "public")
+
+    def tearDown(self):
+        link_index.reset()
+        block_cache.reset()
+        render_cache.reset()
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(text)
+
+    def test_resolve_url(self):
+        self.assertEqual(resolve_url("/blog/tom", "x"), ("blog/tom", "blog/tom/index.html", "blog/tom.html"))
+        self.assertEqual(resolve_url("../a.png#top", "blog/tom"), ("blog/a.png", "blog/a.png/index.html", "blog/a.png.html"))
+        self.assertEqual(resolve_url("/", ""), ("index.html",))
+        self.assertEqual(resolve_url("/images/a%20b.png", "")[0], "images/a b.png")
+        self.assertIsNone(resolve_url("https://example.com/", ""))
+        self.assertIsNone(resolve_url("mailto:me@example.com", ""))
+        self.assertIsNone(resolve_url("#section", ""))
+
+    def test_render_page_collects_refs(self):
+        template = CompiledTemplate("{{ Title }}|{{ Content }}")
+        refs = []
+        render_page("# T\n\n[home](/) and ![logo](/images/logo.png)\n\n- [x](https://example.com)", template, "/site/", refs)
+        self.assertEqual(refs, [("href", "/"), ("src", "/images/logo.png"), ("href", "https://example.com")])
+
+    def test_block_cache_hit_keeps_refs(self):
+        block_cache.configure()
+        template = CompiledTemplate("{{ Content }}")
+        first = []
+        second = []
+        render_page("[a](/a)", template, "/", first)
+        render_page("[a](/a)", template, "/", second)
+        self.assertEqual(block_cache.hits, 1)
+        self.assertEqual(second, first)
+
+    def test_check(self):
+        self.write(os.path.join(self.dest, "index.html"), "")
+        self.write(os.path.join(self.dest, "blog", "tom", "index.html"), "")
+        self.write(os.path.join(self.dest, "images", "used.png"), "")
+        self.write(os.path.join(self.dest, "images", "unused.png"), "")
+        self.write(os.path.join(self.dest, "index.css"), "")
+        self.write(os.path.join(self.dest, "index.css.gz"), "")
+        index = LinkIndex()
+        index.configure()
+        index.record_template("template.html", [("href", "/index.css")])
+        index.record(os.path.join(self.dest, "index.html"), [("href", "/blog/tom"), ("href", "/blog/missing")])
+        index.record(os.path.join(self.dest, "blog", "tom", "index.html"), [("src", "../../images/used.png"), ("href", "https://x.org")])
+        report = index.check(self.dest)
+        self.assertEqual(report.checked, 4)
+        self.assertEqual(report.broken, [(os.path.join(self.dest, "index.html"), "href", "/blog/missing")])
+        self.assertEqual(report.orphans, [os.path.join(self.dest, "images", "unused.png")])
+
+    def test_relative_template_refs_resolve_per_page_directory(self):
+        self.write(os.path.join(self.dest, "index.html"), "")
+        self.write(os.path.join(self.dest, "blog", "index.html"), "")
+        self.write(os.path.join(self.dest, "style.css"), "")
+        index = LinkIndex()
+        index.configure()
+        index.record_template("template.html", [("href", "style.css"), ("href", "/style.css")])
+        index.record(os.path.join(self.dest, "index.html"), [])
+        index.record(os.path.join(self.dest, "blog", "index.html"), [])
+        report = index.check(self.dest)
+        self.assertEqual(report.checked, 3)
+        self.assertEqual(report.broken, [("template.html (in blog/)", "href", "style.css")])
+
+    def test_render_cache_and_incremental_keep_refs(self):
+        content = os.path.join(self.tmp.name, "content")
+        static = os.path.join(self.tmp.name, "static")
+        template = os.path.join(self.tmp.name, "template.html")
+        manifest = os.path.join(self.tmp.name, "manifest.json")
+        self.write(os.path.join(content, "index.md"), "# Home\n\n[gone](/gone)")
+        self.write(os.path.join(static, "index.css"), "body {}")
+        self.write(template, '<link href="/index.css" />{{ Content }}')
+        link_index.configure()
+        render_cache.configure(os.path.join(self.tmp.name, "cache"))
+        page = os.path.join(self.dest, "index.html")
+
+        generate_pages([(os.path.join(content, "index.md"), page)], template, "/")
+        link_index.reset()
+        link_index.configure()
+        generate_pages([(os.path.join(content, "index.md"), page)], template, "/")
+        self.assertEqual(render_cache.hits, 1)
+        self.assertEqual(link_index.pages[page], [("href", "/gone")])
+
+        build_incremental(static, content, template, self.dest, "/", manifest)
+        link_index.reset()
+        link_index.configure()
+        self.assertEqual(build_incremental(static, content, template, self.dest, "/", manifest), (0, 2, 0))
+        report = link_index.check(self.dest)
+        self.assertEqual(report.broken, [(page, "href", "/gone")])
+        self.assertEqual(report.orphans, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import logging
+import os
+import tempfile
+import threading
+import unittest
+
+import logger_singleton
+from logger_singleton import LoggerSingleton as logger
+
+
+class CountingStr():
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "formatted"
+
+
+class TestLoggerSingleton(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.old_path = logger_singleton.LOG_PATH
+        logger.shutdown()
+        logger_singleton.LOG_PATH = os.path.join(self.tmp.name, "test.log")
+
+    def tearDown(self):
+        logger.shutdown()
+        logger.configure(level=logging.INFO, summary=False)
+        logger_singleton.LOG_PATH = self.old_path
+        self.tmp.cleanup()
+
+    def read_log(self):
+        logger.shutdown()
+        with open(logger_singleton.LOG_PATH) as file:
+            return file.read()
+
+    def test_background_writer_when_created_on_another_thread(self):
+        thread = threading.Thread(target=logger.info, args=("from a copy thread",))
+        thread.start()
+        thread.join()
+        self.assertIsNotNone(logger_singleton.LoggerSingleton._instance.listener)
+        self.assertIn("from a copy thread", self.read_log())
+
+    def test_levels(self):
+        logger.info("hello %s", "world")
+        logger.warn("careful")
+        log = self.read_log()
+        self.assertIn("(INFO): hello world", log)
+        self.assertIn("(WARN): careful", log)
+
+    def test_filtered_message_is_never_formatted(self):
+        logger.configure(level=logging.WARNING)
+        value = CountingStr()
+        logger.info("value %s", value)
+        logger.detail("pages", "value %s", value)
+        logger.warn("value %s", value)
+        log = self.read_log()
+        self.assertEqual(value.calls, 1)
+        self.assertNotIn("(INFO): value", log)
+        self.assertIn("(WARN): value formatted", log)
+
+    def test_summary_mode(self):
+        logger.configure(summary=True)
+        for i in range(3):
+            logger.detail("pages generated", "Generating page %d", i)
+        logger.detail("files copied", "copy")
+        logger.flush_summary()
+        log = self.read_log()
+        self.assertNotIn("Generating page", log)
+        self.assertIn("(INFO): files copied: 1", log)
+        self.assertIn("(INFO): pages generated: 3", log)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,12 @@
+import threading
 import unittest
 
 from markdown_blocks import (
+    olist_prefixes,
+    BlockReader,
     markdown_to_blocks,
     block_to_block_type,
+    classify_block,
     markdown_to_html_node,
     BlockType
 )
@@ -51,6 +55,20 @@ This is the same paragraph on a new line
             ],
         )
 
+    def test_block_reader_is_lazy(self):
+        lines = iter(["intro\n", "\n", "# Title\n", "\n", "- a\n", "- b\n"])
+        reader = BlockReader(lines)
+        blocks = iter(reader)
+        self.assertEqual(next(blocks), "intro")
+        self.assertIsNone(reader.title)
+        self.assertEqual(next(blocks), "# Title")
+        self.assertEqual(reader.title, "Title")
+        self.assertEqual(list(lines), ["- a\n", "- b\n"])
+
+    def test_block_reader_skips_blank_blocks(self):
+        blocks = list(BlockReader(["a\n", "\n", "   \n", "\n", "b"]))
+        self.assertEqual(blocks, ["a", "b"])
+
     def test_paragraph_block(self):
         md = "A paragraph block with some **bold** text"
         type = block_to_block_type(md)
@@ -96,6 +114,23 @@ This is the same paragraph on a new line
         type = block_to_block_type(md)
         self.assertEqual(BlockType.OLIST, type)
 
+    def test_olist_prefixes_grow_consistently(self):
+        self.assertEqual(olist_prefixes(3)[:3], ("1. ", "2. ", "3. "))
+        results = []
+
+        def grow(count):
+            results.append(olist_prefixes(count))
+
+        threads = [threading.Thread(target=grow, args=(count,)) for count in range(1, 200, 7)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for prefixes in results + [olist_prefixes(500)]:
+            self.assertEqual(list(prefixes), [f"{number}. " for number in range(1, len(prefixes) + 1)])
+        block = "\n".join(f"{number}. item" for number in range(1, 301))
+        self.assertEqual(block_to_block_type(block), BlockType.OLIST)
+
     def test_block_to_block_types(self):
         block = "# heading"
         self.assertEqual(block_to_block_type(block), BlockType.HEADING)
@@ -110,6 +145,22 @@ This is the same paragraph on a new line
         block = "paragraph"
         self.assertEqual(block_to_block_type(block), BlockType.PARAGRAPH)
 
+    def test_broken_blocks_are_paragraphs(self):
+        self.assertEqual(block_to_block_type("> quote\nnot a quote"), BlockType.PARAGRAPH)
+        self.assertEqual(block_to_block_type("- list\n-not a list"), BlockType.PARAGRAPH)
+        self.assertEqual(block_to_block_type("1. one\n3. three"), BlockType.PARAGRAPH)
+        self.assertEqual(block_to_block_type("```\nunterminated code"), BlockType.PARAGRAPH)
+        self.assertEqual(block_to_block_type("```code```"), BlockType.PARAGRAPH)
+
+    def test_classify_block_returns_lines(self):
+        self.assertEqual(classify_block("- a\n- b"), (BlockType.ULIST, ["- a", "- b"]))
+        self.assertEqual(classify_block("# heading"), (BlockType.HEADING, None))
+        self.assertEqual(classify_block("just\ntext"), (BlockType.PARAGRAPH, None))
+        block = "\n".join(f"{i}. item" for i in range(1, 13))
+        block_type, lines = classify_block(block)
+        self.assertEqual(block_type, BlockType.OLIST)
+        self.assertEqual(lines[11], "12. item")
+
     def test_paragraph(self):
         md = """
 This is **bolded** paragraph
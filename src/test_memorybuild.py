@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+
+from gencontent import PageGenerationError, generate_pages_recursive
+from memorybuild import build_in_memory
+from page_template import CompiledTemplate
+
+TEMPLATE = '<title>{{ Title }}</title><link href="/index.css">{{ Content }}'
+
+
+class TestBuildInMemory(unittest.TestCase):
+    def test_renders_pages_and_passes_static_through(self):
+        pages = {
+            "index.md": "# Home\n\n[blog](/blog/)",
+            "blog/index.md": "# Blog",
+            "notes.txt": "not a page",
+        }
+        outputs = dict(build_in_memory(pages, TEMPLATE, {"index.css": b"body {}"}, basepath="/site/"))
+        self.assertEqual(sorted(outputs), ["blog/index.html", "index.css", "index.html"])
+        self.assertEqual(
+            outputs["index.html"],
+            b'<title>Home</title><link href="/site/index.css"><div><h1>Home</h1><p><a href="/site/blog/">blog</a></p></div>',
+        )
+        self.assertEqual(outputs["index.css"], b"body {}")
+
+    def test_is_lazy(self):
+        results = build_in_memory(iter([("a.md", "# A"), ("b.md", "# B")]), CompiledTemplate("{{ Title }}"))
+        self.assertEqual(next(results), ("a.html", b"A"))
+
+    def test_failures_are_raised_after_the_other_pages(self):
+        results = build_in_memory([("bad.md", 42), ("good.md", "# Good")], "{{ Title }}")
+        self.assertEqual(next(results), ("good.html", b"Good"))
+        with self.assertRaises(PageGenerationError) as context:
+            next(results)
+        self.assertEqual(context.exception.errors[0][0], "bad.md")
+
+    def test_matches_disk_build(self):
+        pages = {"index.md": "# Home\n\n- a\n- b", "blog/tom/index.md": "# Tom\n\n> quote\n\n```\ncode\n```"}
+        with tempfile.TemporaryDirectory() as root:
+            template_path = os.path.join(root, "template.html")
+            with open(template_path, 'w') as file:
+                file.write(TEMPLATE)
+            for rel_path, markdown in pages.items():
+                path = os.path.join(root, "content", rel_path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w') as file:
+                    file.write(markdown)
+            generate_pages_recursive(os.path.join(root, "content"), template_path, os.path.join(root, "public"), "/x/")
+            for rel_path, data in build_in_memory(pages, TEMPLATE, basepath="/x/"):
+                with open(os.path.join(root, "public", rel_path), 'rb') as file:
+                    self.assertEqual(file.read(), data)
+
+
+if __name__ == "__main__":
+    unittest.main()
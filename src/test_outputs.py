@@ -0,0 +1,98 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from gencontent import generate_page
+from outputs import OutputWriter, output_writer
+
+
+class TestOutputWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.tmp.name, "public", "blog", "index.html")
+
+    def tearDown(self):
+        output_writer.reset()
+        self.tmp.cleanup()
+
+    def read(self, path):
+        with open(path) as file:
+            return file.read()
+
+    def test_open_writes_atomically(self):
+        writer = OutputWriter()
+        with writer.open(self.dest) as file:
+            file.write("<p>hi</p>")
+            self.assertFalse(os.path.exists(self.dest))
+        self.assertEqual(self.read(self.dest), "<p>hi</p>")
+        self.assertEqual(os.listdir(os.path.dirname(self.dest)), ["index.html"])
+
+    def test_error_keeps_old_output(self):
+        writer = OutputWriter()
+        with writer.open(self.dest) as file:
+            file.write("old")
+        with self.assertRaises(ValueError):
+            with writer.open(self.dest) as file:
+                file.write("half a pa")
+                raise ValueError("render failed")
+        self.assertEqual(self.read(self.dest), "old")
+        self.assertEqual(os.listdir(os.path.dirname(self.dest)), ["index.html"])
+
+    def test_skip_unchanged_keeps_mtime(self):
+        writer = OutputWriter()
+        writer.configure(skip_unchanged=True)
+        with writer.open(self.dest) as file:
+            file.write("same")
+        os.utime(self.dest, ns=(1, 1))
+        with writer.open(self.dest) as file:
+            file.write("same")
+        self.assertEqual(os.stat(self.dest).st_mtime_ns, 1)
+        with writer.open(self.dest) as file:
+            file.write("diff")
+        self.assertEqual(self.read(self.dest), "diff")
+        self.assertEqual(writer.drain_counts(), {"written": 2, "unchanged": 1})
+
+    def test_recreates_deleted_directory(self):
+        writer = OutputWriter()
+        with writer.open(self.dest) as file:
+            file.write("a")
+        shutil.rmtree(os.path.join(self.tmp.name, "public"))
+        with writer.open(self.dest) as file:
+            file.write("b")
+        self.assertEqual(self.read(self.dest), "b")
+
+    def test_sweep_removes_temp_files_of_dead_builds(self):
+        dead = subprocess.Popen([sys.executable, "-c", ""])
+        dead.wait()
+        dest_dir = os.path.dirname(self.dest)
+        names = [
+            f"index.html.{dead.pid}.tmp",
+            f"index.css.gz.{dead.pid}.tmp",
+            f"about.html.{os.getpid()}.tmp",
+            f"backup.{dead.pid}.tmp",
+            "index.html",
+        ]
+        os.makedirs(dest_dir)
+        for name in names:
+            with open(os.path.join(dest_dir, name), 'w') as file:
+                file.write("x")
+        self.assertEqual(OutputWriter().sweep(os.path.join(self.tmp.name, "public")), 2)
+        self.assertEqual(sorted(os.listdir(dest_dir)), sorted(names[2:]))
+
+    def test_generate_page_failure_leaves_no_partial_page(self):
+        template = os.path.join(self.tmp.name, "template.html")
+        source = os.path.join(self.tmp.name, "index.md")
+        with open(template, 'w') as file:
+            file.write("{{ Title }}|{{ Content }}")
+        with open(source, 'w') as file:
+            file.write("# Title\n\nfine\n\nunclosed **bold")
+        with self.assertRaises(Exception):
+            generate_page(source, template, self.dest, "/")
+        self.assertEqual(os.listdir(os.path.dirname(self.dest)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+from page_template import CompiledTemplate, minify_html
+
+
+class TestCompiledTemplate(unittest.TestCase):
+    def test_slots(self):
+        template = CompiledTemplate("<title>{{ Title }}</title><article>{{ Content }}</article>")
+        self.assertEqual(template.slot_names(), ["Title", "Content"])
+        self.assertEqual(
+            template.render(Title="Hello", Content="<p>hi</p>"),
+            "<title>Hello</title><article><p>hi</p></article>",
+        )
+
+    def test_missing_slot_left_verbatim(self):
+        template = CompiledTemplate("{{ Title }}|{{ Footer }}")
+        self.assertEqual(template.render(Title="Hello"), "Hello|{{ Footer }}")
+
+    def test_basepath_rewritten_in_static_parts_only(self):
+        template = CompiledTemplate(
+            '<link href="/index.css" /><img src="/logo.png" />{{ Content }}',
+            "/site/",
+        )
+        self.assertEqual(
+            template.render(Content='<code>href="/raw"</code>'),
+            '<link href="/site/index.css" /><img src="/site/logo.png" /><code>href="/raw"</code>',
+        )
+
+    def test_minify_html(self):
+        html = "<!doctype html>\n<html>\n  <head>\n    <title> A  title </title>\n  </head>\n  <!-- note -->\n  <body>\n    <b>a</b>\n    <i>b</i>\n  </body>\n</html>\n"
+        self.assertEqual(
+            minify_html(html),
+            "<!doctype html><html><head><title> A title </title></head><body><b>a</b> <i>b</i></body></html>",
+        )
+
+    def test_minify_keeps_preformatted_elements(self):
+        html = "<pre>\n  a\n   b</pre>\n<script>\n// comment\nrun()\n</script>\n<!--[if IE]>ie<![endif]-->"
+        self.assertEqual(
+            minify_html(html),
+            "<pre>\n  a\n   b</pre><script>\n// comment\nrun()\n</script><!--[if IE]>ie<![endif]-->",
+        )
+
+    def test_minify_template(self):
+        template = CompiledTemplate("<html>\n  <body>\n    <article>{{ Content }}</article>\n  </body>\n</html>", minify=True)
+        self.assertEqual(template.render(Content="x"), "<html><body><article>x</article></body></html>")
+
+    def test_default_basepath(self):
+        template = CompiledTemplate('<link href="/index.css" />')
+        self.assertEqual(template.render(), '<link href="/index.css" />')
+
+
+if __name__ == "__main__":
+    unittest.main()
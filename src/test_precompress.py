@@ -0,0 +1,104 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from copystatic import sync_files
+from incremental import build_incremental
+from precompress import Precompressor, precompressor, MIN_COMPRESS_SIZE
+
+
+class TestPrecompress(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        precompressor.reset()
+        self.tmp.cleanup()
+
+    def write(self, rel_path, text):
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(text)
+        return path
+
+    def test_compress_writes_gzip_variant(self):
+        compressor = Precompressor()
+        compressor.configure(["gzip"])
+        path = self.write("index.html", "<p>hello</p>" * 100)
+        compressor.submit(path)
+        compressor.wait()
+        with gzip.open(path + ".gz", 'rt') as file:
+            self.assertEqual(file.read(), "<p>hello</p>" * 100)
+        self.assertEqual(os.stat(path + ".gz").st_mtime_ns, os.stat(path).st_mtime_ns)
+        self.assertEqual(compressor.drain_counts(), {"compressed": 1, "current": 0})
+
+    def test_unchanged_file_is_not_recompressed(self):
+        compressor = Precompressor()
+        compressor.configure(["gzip"])
+        path = self.write("index.css", "body {}\n" * 100)
+        compressor.submit(path)
+        compressor.submit(path)
+        compressor.wait()
+        self.assertEqual((compressor.compressed, compressor.current), (1, 1))
+
+    def test_path_locks_do_not_grow(self):
+        compressor = Precompressor()
+        compressor.configure(["gzip"])
+        locks = compressor.path_locks
+        paths = [self.write(f"page{index}.html", "<p>hello</p>" * 100) for index in range(2 * len(locks))]
+        for path in paths:
+            compressor.submit(path)
+        compressor.wait()
+        self.assertIs(compressor.path_locks, locks)
+        self.assertIs(compressor.path_lock(paths[0]), compressor.path_lock(paths[0]))
+        self.assertEqual(compressor.compressed, len(paths))
+
+    def test_skips_binary_and_small_files(self):
+        compressor = Precompressor()
+        compressor.configure(["gzip"])
+        image = self.write("a.png", "x" * 1000)
+        small = self.write("small.css", "x" * (MIN_COMPRESS_SIZE - 1))
+        compressor.submit(image)
+        compressor.submit(small)
+        compressor.wait()
+        self.assertFalse(os.path.exists(image + ".gz"))
+        self.assertFalse(os.path.exists(small + ".gz"))
+
+    def test_unavailable_format(self):
+        compressor = Precompressor()
+        with self.assertRaises(ValueError):
+            compressor.configure(["zstd"])
+
+    def test_sync_keeps_variants(self):
+        precompressor.configure(["gzip"])
+        static = os.path.dirname(self.write("static/index.css", "body {}\n" * 100))
+        dest = os.path.join(self.root, "public")
+        sync_files(static, dest)
+        self.assertTrue(os.path.exists(os.path.join(dest, "index.css.gz")))
+        self.assertEqual(sync_files(static, dest), (0, 1, 0))
+        self.assertTrue(os.path.exists(os.path.join(dest, "index.css.gz")))
+
+    def test_incremental_removes_stale_variants(self):
+        precompressor.configure(["gzip"])
+        static = os.path.dirname(self.write("static/index.css", "body {}\n" * 100))
+        content = os.path.dirname(self.write("content/index.md", "# Home\n\n" + "text " * 100))
+        template = self.write("template.html", "{{ Title }}{{ Content }}")
+        dest = os.path.join(self.root, "public")
+        manifest = os.path.join(self.root, "manifest.json")
+        build_incremental(static, content, template, dest, "/", manifest)
+        precompressor.wait()
+        self.assertTrue(os.path.exists(os.path.join(dest, "index.html.gz")))
+        self.assertTrue(os.path.exists(os.path.join(dest, "index.css.gz")))
+
+        os.remove(os.path.join(static, "index.css"))
+        build_incremental(static, content, template, dest, "/", manifest)
+        precompressor.wait()
+        self.assertFalse(os.path.exists(os.path.join(dest, "index.css.gz")))
+        self.assertEqual((precompressor.compressed, precompressor.current), (2, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import threading
+import unittest
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+
+from previewserver import PageCache, PreviewHandler, PreviewSite
+
+
+class TestPageCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = PageCache(max_bytes=10)
+        cache.put("a", 1, b"aaaa")
+        cache.put("b", 1, b"bbbb")
+        self.assertEqual(cache.get("a", 1), b"aaaa")
+        cache.put("c", 1, b"cccc")
+        self.assertIsNone(cache.get("b", 1))
+        self.assertEqual(cache.get("a", 1), b"aaaa")
+        self.assertEqual(cache.size, 8)
+
+    def test_stale_version_misses(self):
+        cache = PageCache()
+        cache.put("a", 1, b"old")
+        self.assertIsNone(cache.get("a", 2))
+        cache.put("a", 2, b"new!")
+        self.assertEqual(cache.get("a", 2), b"new!")
+        self.assertEqual(cache.size, 4)
+
+    def test_oversized_page_is_not_cached(self):
+        cache = PageCache(max_bytes=2)
+        cache.put("a", 1, b"abc")
+        self.assertEqual(len(cache.entries), 0)
+
+
+class TestPreviewServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.static = os.path.join(root, "static")
+        self.content = os.path.join(root, "content")
+        self.template = os.path.join(root, "template.html")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog")
+        self.write(os.path.join(self.content, "about.md"), "# About")
+        self.write(self.template, "<title>{{ Title }}</title>")
+        self.site = PreviewSite(self.static, self.content, self.template, "/site/")
+        handler = type("Handler", (PreviewHandler,), {"site": self.site})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(text)
+        # Make sure the change is visible even on coarse mtime filesystems
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def get(self, path, method="GET"):
+        connection = HTTPConnection("127.0.0.1", self.server.server_address[1])
+        try:
+            connection.request(method, path)
+            response = connection.getresponse()
+            return response.status, response.getheader("Location"), response.read()
+        finally:
+            connection.close()
+
+    def test_site_path(self):
+        self.assertEqual(self.site.site_path("/site/"), "")
+        self.assertEqual(self.site.site_path("/site/blog/?x=1"), "blog/")
+        self.assertEqual(self.site.site_path("/site/a%20b.png"), "a b.png")
+        self.assertEqual(self.site.site_path("/site/../secret"), "secret")
+        self.assertIsNone(self.site.site_path("/other/"))
+
+    def test_pages(self):
+        self.assertEqual(self.get("/site/"), (200, None, b"<title>Home</title>"))
+        self.assertEqual(self.get("/site/blog/")[2], b"<title>Blog</title>")
+        self.assertEqual(self.get("/site/blog/index.html")[2], b"<title>Blog</title>")
+        self.assertEqual(self.get("/site/about.html")[2], b"<title>About</title>")
+        self.assertEqual(self.get("/site/blog")[:2], (301, "/site/blog/"))
+        self.assertEqual(self.get("/site/missing/")[0], 404)
+
+    def test_pages_render_once_until_changed(self):
+        self.get("/site/blog/")
+        self.get("/site/blog/")
+        self.assertEqual((self.site.cache.hits, self.site.cache.misses), (1, 1))
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Changed")
+        self.assertEqual(self.get("/site/blog/")[2], b"<title>Changed</title>")
+        self.write(self.template, "<h1>{{ Title }}</h1>")
+        self.assertEqual(self.get("/site/blog/")[2], b"<h1>Changed</h1>")
+
+    def test_static_files(self):
+        self.assertEqual(self.get("/site/index.css"), (200, None, b"body {}"))
+        self.assertEqual(self.get("/site/index.css", "HEAD"), (200, None, b""))
+        self.assertEqual(self.get("/site/../template.html")[0], 404)
+        self.assertEqual(self.get("/site/nothing.css")[0], 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
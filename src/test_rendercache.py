@@ -0,0 +1,70 @@
+import os
+import tempfile
+import time
+import unittest
+
+from gencontent import generate_page
+from rendercache import RenderCache, render_cache
+
+
+class TestRenderCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+
+    def tearDown(self):
+        render_cache.reset()
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w') as file:
+            file.write(text)
+        return path
+
+    def test_key(self):
+        cache = RenderCache()
+        key = cache.key("md", "template", "/")
+        self.assertEqual(key, cache.key("md", "template", "/"))
+        self.assertNotEqual(key, cache.key("md2", "template", "/"))
+        self.assertNotEqual(key, cache.key("md", "template2", "/"))
+        self.assertNotEqual(key, cache.key("md", "template", "/site/"))
+
+    def test_lookup_and_store(self):
+        cache = RenderCache()
+        cache.configure(self.cache_dir)
+        key = cache.key("md", "template", "/")
+        self.assertIsNone(cache.lookup(key))
+        cache.store(key, self.write("page.html", "<p>page</p>"))
+        with open(cache.lookup(key)) as file:
+            self.assertEqual(file.read(), "<p>page</p>")
+        self.assertEqual(cache.summary(), "1 hits, 1 misses (50.0% hit rate)")
+
+    def test_evict_least_recently_used(self):
+        cache = RenderCache()
+        cache.configure(self.cache_dir, max_bytes=10)
+        page = self.write("page.html", "123456")
+        keys = [cache.key(str(i), "t") for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.store(key, page)
+            past = time.time() - 100 + i
+            os.utime(cache.entry_path(key), (past, past))
+        self.assertEqual(cache.evict(), 2)
+        self.assertFalse(os.path.exists(cache.entry_path(keys[0])))
+        self.assertTrue(os.path.exists(cache.entry_path(keys[2])))
+
+    def test_generate_page_uses_cache(self):
+        render_cache.configure(self.cache_dir)
+        source = self.write("index.md", "# Cached\n\ntext")
+        template = self.write("template.html", "{{ Title }}|{{ Content }}")
+        first = os.path.join(self.tmp.name, "out", "first.html")
+        second = os.path.join(self.tmp.name, "out", "second.html")
+        generate_page(source, template, first, "/")
+        generate_page(source, template, second, "/")
+        self.assertEqual((render_cache.hits, render_cache.misses), (1, 1))
+        with open(second) as file:
+            self.assertEqual(file.read(), "Cached|<div><h1>Cached</h1><p>text</p></div>")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import tempfile
+import unittest
+
+from markdown_blocks import markdown_to_html_node
+from synthetic import ContentGenerator, generate_content_tree
+
+
+class TestSynthetic(unittest.TestCase):
+    def test_pages_are_deterministic(self):
+        self.assertEqual(ContentGenerator(seed=3).page(2000), ContentGenerator(seed=3).page(2000))
+        self.assertNotEqual(ContentGenerator(seed=3).page(2000), ContentGenerator(seed=4).page(2000))
+
+    def test_pages_render(self):
+        generator = ContentGenerator(seed=1, link_density=0.2, image_density=0.1, emphasis_density=0.2)
+        for _ in range(20):
+            page = generator.page(3000)
+            self.assertTrue(page.startswith("# "))
+            html = markdown_to_html_node(page).to_html()
+            self.assertTrue(html.startswith("<div><h1>"))
+
+    def test_block_mix(self):
+        page = ContentGenerator(seed=2, block_mix={"code": 1}).page(1000)
+        self.assertEqual(page.count("```") % 2, 0)
+        self.assertGreater(page.count("```"), 0)
+
+    def test_generate_content_tree(self):
+        with tempfile.TemporaryDirectory() as root:
+            paths = generate_content_tree(root, page_count=25, depth=3, page_size=500)
+            self.assertEqual(len(paths), 25)
+            self.assertEqual(len(set(paths)), 25)
+            for path in paths:
+                self.assertTrue(os.path.isfile(path))
+                self.assertEqual(os.path.relpath(path, root).count(os.sep), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -40,5 +40,12 @@ class TestTextNode(unittest.TestCase):
         self.assertEqual(html_node.tag, None)
         self.assertEqual(html_node.value, "This is a text node")
 
+    def test_compact_nodes(self):
+        node = TextNode("This is a link", TextType.LINK, "/blog")
+        html_node = text_node_to_html_node(node)
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertFalse(hasattr(html_node, "__dict__"))
+        self.assertEqual(html_node.to_html(), '<a href="/blog">This is a link</a>')
+
 if __name__ == "__main__":
     unittest.main()